@@ -33,4 +33,11 @@ export const compartimentosService = {
    * Elimina un compartimento.
    */
   delete: (id) => api.delete(`/compartimentos/${id}/`),
+
+  /**
+   * Aplica en una sola transacción un lote de cambios a los equipos del compartimento.
+   * @param {number} id - ID del compartimento
+   * @param {object} lote - { equipos, desactivar_equipos }
+   */
+  aplicarLote: (id, lote) => api.post(`/compartimentos/${id}/lote/`, lote),
 };
@@ -0,0 +1,20 @@
+/**
+ * Servicios API para la sincronización incremental del inventario.
+ */
+import api from './axios';
+
+export const inventarioService = {
+  /**
+   * Obtiene los compartimentos y equipos que cambiaron desde la última sincronización.
+   * Aplicar primero `eliminados` y luego las filas; guardar `hasta` para la próxima llamada.
+   * Si la respuesta trae `completo: true`, reemplaza toda la copia local.
+   * @param {string} since - Valor `hasta` de la respuesta anterior (opcional)
+   * @param {number} vehiculoId - ID del vehículo (opcional)
+   */
+  getCambios: ({ since = null, vehiculoId = null } = {}) => {
+    const params = {};
+    if (since) params.since = since;
+    if (vehiculoId) params.vehiculo = vehiculoId;
+    return api.get('/inventario/cambios/', { params });
+  },
+};
@@ -22,4 +22,12 @@ export const revisionesService = {
    * @param {object} revisionData - Datos de la revisión
    */
   create: (revisionData) => api.post('/revisiones/', revisionData),
+
+  /**
+   * Envía en un solo pedido las revisiones encoladas sin conexión.
+   * Cada revisión debe incluir una `clave_idempotencia` generada al crearla,
+   * así reintentar el envío no las duplica.
+   * @param {Array<object>} revisiones - Revisiones pendientes de sincronizar
+   */
+  sincronizar: (revisiones) => api.post('/revisiones/sincronizar/', { revisiones }),
 };
@@ -32,4 +32,31 @@ export const vehiculosService = {
     const params = responsable ? { responsable } : {};
     return api.get('/vehiculos/estados/', { params });
   },
+
+  /**
+   * Obtiene los equipos que cambiaron entre dos revisiones de un vehículo.
+   * Sin revisiones compara la última con la anterior.
+   * @param {number} id - ID del vehículo
+   * @param {object} params - { revision, anterior, responsable } (opcionales)
+   */
+  getDiferencias: (id, params = {}) => api.get(`/vehiculos/${id}/diferencias/`, { params }),
+
+  /**
+   * Aplica en una sola transacción un lote de cambios al inventario del vehículo.
+   * Elementos con `id` se modifican (p. ej. solo `orden`) y sin `id` se crean;
+   * un equipo nuevo puede ir a un compartimento nuevo del lote usando su `ref`.
+   * Responde { creados: { compartimentos, equipos }, vehiculo } con el árbol actualizado.
+   * @param {number} id - ID del vehículo
+   * @param {object} lote - { compartimentos, equipos, desactivar_compartimentos, desactivar_equipos }
+   */
+  aplicarLote: (id, lote) => api.post(`/vehiculos/${id}/lote/`, lote),
+
+  /**
+   * Copia el inventario del vehículo (plantilla) a otros vehículos.
+   * Con `sincronizar` además iguala orden y cantidades y desactiva lo que la plantilla no tiene.
+   * @param {number} id - ID del vehículo plantilla
+   * @param {number[]} destinos - IDs de los vehículos destino
+   * @param {boolean} sincronizar - Igualar los destinos a la plantilla (opcional)
+   */
+  clonar: (id, destinos, sincronizar = false) => api.post(`/vehiculos/${id}/clonar/`, { destinos, sincronizar }),
 };
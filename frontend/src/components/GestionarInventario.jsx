@@ -50,14 +50,15 @@ const GestionarInventario = ({ responsable, onCambiarResponsable }) => {
     if (!nuevoCompartimento.nombre.trim()) return;
     try {
       setSaving(true);
-      await compartimentosService.create({
-        vehiculo: parseInt(id, 10),
-        nombre: nuevoCompartimento.nombre.trim(),
-        orden: parseInt(nuevoCompartimento.orden, 10) || 0,
-        activo: true,
+      // El lote responde el árbol actualizado: no hace falta volver a pedirlo
+      const response = await vehiculosService.aplicarLote(id, {
+        compartimentos: [{
+          nombre: nuevoCompartimento.nombre.trim(),
+          orden: parseInt(nuevoCompartimento.orden, 10) || 0,
+        }],
       });
-      setNuevoCompartimento({ nombre: '', orden: vehiculo?.compartimentos?.length ?? 0 });
-      await cargarDatos();
+      setVehiculo(response.data.vehiculo);
+      setNuevoCompartimento({ nombre: '', orden: response.data.vehiculo.compartimentos.length });
     } catch (err) {
       console.error('Error creando compartimento:', err);
       setError(err.response?.data ? JSON.stringify(err.response.data) : 'Error al crear compartimento.');
@@ -71,15 +72,16 @@ const GestionarInventario = ({ responsable, onCambiarResponsable }) => {
     if (!nuevoEquipo.nombre.trim() || !nuevoEquipo.compartimento) return;
     try {
       setSaving(true);
-      await equiposService.create({
-        compartimento: parseInt(nuevoEquipo.compartimento, 10),
-        nombre: nuevoEquipo.nombre.trim(),
-        cantidad_esperada: parseInt(nuevoEquipo.cantidad_esperada, 10) || 1,
-        orden: parseInt(nuevoEquipo.orden, 10) || 0,
-        activo: true,
+      const response = await vehiculosService.aplicarLote(id, {
+        equipos: [{
+          compartimento: parseInt(nuevoEquipo.compartimento, 10),
+          nombre: nuevoEquipo.nombre.trim(),
+          cantidad_esperada: parseInt(nuevoEquipo.cantidad_esperada, 10) || 1,
+          orden: parseInt(nuevoEquipo.orden, 10) || 0,
+        }],
       });
+      setVehiculo(response.data.vehiculo);
       setNuevoEquipo({ compartimento: '', nombre: '', cantidad_esperada: 1, orden: 0 });
-      await cargarDatos();
     } catch (err) {
       console.error('Error creando equipo:', err);
       setError(err.response?.data ? JSON.stringify(err.response.data) : 'Error al crear equipo.');
@@ -39,6 +39,20 @@ const VehicleCard = ({ vehiculo, estado, estadoData }) => {
       onClick={handleClick}
       className={`card cursor-pointer border-2 transition-all duration-200 hover:scale-105 ${estadoColors[estadoStr] || estadoColors.pendiente}`}
     >
+      {vehiculo.imagen_srcset?.jpeg && (
+        <picture>
+          {vehiculo.imagen_srcset.webp && (
+            <source type="image/webp" srcSet={vehiculo.imagen_srcset.webp} sizes="(min-width: 768px) 320px, 100vw" />
+          )}
+          <img
+            srcSet={vehiculo.imagen_srcset.jpeg}
+            sizes="(min-width: 768px) 320px, 100vw"
+            alt={vehiculo.nombre || vehiculo.codigo}
+            loading="lazy"
+            className="w-full h-32 object-cover rounded-md mb-4"
+          />
+        </picture>
+      )}
       <div className="flex items-start justify-between mb-4">
         <div>
           <h3 className="text-xl font-bold text-gray-900">{vehiculo.codigo}</h3>
@@ -1,10 +1,105 @@
 """
 Configuración del admin de Django para el sistema de inventario.
+
+Revision y DetalleRevision pueden tener millones de filas. Sus listados traen
+en la misma consulta los objetos relacionados que muestran, filtran solo por
+columnas indexadas o tablas chicas, no cuentan el total sin filtrar y usan un
+conteo estimado cuando la tabla es grande; los formularios eligen revisiones
+y equipos con autocompletado en lugar de listas desplegables completas.
 """
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import EmptyPage, Paginator
+from django.db import DatabaseError, connections, transaction
+from django.utils.functional import cached_property
+
 from .models import Vehiculo, Compartimento, Equipo, Revision, DetalleRevision
 
 
+def filas_estimadas(modelo, alias):
+    """
+    Cantidad aproximada de filas de la tabla según las estadísticas de la base
+    (ANALYZE), sin recorrerla. None si la base no las tiene.
+    """
+    conexion = connections[alias]
+    tabla = modelo._meta.db_table
+    consultas = {
+        'postgresql': ('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [tabla]),
+        'mysql': (
+            'SELECT table_rows FROM information_schema.tables '
+            'WHERE table_schema = DATABASE() AND table_name = %s',
+            [tabla],
+        ),
+        'sqlite': ('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [tabla]),
+    }
+    if conexion.vendor not in consultas:
+        return None
+    sql, params = consultas[conexion.vendor]
+    try:
+        # Punto de guardado: sin estadísticas (sqlite_stat1 no existe) la consulta falla
+        with transaction.atomic(using=alias), conexion.cursor() as cursor:
+            cursor.execute(sql, params)
+            fila = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if fila is None or fila[0] is None:
+        return None
+    # SQLite guarda "filas [filas por valor del índice...]"; PostgreSQL usa -1 si nunca se analizó
+    estimado = int(str(fila[0]).split()[0])
+    return estimado if estimado >= 0 else None
+
+
+class PaginadorConteoEstimado(Paginator):
+    """
+    Paginador para tablas grandes. Sin filtros usa el conteo estimado de la
+    base si supera INVENTARIO_ADMIN_CONTEO_EXACTO_HASTA; con filtros o búsqueda
+    cuenta como máximo hasta ese límite, que pasa a ser el total mostrado.
+
+    Ese total solo se muestra: no limita las páginas. Si es aproximado, al
+    llegar a su última página se ofrece la siguiente mientras tenga filas, y
+    se puede pedir cualquier página posterior que las tenga.
+    """
+
+    aproximado = False
+
+    @cached_property
+    def count(self):
+        consulta = getattr(self.object_list, 'query', None)
+        if consulta is None:
+            return super().count
+        limite = getattr(settings, 'INVENTARIO_ADMIN_CONTEO_EXACTO_HASTA', 10000)
+        if not consulta.where:
+            estimado = filas_estimadas(self.object_list.model, self.object_list.db)
+            if estimado is not None and estimado > limite:
+                self.aproximado = True
+                return estimado
+        # COUNT sobre una subconsulta con LIMIT: se detiene al llegar al límite
+        contadas = self.object_list.order_by()[:limite + 1].count()
+        self.aproximado = contadas > limite
+        return min(contadas, limite)
+
+    def hay_filas_desde(self, numero):
+        """Si la página `numero` tiene filas, aunque quede fuera del total aproximado."""
+        return self.object_list[(numero - 1) * self.per_page:].exists()
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            numero = int(number)
+            if self.count and self.aproximado and numero > 1 and self.hay_filas_desde(numero):
+                return numero
+            raise
+
+    def page(self, number):
+        number = self.validate_number(number)
+        # Al final de un total aproximado se ofrece la página siguiente si tiene filas
+        if self.aproximado and number >= self.num_pages and self.hay_filas_desde(number + 1):
+            self.num_pages = number + 1
+        inferior = (number - 1) * self.per_page
+        return self._get_page(self.object_list[inferior:inferior + self.per_page], number, self)
+
+
 @admin.register(Vehiculo)
 class VehiculoAdmin(admin.ModelAdmin):
     list_display = ('codigo', 'nombre', 'activo', 'fecha_creacion')
@@ -17,6 +112,7 @@ class CompartimentoAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'vehiculo', 'orden', 'activo')
     list_filter = ('vehiculo', 'activo')
     search_fields = ('nombre', 'vehiculo__codigo')
+    autocomplete_fields = ('vehiculo',)
 
 
 @admin.register(Equipo)
@@ -24,14 +120,34 @@ class EquipoAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'compartimento', 'cantidad_esperada', 'orden', 'activo')
     list_filter = ('compartimento__vehiculo', 'activo')
     search_fields = ('nombre', 'compartimento__nombre')
+    # Equipo.__str__ incluye el vehículo del compartimento
+    list_select_related = ('compartimento__vehiculo',)
+    autocomplete_fields = ('compartimento',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # El autocompletado de DetalleRevision muestra el mismo __str__
+        queryset, duplicados = super().get_search_results(request, queryset, search_term)
+        return queryset.select_related('compartimento__vehiculo'), duplicados
 
 
 @admin.register(Revision)
 class RevisionAdmin(admin.ModelAdmin):
-    list_display = ('vehiculo', 'responsable', 'fecha', 'usuario')
-    list_filter = ('vehiculo', 'fecha', 'responsable')
+    list_display = ('vehiculo', 'responsable', 'fecha', 'estado', 'usuario')
+    # Sin filtro por responsable: sus opciones requieren un DISTINCT sobre toda la tabla
+    list_filter = ('estado', 'vehiculo')
     search_fields = ('vehiculo__codigo', 'responsable')
     readonly_fields = ('fecha',)
+    list_select_related = ('vehiculo', 'usuario')
+    autocomplete_fields = ('vehiculo', 'usuario')
+    # Índice (fecha, id): el orden -fecha, -id del listado y la jerarquía no recorren la tabla
+    date_hierarchy = 'fecha'
+    paginator = PaginadorConteoEstimado
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Revision.__str__ incluye el código del vehículo (autocompletado de DetalleRevision)
+        queryset, duplicados = super().get_search_results(request, queryset, search_term)
+        return queryset.select_related('vehiculo'), duplicados
 
 
 @admin.register(DetalleRevision)
@@ -39,3 +155,9 @@ class DetalleRevisionAdmin(admin.ModelAdmin):
     list_display = ('revision', 'equipo', 'estado')
     list_filter = ('estado', 'revision__vehiculo')
     search_fields = ('equipo__nombre', 'revision__vehiculo__codigo')
+    # Los __str__ de la revisión y del equipo recorren hasta el vehículo
+    list_select_related = ('revision__vehiculo', 'equipo__compartimento__vehiculo')
+    autocomplete_fields = ('revision', 'equipo')
+    # Sin date_hierarchy: sobre revision__fecha sería un MIN/MAX y un DISTINCT del join completo
+    paginator = PaginadorConteoEstimado
+    show_full_result_count = False
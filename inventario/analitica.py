@@ -0,0 +1,238 @@
+"""
+Tasas de fallas de equipos por semana o por mes.
+
+Cuenta en la base, por período y por equipo, compartimento o vehículo,
+cuántas veces se revisó cada uno (SI o NO) y cuántas se marcó NO. Los rangos
+se amplían a períodos completos. Un período ya terminado no puede cambiar
+(las revisiones se fechan al guardarse), así que su resultado se guarda en la
+caché y solo se consultan los períodos que faltan y el período en curso.
+La caché guarda solo ids y contadores: los nombres y códigos se agregan al
+leer, así un renombre se ve enseguida. Los detalles de las revisiones
+archivadas se decodifican y se suman a lo contado en la base.
+"""
+import hashlib
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .archivo import decodificar
+from .models import Vehiculo, Compartimento, Equipo, Revision, DetalleRevision
+
+PERIODOS = {'semana': TruncWeek, 'mes': TruncMonth}
+# Ids por agrupación: {nombre en la respuesta: campo de DetalleRevision}
+AGRUPACIONES = {
+    'equipo': {
+        'equipo_id': 'equipo_id',
+        'compartimento_id': 'equipo__compartimento_id',
+        'vehiculo_id': 'revision__vehiculo_id',
+    },
+    'compartimento': {
+        'compartimento_id': 'equipo__compartimento_id',
+        'vehiculo_id': 'revision__vehiculo_id',
+    },
+    'vehiculo': {
+        'vehiculo_id': 'revision__vehiculo_id',
+    },
+}
+# Nombre que acompaña a cada id en la respuesta: {id: (modelo, campo, nombre en la respuesta)}
+NOMBRES = {
+    'equipo_id': (Equipo, 'nombre', 'equipo_nombre'),
+    'compartimento_id': (Compartimento, 'nombre', 'compartimento_nombre'),
+    'vehiculo_id': (Vehiculo, 'codigo', 'vehiculo_codigo'),
+}
+PERIODOS_POR_DEFECTO = 12
+
+
+def _timeout():
+    return getattr(settings, 'INVENTARIO_ANALITICA_CACHE_TIMEOUT', 60 * 60 * 24 * 30)
+
+
+def inicio_periodo(momento, periodo):
+    """Inicio (medianoche local) del período que contiene `momento`."""
+    dia = timezone.localtime(momento).date()
+    dia = dia - timedelta(days=dia.weekday()) if periodo == 'semana' else dia.replace(day=1)
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def siguiente_periodo(inicio, periodo):
+    dia = inicio.date()
+    if periodo == 'semana':
+        dia += timedelta(days=7)
+    else:
+        dia = (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def periodos_entre(desde, hasta, periodo):
+    """Inicios de los períodos que cubren [desde, hasta)."""
+    inicios = []
+    inicio = inicio_periodo(desde, periodo)
+    while inicio < hasta:
+        inicios.append(inicio)
+        inicio = siguiente_periodo(inicio, periodo)
+    return inicios
+
+
+def _clave(agrupar, periodo, inicio, vehiculo_id, responsable):
+    # Sin responsable (None o '') la consulta no filtra: misma clave
+    filtros = hashlib.md5(f'{vehiculo_id}|{responsable or ""}'.encode()).hexdigest()
+    return f'inventario:analitica:{agrupar}:{periodo}:{inicio.date().isoformat()}:{filtros}'
+
+
+def _sumar_archivadas(contadas, campos, periodo, revisiones):
+    """Suma a `contadas` ({(inicio, *valores): fila}) los detalles de las revisiones archivadas."""
+    revisiones = list(revisiones.filter(detalles_archivados__isnull=False).values(
+        'fecha', 'vehiculo_id', 'detalles_archivados',
+    ))
+    if not revisiones:
+        return
+    detalles = [(revision, decodificar(revision.pop('detalles_archivados'))) for revision in revisiones]
+    # Equipos eliminados después de archivar: en la tabla se habrían borrado en cascada
+    equipos = {
+        equipo['equipo_id']: equipo
+        for equipo in Equipo.objects.filter(
+            id__in={equipo_id for _, lista in detalles for equipo_id, _, _ in lista}
+        ).values('compartimento_id', equipo_id=F('id'))
+    }
+    for revision, lista in detalles:
+        inicio = inicio_periodo(revision['fecha'], periodo).date()
+        for equipo_id, estado, _ in lista:
+            if estado not in ('si', 'no') or equipo_id not in equipos:
+                continue
+            valores = {**revision, **equipos[equipo_id]}
+            clave = (inicio, *(valores[nombre] for nombre in campos))
+            fila = contadas.setdefault(clave, {
+                **{nombre: valores[nombre] for nombre in campos}, 'revisados': 0, 'fallas': 0,
+            })
+            fila['revisados'] += 1
+            fila['fallas'] += estado == 'no'
+
+
+def _consultar(agrupar, periodo, desde, hasta, vehiculo_id, responsable):
+    """Agrega los detalles de [desde, hasta), en la base y archivados. Retorna {inicio: [filas]}."""
+    campos = AGRUPACIONES[agrupar]
+    revisiones = Revision.objects.filter(fecha__gte=desde, fecha__lt=hasta)
+    detalles = DetalleRevision.objects.filter(
+        revision__fecha__gte=desde, revision__fecha__lt=hasta, estado__in=['si', 'no'],
+    )
+    if vehiculo_id is not None:
+        revisiones = revisiones.filter(vehiculo_id=vehiculo_id)
+        detalles = detalles.filter(revision__vehiculo_id=vehiculo_id)
+    if responsable:
+        revisiones = revisiones.filter(responsable=responsable)
+        detalles = detalles.filter(revision__responsable=responsable)
+
+    consulta = detalles.annotate(
+        periodo=PERIODOS[periodo]('revision__fecha'),
+        **{nombre: F(campo) for nombre, campo in campos.items() if nombre != campo},
+    ).values('periodo', *campos).annotate(
+        revisados=Count('id'),
+        fallas=Count('id', filter=Q(estado='no')),
+    ).order_by('periodo', '-fallas', *campos)
+
+    contadas = {}
+    for fila in consulta:
+        inicio = timezone.localtime(fila.pop('periodo')).date()
+        contadas[(inicio, *(fila[nombre] for nombre in campos))] = fila
+    _sumar_archivadas(contadas, campos, periodo, revisiones)
+
+    resultados = {}
+    # Orden estable: dentro de cada período, primero las filas con más fallas
+    for (inicio, *_), fila in sorted(contadas.items(), key=lambda par: (par[0][0], -par[1]['fallas'])):
+        fila['tasa_fallas'] = round(fila['fallas'] / fila['revisados'], 4)
+        resultados.setdefault(inicio, []).append(fila)
+    return resultados
+
+
+def _agregar_nombres(filas):
+    """
+    Copia de cada fila con el nombre o código de cada id, con una consulta por
+    tipo de id. None para las filas de algo que ya no existe: al recalcularlas
+    no aparecerían.
+    """
+    nombres = {}
+    for id_campo in filas[0] if filas else ():
+        if id_campo in NOMBRES:
+            modelo, campo, _ = NOMBRES[id_campo]
+            nombres[id_campo] = dict(modelo.objects.filter(
+                id__in={fila[id_campo] for fila in filas}
+            ).values_list('id', campo))
+    completas = []
+    for fila in filas:
+        if any(fila[id_campo] not in valores for id_campo, valores in nombres.items()):
+            completas.append(None)
+            continue
+        completa = {}
+        for id_campo, valor in fila.items():
+            completa[id_campo] = valor
+            if id_campo in nombres:
+                completa[NOMBRES[id_campo][2]] = nombres[id_campo][valor]
+        completas.append(completa)
+    return completas
+
+
+def tasas_fallas(agrupar='equipo', periodo='semana', desde=None, hasta=None,
+                 vehiculo_id=None, responsable=None, incluir_sin_fallas=False):
+    """
+    Tasas de fallas por período entre `desde` y `hasta` (datetimes; por defecto
+    los últimos PERIODOS_POR_DEFECTO períodos). Retorna un dict con los límites
+    usados y la lista 'periodos' [{'inicio', 'cerrado', 'filas'}].
+    """
+    ahora = timezone.now()
+    hasta = min(hasta or ahora, ahora)
+    if desde is None:
+        desde = inicio_periodo(ahora, periodo)
+        for _ in range(PERIODOS_POR_DEFECTO - 1):
+            desde = inicio_periodo(desde - timedelta(days=1), periodo)
+    inicios = periodos_entre(desde, hasta, periodo)
+
+    cache = caches[getattr(settings, 'INVENTARIO_CACHE_ALIAS', 'default')]
+    cerrados = {
+        inicio: _clave(agrupar, periodo, inicio, vehiculo_id, responsable)
+        for inicio in inicios if siguiente_periodo(inicio, periodo) <= ahora
+    }
+    guardados = cache.get_many(cerrados.values())
+    pendientes = [
+        inicio for inicio in inicios
+        if inicio not in cerrados or cerrados[inicio] not in guardados
+    ]
+
+    filas = {}
+    if pendientes:
+        # Una sola consulta desde el primer período faltante hasta el último
+        consultados = _consultar(
+            agrupar, periodo, pendientes[0], siguiente_periodo(pendientes[-1], periodo),
+            vehiculo_id, responsable,
+        )
+        nuevos = {}
+        for inicio in pendientes:
+            filas[inicio] = consultados.get(inicio.date(), [])
+            if inicio in cerrados:
+                nuevos[cerrados[inicio]] = filas[inicio]
+        cache.set_many(nuevos, _timeout())
+
+    por_periodo = {}
+    for inicio in inicios:
+        datos = filas[inicio] if inicio in filas else guardados[cerrados[inicio]]
+        por_periodo[inicio] = [fila for fila in datos if incluir_sin_fallas or fila['fallas']]
+    # Los nombres de todos los períodos juntos, con los valores actuales
+    completas = iter(_agregar_nombres([fila for datos in por_periodo.values() for fila in datos]))
+    periodos = []
+    for inicio, datos in por_periodo.items():
+        periodos.append({
+            'inicio': inicio.date().isoformat(),
+            'cerrado': inicio in cerrados,
+            'filas': [fila for fila in (next(completas) for _ in datos) if fila is not None],
+        })
+
+    return {
+        'agrupar': agrupar,
+        'periodo': periodo,
+        'desde': inicios[0].isoformat() if inicios else None,
+        'hasta': siguiente_periodo(inicios[-1], periodo).isoformat() if inicios else None,
+        'periodos': periodos,
+    }
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class InventarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventario'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Instalan sus execute_wrapper en cada conexión nueva
+        from . import metricas, detector_consultas  # noqa: F401
@@ -0,0 +1,136 @@
+"""
+Archivo compacto de los detalles de revisiones antiguas.
+
+DetalleRevision tiene una fila por equipo y por revisión y es la tabla más
+grande. Al archivar una revisión sus detalles se guardan en
+`Revision.detalles_archivados` y se borran de la tabla:
+
+    {'v': 1,
+     'equipos': [12, 1, 1, 3],          # ids ordenados, como diferencias
+     'estados': 'ssnp',                 # un carácter por equipo
+     'observaciones': {'14': 'Vencido'}}  # solo las no vacías
+
+El resumen de la revisión (contadores y estado) no cambia, así que estados y
+snapshots siguen igual. cargar_archivados() reconstruye los detalles para que
+la API y las exportaciones los lean como si siguieran en la tabla.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Equipo, Revision, DetalleRevision
+
+VERSION = 1
+CODIGOS = {'si': 's', 'no': 'n', 'pendiente': 'p'}
+ESTADOS = {codigo: estado for estado, codigo in CODIGOS.items()}
+
+
+def antiguedad_archivo():
+    return timedelta(days=getattr(settings, 'INVENTARIO_ARCHIVO_DIAS', 365))
+
+
+def codificar(detalles):
+    """Codifica una lista de (equipo_id, estado, observaciones)."""
+    detalles = sorted(detalles)
+    equipos, anterior = [], 0
+    for equipo_id, _, _ in detalles:
+        equipos.append(equipo_id - anterior)
+        anterior = equipo_id
+    return {
+        'v': VERSION,
+        'equipos': equipos,
+        'estados': ''.join(CODIGOS[estado] for _, estado, _ in detalles),
+        'observaciones': {str(equipo_id): texto for equipo_id, _, texto in detalles if texto},
+    }
+
+
+def decodificar(archivo):
+    """Lista de (equipo_id, estado, observaciones) ordenada por equipo."""
+    detalles, equipo_id = [], 0
+    observaciones = archivo.get('observaciones', {})
+    for diferencia, codigo in zip(archivo['equipos'], archivo['estados']):
+        equipo_id += diferencia
+        detalles.append((equipo_id, ESTADOS[codigo], observaciones.get(str(equipo_id), '')))
+    return detalles
+
+
+def archivar_revisiones(antes_de, lote=500):
+    """
+    Archiva las revisiones con fecha anterior a `antes_de`, de a `lote` por
+    transacción. Retorna (revisiones, detalles) archivados.
+    """
+    total_revisiones = total_detalles = 0
+    pendientes = Revision.objects.filter(fecha__lt=antes_de, detalles_archivados__isnull=True)
+    while True:
+        with transaction.atomic():
+            # Lectura, codificación y borrado en la misma transacción. En PostgreSQL
+            # y MySQL el bloqueo impide agregar detalles a estas revisiones hasta el
+            # final; en SQLite select_for_update() no hace nada y solo queda el
+            # bloqueo de SQLite sobre las escrituras. Una vez archivada, la revisión
+            # ya no acepta detalles (DetalleRevision.clean()).
+            ids = list(pendientes.select_for_update().order_by('id').values_list('id', flat=True)[:lote])
+            if not ids:
+                break
+            por_revision = {revision_id: [] for revision_id in ids}
+            for revision_id, equipo_id, estado, observaciones in DetalleRevision.objects.filter(
+                revision_id__in=ids
+            ).values_list('revision_id', 'equipo_id', 'estado', 'observaciones'):
+                por_revision[revision_id].append((equipo_id, estado, observaciones))
+
+            Revision.objects.bulk_update([
+                Revision(id=revision_id, detalles_archivados=codificar(detalles))
+                for revision_id, detalles in por_revision.items()
+            ], ['detalles_archivados'])
+            # QuerySet._raw_delete() es interno de Django (el borrado rápido del
+            # Collector): un DELETE sin cargar las filas ni enviar señales. Aquí
+            # es lo correcto: detalle_eliminado recalcularía el resumen de cada
+            # revisión, que no cambia al archivar, y ninguna tabla apunta a
+            # DetalleRevision, así que no hay cascadas que se salteen.
+            detalles = DetalleRevision.objects.filter(revision_id__in=ids)
+            borrados = detalles._raw_delete(detalles.db)
+
+        total_revisiones += len(ids)
+        total_detalles += borrados
+    return total_revisiones, total_detalles
+
+
+def _asignar(revisiones, equipos):
+    for revision in revisiones:
+        revision._prefetched_objects_cache['detalles_revision'] = [
+            DetalleRevision(revision=revision, equipo=equipos[equipo_id], estado=estado, observaciones=texto)
+            for equipo_id, estado, texto in decodificar(revision.detalles_archivados)
+            # Equipos eliminados después de archivar: en la tabla se habrían borrado en cascada
+            if equipo_id in equipos
+        ]
+
+
+def _archivadas(revisiones):
+    archivadas = [revision for revision in revisiones if revision.detalles_archivados]
+    for revision in archivadas:
+        if not hasattr(revision, '_prefetched_objects_cache'):
+            revision._prefetched_objects_cache = {}
+    equipo_ids = {
+        equipo_id for revision in archivadas for equipo_id, _, _ in decodificar(revision.detalles_archivados)
+    }
+    return archivadas, equipo_ids
+
+
+def cargar_archivados(revisiones):
+    """
+    Reconstruye los detalles de las revisiones archivadas como si se hubieran
+    precargado con prefetch_related('detalles_revision'). Una consulta en total.
+    """
+    archivadas, equipo_ids = _archivadas(revisiones)
+    if archivadas:
+        _asignar(archivadas, Equipo.objects.select_related('compartimento').in_bulk(equipo_ids))
+    return revisiones
+
+
+async def acargar_archivados(revisiones):
+    """Versión asíncrona de cargar_archivados()."""
+    archivadas, equipo_ids = _archivadas(revisiones)
+    if archivadas:
+        _asignar(archivadas, await Equipo.objects.select_related('compartimento').ain_bulk(equipo_ids))
+    return revisiones
@@ -0,0 +1,373 @@
+"""
+Arnés de benchmark de los endpoints de la API.
+
+Ejecuta cada endpoint dentro del proceso con el cliente de pruebas de Django
+y mide latencia (percentiles), consultas SQL y memoria máxima por petición.
+Lo usa el comando `benchmark_api`.
+"""
+import asyncio
+import json
+import queue
+import statistics
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from .models import Vehiculo, Compartimento, Equipo, Revision
+
+
+class _Revertir(Exception):
+    """Se lanza para deshacer la transacción de un endpoint de escritura."""
+
+
+def percentil(valores, p):
+    """Percentil `p` (0-100) por interpolación lineal."""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    posicion = (len(ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicion - inferior)
+
+
+def endpoints_por_defecto(escrituras=False):
+    """
+    Arma la lista de endpoints a medir usando datos existentes de la base.
+    Cada endpoint es un dict con 'nombre', 'metodo', 'url' y opcionalmente 'datos'.
+    """
+    vehiculo = Vehiculo.objects.filter(activo=True).order_by('id').first()
+    endpoints = [
+        {'nombre': 'vehiculos-list', 'metodo': 'get', 'url': '/api/vehiculos/'},
+        {'nombre': 'vehiculos-list-expand', 'metodo': 'get', 'url': '/api/vehiculos/?expand=compartimentos'},
+        {'nombre': 'vehiculos-estados', 'metodo': 'get', 'url': '/api/vehiculos/estados/'},
+        {'nombre': 'revisiones-list', 'metodo': 'get', 'url': '/api/revisiones/'},
+    ]
+    if vehiculo is None:
+        return endpoints
+
+    endpoints += [
+        {'nombre': 'vehiculos-retrieve', 'metodo': 'get', 'url': f'/api/vehiculos/{vehiculo.id}/'},
+        {'nombre': 'vehiculos-estado', 'metodo': 'get', 'url': f'/api/vehiculos/{vehiculo.id}/estado/'},
+        {'nombre': 'compartimentos-list', 'metodo': 'get', 'url': f'/api/compartimentos/?vehiculo={vehiculo.id}'},
+        {'nombre': 'equipos-list', 'metodo': 'get', 'url': f'/api/equipos/?vehiculo={vehiculo.id}'},
+        {'nombre': 'revisiones-list-vehiculo', 'metodo': 'get', 'url': f'/api/revisiones/?vehiculo={vehiculo.id}'},
+    ]
+    compartimento = Compartimento.objects.filter(vehiculo=vehiculo).first()
+    if compartimento:
+        endpoints.append({
+            'nombre': 'compartimentos-retrieve', 'metodo': 'get',
+            'url': f'/api/compartimentos/{compartimento.id}/',
+        })
+    revision = Revision.objects.filter(vehiculo=vehiculo).order_by('-fecha').first()
+    if revision:
+        endpoints.append({
+            'nombre': 'revisiones-retrieve', 'metodo': 'get', 'url': f'/api/revisiones/{revision.id}/',
+        })
+
+    if escrituras:
+        equipo_ids = list(Equipo.objects.filter(
+            compartimento__vehiculo=vehiculo, activo=True
+        ).values_list('id', flat=True))
+        endpoints.append({
+            'nombre': 'revisiones-create', 'metodo': 'post', 'url': '/api/revisiones/',
+            'datos': {
+                'vehiculo': vehiculo.id,
+                'responsable': 'Benchmark',
+                'detalles': [{'equipo': equipo_id, 'estado': 'si'} for equipo_id in equipo_ids],
+            },
+        })
+    return endpoints
+
+
+def medir_endpoint(cliente, endpoint, repeticiones, cache_fria=True):
+    """Ejecuta un endpoint `repeticiones` veces y retorna sus métricas."""
+    latencias = []
+    consultas = []
+    memoria = []
+    response = None
+
+    for _ in range(repeticiones):
+        if cache_fria:
+            cache.clear()
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                response = _ejecutar(cliente, endpoint)
+                latencias.append((time.perf_counter() - inicio) * 1000)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        consultas.append(len(capturadas))
+        memoria.append(pico)
+
+    return {
+        'metodo': endpoint['metodo'].upper(),
+        'url': endpoint['url'],
+        'estado_http': response.status_code,
+        'repeticiones': repeticiones,
+        'bytes': len(response.content),
+        'codificacion': response.get('Content-Encoding', 'identity'),
+        'latencia_ms': {
+            'min': round(min(latencias), 3),
+            'p50': round(percentil(latencias, 50), 3),
+            'p90': round(percentil(latencias, 90), 3),
+            'p99': round(percentil(latencias, 99), 3),
+            'max': round(max(latencias), 3),
+            'media': round(statistics.fmean(latencias), 3),
+        },
+        'consultas': {'min': min(consultas), 'max': max(consultas)},
+        'memoria_pico_kb': round(max(memoria) / 1024, 1),
+    }
+
+
+def _ejecutar(cliente, endpoint):
+    """Ejecuta una petición; las escrituras se revierten para no alterar los datos."""
+    metodo = getattr(cliente, endpoint['metodo'])
+    if endpoint['metodo'] == 'get':
+        return metodo(endpoint['url'])
+
+    response = None
+    try:
+        with transaction.atomic():
+            response = metodo(
+                endpoint['url'], data=json.dumps(endpoint['datos']), content_type='application/json'
+            )
+            raise _Revertir
+    except _Revertir:
+        pass
+    return response
+
+
+def ejecutar_benchmark(endpoints, repeticiones=20, calentamiento=2, cache_fria=True, host='localhost',
+                       gzip=False):
+    """
+    Mide todos los endpoints y retorna un dict listo para guardar como JSON.
+    Con gzip=True las peticiones aceptan respuestas comprimidas.
+    """
+    cliente = Client(HTTP_HOST=host, HTTP_ACCEPT_ENCODING='gzip' if gzip else 'identity')
+    resultados = {}
+    for endpoint in endpoints:
+        for _ in range(calentamiento):
+            _ejecutar(cliente, endpoint)
+        resultados[endpoint['nombre']] = medir_endpoint(cliente, endpoint, repeticiones, cache_fria)
+
+    return {
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'base_de_datos': connection.vendor,
+        'cache': 'fria' if cache_fria else 'caliente',
+        'gzip': gzip,
+        'datos': {
+            'vehiculos': Vehiculo.objects.count(),
+            'compartimentos': Compartimento.objects.count(),
+            'equipos': Equipo.objects.count(),
+            'revisiones': Revision.objects.count(),
+        },
+        'endpoints': resultados,
+    }
+
+
+def endpoints_concurrentes():
+    """
+    Pares de endpoints equivalentes (síncrono WSGI, asíncrono ASGI) para medir
+    rendimiento con muchos clientes a la vez.
+    """
+    pares = [
+        {'nombre': 'estados', 'wsgi': '/api/vehiculos/estados/', 'asgi': '/api/async/vehiculos/estados/'},
+        {
+            'nombre': 'revisiones',
+            'wsgi': '/api/revisiones/?paginacion=cursor&page_size=20',
+            'asgi': '/api/async/revisiones/?page_size=20',
+        },
+    ]
+    vehiculo = Vehiculo.objects.filter(activo=True).order_by('id').first()
+    if vehiculo:
+        pares.append({
+            'nombre': 'estado-vehiculo',
+            'wsgi': f'/api/vehiculos/{vehiculo.id}/estado/',
+            'asgi': f'/api/async/vehiculos/{vehiculo.id}/estado/',
+        })
+    return pares
+
+
+def _resumen_concurrencia(latencias, errores, segundos):
+    return {
+        'peticiones': len(latencias),
+        'errores': errores,
+        'segundos': round(segundos, 3),
+        'peticiones_por_segundo': round(len(latencias) / segundos, 1) if segundos else None,
+        'latencia_ms': {
+            'p50': round(percentil(latencias, 50), 3),
+            'p90': round(percentil(latencias, 90), 3),
+            'p99': round(percentil(latencias, 99), 3),
+        },
+    }
+
+
+def _entorno_wsgi(url, host):
+    return RequestFactory(HTTP_HOST=host).get(url).environ
+
+
+def medir_wsgi(url, clientes, peticiones, trabajadores, host='localhost'):
+    """
+    Simula un servidor WSGI con `trabajadores` hilos: los `clientes` envían una
+    petición apenas reciben la respuesta anterior y esperan en cola mientras
+    todos los workers están ocupados. La latencia incluye esa espera.
+    """
+    aplicacion = WSGIHandler()
+    pendientes = [peticiones // clientes + (n < peticiones % clientes) for n in range(clientes)]
+    cola = queue.Queue()
+    candado = threading.Lock()
+    latencias = []
+    errores = [0]
+
+    for numero, cantidad in enumerate(pendientes):
+        if cantidad:
+            pendientes[numero] -= 1
+            cola.put((time.perf_counter(), numero))
+
+    def trabajador():
+        try:
+            while True:
+                tarea = cola.get()
+                if tarea is None:
+                    return
+                enviada, numero = tarea
+                estado = []
+                respuesta = aplicacion(_entorno_wsgi(url, host), lambda status, headers: estado.append(status))
+                b''.join(respuesta)
+                respuesta.close()
+                with candado:
+                    latencias.append((time.perf_counter() - enviada) * 1000)
+                    errores[0] += int(estado[0].split()[0]) >= 400
+                    if pendientes[numero]:
+                        pendientes[numero] -= 1
+                        cola.put((time.perf_counter(), numero))
+                    elif len(latencias) == peticiones:
+                        for _ in range(trabajadores):
+                            cola.put(None)
+        finally:
+            connections.close_all()
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(trabajadores)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return _resumen_concurrencia(latencias, errores[0], time.perf_counter() - inicio)
+
+
+def medir_asgi(url, clientes, peticiones, host='localhost'):
+    """
+    Atiende `clientes` simultáneos en un único bucle de eventos, llamando a la
+    aplicación ASGI de Django igual que lo haría un servidor como uvicorn.
+    """
+    aplicacion = ASGIHandler()
+    ruta, _, consulta = url.partition('?')
+    latencias = []
+    errores = 0
+
+    async def peticion():
+        cuerpo_enviado = False
+        desconexion = asyncio.Event()
+        estado = []
+
+        async def recibir():
+            nonlocal cuerpo_enviado
+            if not cuerpo_enviado:
+                cuerpo_enviado = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await desconexion.wait()
+            return {'type': 'http.disconnect'}
+
+        async def enviar(mensaje):
+            if mensaje['type'] == 'http.response.start':
+                estado.append(mensaje['status'])
+
+        await aplicacion({
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': ruta, 'raw_path': ruta.encode(),
+            'query_string': consulta.encode(), 'root_path': '',
+            'headers': [(b'host', host.encode())],
+            'client': ('127.0.0.1', 0), 'server': (host, 80),
+        }, recibir, enviar)
+        desconexion.set()
+        return estado[0]
+
+    async def cliente_asgi(cantidad):
+        nonlocal errores
+        for _ in range(cantidad):
+            inicio = time.perf_counter()
+            estado_http = await peticion()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            errores += estado_http >= 400
+
+    async def principal():
+        cantidades = [peticiones // clientes + (n < peticiones % clientes) for n in range(clientes)]
+        await asyncio.gather(*(cliente_asgi(cantidad) for cantidad in cantidades if cantidad))
+
+    inicio = time.perf_counter()
+    asyncio.run(principal())
+    return _resumen_concurrencia(latencias, errores, time.perf_counter() - inicio)
+
+
+@contextmanager
+def latencia_bd_simulada(milisegundos):
+    """
+    Agrega una espera fija a cada consulta, en todas las conexiones que se abran
+    en el bloque. Modela una base de datos en red (p. ej. PostgreSQL) cuando se
+    mide sobre un SQLite local, donde las consultas no esperan I/O.
+    """
+    def esperar(execute, sql, params, many, context):
+        time.sleep(milisegundos / 1000)
+        return execute(sql, params, many, context)
+
+    def instalar(sender, connection, **kwargs):
+        # Un mismo wrapper de conexión se reconecta en cada petición
+        if esperar not in connection.execute_wrappers:
+            connection.execute_wrappers.append(esperar)
+
+    if not milisegundos:
+        yield
+        return
+    connections.close_all()
+    connection_created.connect(instalar)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(instalar)
+        for conexion in connections.all(initialized_only=True):
+            if esperar in conexion.execute_wrappers:
+                conexion.execute_wrappers.remove(esperar)
+        connections.close_all()
+
+
+def ejecutar_concurrencia(pares, clientes=50, peticiones=500, trabajadores_wsgi=4, latencia_bd_ms=0,
+                          host='localhost'):
+    """Mide cada par de endpoints por WSGI y por ASGI con la misma carga."""
+    resultados = {}
+    with latencia_bd_simulada(latencia_bd_ms):
+        for par in pares:
+            cache.clear()
+            resultados[par['nombre']] = {
+                'wsgi': medir_wsgi(par['wsgi'], clientes, peticiones, trabajadores_wsgi, host),
+                'asgi': medir_asgi(par['asgi'], clientes, peticiones, host),
+            }
+    return {
+        'clientes': clientes,
+        'peticiones': peticiones,
+        'trabajadores_wsgi': trabajadores_wsgi,
+        'latencia_bd_ms': latencia_bd_ms,
+        'pares': resultados,
+    }
@@ -0,0 +1,104 @@
+"""
+Caché versionada del inventario serializado.
+
+Guarda la representación serializada de cada vehículo (con su árbol de
+compartimentos y equipos) y de los listados completos en el framework de caché
+de Django. Las claves incluyen el sello de versión del inventario, así que
+cualquier escritura sobre un compartimento o equipo (API, admin o bulk) deja
+obsoletas solo las entradas del vehículo afectado y de los listados.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+_contadores = {'aciertos': 0, 'fallos': 0}
+_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'INVENTARIO_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'INVENTARIO_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def _contar(aciertos=0, fallos=0):
+    with _lock:
+        _contadores['aciertos'] += aciertos
+        _contadores['fallos'] += fallos
+
+
+def estadisticas():
+    """Contadores de aciertos y fallos de este proceso."""
+    with _lock:
+        aciertos, fallos = _contadores['aciertos'], _contadores['fallos']
+    total = aciertos + fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': round(aciertos / total, 4) if total else None,
+    }
+
+
+def reiniciar_estadisticas():
+    with _lock:
+        _contadores['aciertos'] = 0
+        _contadores['fallos'] = 0
+
+
+def _hash(texto):
+    return hashlib.md5(texto.encode()).hexdigest()
+
+
+def clave_vehiculo(vehiculo, request):
+    """
+    Clave de un vehículo serializado. Incluye su versión y fecha de
+    actualización, y la URL base porque las imágenes se serializan absolutas.
+    """
+    marca = vehiculo.fecha_actualizacion.timestamp() if vehiculo.fecha_actualizacion else 0
+    return 'inventario:vehiculo:%s:%s:%s:%s' % (
+        vehiculo.pk, vehiculo.version_inventario, marca,
+        _hash(request.build_absolute_uri('/')),
+    )
+
+
+def clave_listado(sello, request):
+    """Clave de un listado completo: sello del inventario y URL con sus parámetros."""
+    return 'inventario:listado:%s' % _hash('%s|%s' % (sello['clave'], request.build_absolute_uri()))
+
+
+def vehiculos_serializados(vehiculos, serializar, request):
+    """
+    Retorna la representación de cada vehículo, en el mismo orden, leyendo de la
+    caché y serializando con `serializar(lista_de_vehiculos)` solo los que faltan.
+    """
+    cache = _cache()
+    claves = [clave_vehiculo(vehiculo, request) for vehiculo in vehiculos]
+    encontrados = cache.get_many(claves)
+    faltantes = [vehiculo for vehiculo, clave in zip(vehiculos, claves) if clave not in encontrados]
+    _contar(aciertos=len(encontrados), fallos=len(faltantes))
+
+    if faltantes:
+        nuevos = dict(zip(
+            [clave_vehiculo(vehiculo, request) for vehiculo in faltantes],
+            serializar(faltantes),
+        ))
+        cache.set_many(nuevos, _timeout())
+        encontrados.update(nuevos)
+
+    return [encontrados[clave] for clave in claves]
+
+
+def obtener_listado(sello, request):
+    """Listado guardado para este sello y URL, o None."""
+    data = _cache().get(clave_listado(sello, request))
+    _contar(aciertos=data is not None, fallos=data is None)
+    return data
+
+
+def guardar_listado(sello, request, data):
+    _cache().set(clave_listado(sello, request), data, _timeout())
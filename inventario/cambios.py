@@ -0,0 +1,71 @@
+"""
+Sincronización incremental del inventario (compartimentos y equipos).
+
+El cliente guarda una copia local y pide solo lo que cambió desde la marca
+de tiempo que recibió en la sincronización anterior: filas creadas o
+modificadas (incluidas las desactivadas con activo=False) por su
+`fecha_actualizacion`, y filas que salieron del inventario por los registros
+de RegistroEliminado. Sin marca, o con una más antigua que la retención de
+los registros, se responde el inventario completo.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Compartimento, Equipo, RegistroEliminado
+
+# Las filas se sellan al guardarse pero se ven al confirmarse la transacción:
+# la marca devuelta se atrasa este margen para no perder escrituras en curso.
+MARGEN_TRANSACCIONES = timedelta(seconds=5)
+
+
+def retencion_eliminados():
+    return timedelta(days=getattr(settings, 'INVENTARIO_RETENCION_ELIMINADOS_DIAS', 90))
+
+
+def registrar_eliminados(modelo, objeto_ids, vehiculo_id):
+    """Guarda los registros de filas que salieron del inventario de un vehículo."""
+    ahora = timezone.now()
+    RegistroEliminado.objects.bulk_create([
+        RegistroEliminado(modelo=modelo, objeto_id=objeto_id, vehiculo_id=vehiculo_id, fecha=ahora)
+        for objeto_id in objeto_ids
+    ], batch_size=500)
+
+
+def cambios_desde(desde=None, vehiculo_id=None):
+    """
+    Retorna los cambios del inventario posteriores a `desde` (datetime o None).
+    Dict con 'hasta' (marca para la próxima llamada), 'completo', los querysets
+    'compartimentos' y 'equipos', y las listas de ids 'eliminados'.
+    """
+    ahora = timezone.now()
+    completo = desde is None or desde < ahora - retencion_eliminados()
+
+    compartimentos = Compartimento.objects.all()
+    equipos = Equipo.objects.all()
+    eliminados = RegistroEliminado.objects.none()
+    if vehiculo_id is not None:
+        compartimentos = compartimentos.filter(vehiculo_id=vehiculo_id)
+        equipos = equipos.filter(compartimento__vehiculo_id=vehiculo_id)
+    if not completo:
+        compartimentos = compartimentos.filter(fecha_actualizacion__gte=desde)
+        equipos = equipos.filter(fecha_actualizacion__gte=desde)
+        eliminados = RegistroEliminado.objects.filter(fecha__gte=desde)
+        if vehiculo_id is not None:
+            eliminados = eliminados.filter(vehiculo_id=vehiculo_id)
+
+    ids_eliminados = {'compartimento': set(), 'equipo': set()}
+    for modelo, objeto_id in eliminados.values_list('modelo', 'objeto_id'):
+        ids_eliminados[modelo].add(objeto_id)
+
+    return {
+        'hasta': ahora - MARGEN_TRANSACCIONES,
+        'completo': completo,
+        'compartimentos': compartimentos.order_by('id'),
+        'equipos': equipos.order_by('id'),
+        'eliminados': {
+            'compartimentos': sorted(ids_eliminados['compartimento']),
+            'equipos': sorted(ids_eliminados['equipo']),
+        },
+    }
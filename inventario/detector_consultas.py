@@ -0,0 +1,143 @@
+"""
+Detector de consultas N+1 y consultas lentas, para desarrollo y tests.
+
+Mientras está activo (detectar_consultas() o DetectorConsultasMiddleware)
+agrupa las consultas por su forma: el SQL con los parámetros separados y las
+listas IN colapsadas. Si una misma forma se repite INVENTARIO_N1_UMBRAL veces
+en una petición, casi siempre es un bucle que consulta fila por fila; se
+informa con la pila de llamadas del código del proyecto que la disparó. También
+se informan las consultas que tardan más de INVENTARIO_CONSULTA_LENTA_MS.
+
+Activar con INVENTARIO_DETECTAR_CONSULTAS = 'log' (solo registra en el logger
+`inventario.consultas`) o 'estricto' (además lanza ConsultasProblematicas, que
+hace fallar el test que hizo la petición). Las formas conocidas y aceptadas
+se excluyen con INVENTARIO_CONSULTAS_IGNORADAS (expresiones regulares).
+"""
+import logging
+import re
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('inventario.consultas')
+
+_activo = ContextVar('inventario_detector_consultas', default=None)
+_LISTA_IN = re.compile(r'IN \((?:%s, )*%s\)')
+_RAIZ = str(Path(__file__).resolve().parent.parent)
+# Instrumentación propia: no aporta a la pila informada
+_EXCLUIDOS = {
+    str(Path(__file__).resolve().parent / nombre)
+    for nombre in ('detector_consultas.py', 'metricas.py', 'middleware.py')
+}
+
+
+class ConsultasProblematicas(AssertionError):
+    """Consultas repetidas o lentas detectadas en modo estricto."""
+
+    def __init__(self, problemas):
+        self.problemas = problemas
+        super().__init__('\n\n'.join(formatear(problema) for problema in problemas))
+
+
+def forma(sql):
+    """SQL normalizado: iguales para consultas que solo difieren en sus parámetros."""
+    return _LISTA_IN.sub('IN (...)', sql)
+
+
+def pila_del_proyecto():
+    """Frames del código del proyecto (sin Django, DRF ni la instrumentación), del más externo al más interno."""
+    return [
+        f'{frame.filename.replace(_RAIZ, "").lstrip("/")}:{frame.lineno} en {frame.name}: {frame.line}'
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(_RAIZ) and frame.filename not in _EXCLUIDOS
+        and 'site-packages' not in frame.filename
+    ]
+
+
+def formatear(problema):
+    if problema['tipo'] == 'n+1':
+        titulo = f"N+1: la misma consulta se ejecutó {problema['veces']} veces"
+    else:
+        titulo = f"Consulta lenta: {problema['duracion_ms']:.1f} ms"
+    lineas = [titulo, f"  {problema['sql']}"]
+    lineas += [f'    {frame}' for frame in problema['pila']]
+    return '\n'.join(lineas)
+
+
+class _Sesion:
+    """Consultas observadas dentro de un detectar_consultas()."""
+
+    def __init__(self, umbral, lenta_ms, ignoradas):
+        self.umbral = umbral
+        self.lenta = lenta_ms / 1000 if lenta_ms else None
+        self.ignoradas = [re.compile(patron) for patron in ignoradas]
+        self.formas = {}
+        self.problemas = []
+
+    def registrar(self, sql, duracion):
+        clave = forma(sql)
+        if any(patron.search(clave) for patron in self.ignoradas):
+            return
+        veces = self.formas.get(clave, 0) + 1
+        self.formas[clave] = veces
+        # La pila se toma una sola vez por forma repetida: el costo queda fuera del caso normal
+        if veces == self.umbral:
+            self.problemas.append({'tipo': 'n+1', 'sql': clave, 'veces': veces, 'pila': pila_del_proyecto()})
+        if self.lenta is not None and duracion > self.lenta:
+            self.problemas.append({
+                'tipo': 'lenta', 'sql': clave, 'duracion_ms': duracion * 1000, 'pila': pila_del_proyecto(),
+            })
+
+    def cerrar(self):
+        for problema in self.problemas:
+            if problema['tipo'] == 'n+1':
+                problema['veces'] = self.formas[problema['sql']]
+
+
+def _observar(execute, sql, params, many, context):
+    sesion = _activo.get()
+    if sesion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sesion.registrar(sql, time.perf_counter() - inicio)
+
+
+def _instalar(sender, connection, **kwargs):
+    if _observar not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_observar)
+
+
+connection_created.connect(_instalar, dispatch_uid='inventario_detector_consultas')
+
+
+@contextmanager
+def detectar_consultas(estricto=None, umbral=None, lenta_ms=None, ignoradas=None, contexto=''):
+    """
+    Observa las consultas del bloque. Retorna la lista de problemas (se completa
+    al salir); los registra en el logger y en modo estricto lanza ConsultasProblematicas.
+    Por defecto toma la configuración de settings; lenta_ms=0 no busca consultas lentas.
+    """
+    modo = getattr(settings, 'INVENTARIO_DETECTAR_CONSULTAS', '')
+    sesion = _Sesion(
+        umbral if umbral is not None else getattr(settings, 'INVENTARIO_N1_UMBRAL', 5),
+        lenta_ms if lenta_ms is not None else getattr(settings, 'INVENTARIO_CONSULTA_LENTA_MS', 100),
+        ignoradas if ignoradas is not None else getattr(settings, 'INVENTARIO_CONSULTAS_IGNORADAS', []),
+    )
+    token = _activo.set(sesion)
+    try:
+        yield sesion.problemas
+    finally:
+        _activo.reset(token)
+    sesion.cerrar()
+    for problema in sesion.problemas:
+        logger.warning('%s%s', f'{contexto}: ' if contexto else '', formatear(problema))
+    if sesion.problemas and (estricto if estricto is not None else modo == 'estricto'):
+        raise ConsultasProblematicas(sesion.problemas)
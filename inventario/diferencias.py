@@ -0,0 +1,145 @@
+"""
+Diferencias entre dos revisiones de un mismo vehículo.
+
+Para el cambio de guardia: qué equipos cambiaron de estado, cuáles aparecen
+solo en la revisión nueva (agregados al inventario) y cuáles solo en la
+anterior (faltantes). Los detalles de ambas revisiones se cruzan en la base
+con una agregación condicional por equipo, en una sola consulta, y solo se
+devuelven las filas que difieren. Si alguna de las dos está archivada, sus
+detalles se decodifican y la comparación se hace en Python.
+"""
+from django.db.models import Case, F, Max, Q, When
+
+from .archivo import decodificar
+from .models import Equipo, Revision, DetalleRevision
+
+CAMPOS_REVISION = ['id', 'fecha', 'responsable', 'estado']
+
+
+def revisiones_a_comparar(vehiculo_id, revision_id=None, anterior_id=None, responsable=None):
+    """
+    Resuelve la revisión actual y la anterior de un vehículo con una consulta.
+    Sin ids compara la última revisión con la previa (del mismo responsable si
+    se indica). Retorna (actual, anterior, archivos) con las revisiones como
+    dicts y {revision_id: detalles_archivados} de las archivadas, o None si no hay dos.
+    """
+    revisiones = Revision.objects.filter(vehiculo_id=vehiculo_id)
+    if revision_id is not None and anterior_id is not None:
+        encontradas = {
+            revision['id']: revision
+            for revision in revisiones.filter(
+                id__in=[revision_id, anterior_id]
+            ).values(*CAMPOS_REVISION, 'detalles_archivados')
+        }
+        if revision_id not in encontradas or anterior_id not in encontradas:
+            return None
+        return _separar_archivos(encontradas[revision_id], encontradas[anterior_id])
+
+    if responsable:
+        revisiones = revisiones.filter(responsable=responsable)
+    if revision_id is not None:
+        # La indicada y la inmediatamente anterior a ella
+        actual = revisiones.filter(id=revision_id).values('fecha')
+        revisiones = revisiones.filter(
+            Q(fecha__lt=actual) | Q(fecha=actual, id__lte=revision_id)
+        )
+    ultimas = list(revisiones.order_by('-fecha', '-id').values(*CAMPOS_REVISION, 'detalles_archivados')[:2])
+    if len(ultimas) < 2 or (revision_id is not None and ultimas[0]['id'] != revision_id):
+        return None
+    return _separar_archivos(ultimas[0], ultimas[1])
+
+
+def _separar_archivos(actual, anterior):
+    archivos = {}
+    for revision in (actual, anterior):
+        archivo = revision.pop('detalles_archivados')
+        if archivo is not None:
+            archivos[revision['id']] = archivo
+    return actual, anterior, archivos
+
+
+def _tipo(fila):
+    if fila['estado_anterior'] is None:
+        return 'nuevo'
+    if fila['estado_actual'] is None:
+        return 'faltante'
+    return 'cambio'
+
+
+def _diferencias_archivadas(actual_id, anterior_id, archivos):
+    """Igual que diferencias(), decodificando los detalles de las revisiones archivadas."""
+    detalles = {}
+    pendientes = [revision_id for revision_id in (actual_id, anterior_id) if revision_id not in archivos]
+    for revision_id, equipo_id, estado, observaciones in DetalleRevision.objects.filter(
+        revision_id__in=pendientes
+    ).values_list('revision_id', 'equipo_id', 'estado', 'observaciones'):
+        detalles.setdefault(revision_id, {})[equipo_id] = (estado, observaciones)
+    for revision_id, archivo in archivos.items():
+        detalles[revision_id] = {
+            equipo_id: (estado, texto) for equipo_id, estado, texto in decodificar(archivo)
+        }
+
+    actuales, anteriores = detalles.get(actual_id, {}), detalles.get(anterior_id, {})
+    distintos = [
+        equipo_id for equipo_id in actuales.keys() | anteriores.keys()
+        if actuales.get(equipo_id) != anteriores.get(equipo_id)
+    ]
+    resultado = []
+    # Equipos eliminados después de archivar: en la tabla se habrían borrado en cascada
+    for equipo in Equipo.objects.filter(id__in=distintos).values(
+        'id', 'nombre', 'compartimento_id', compartimento_nombre=F('compartimento__nombre'),
+    ):
+        estado_anterior, observaciones_anterior = anteriores.get(equipo['id'], (None, None))
+        estado_actual, observaciones_actual = actuales.get(equipo['id'], (None, None))
+        fila = {
+            'equipo_id': equipo['id'],
+            'equipo_nombre': equipo['nombre'],
+            'compartimento_id': equipo['compartimento_id'],
+            'compartimento_nombre': equipo['compartimento_nombre'],
+            'estado_anterior': estado_anterior,
+            'estado_actual': estado_actual,
+            'observaciones_anterior': observaciones_anterior,
+            'observaciones_actual': observaciones_actual,
+        }
+        fila['tipo'] = _tipo(fila)
+        resultado.append(fila)
+    resultado.sort(key=lambda fila: (fila['compartimento_nombre'], fila['equipo_nombre'], fila['equipo_id']))
+    return resultado
+
+
+def diferencias(actual_id, anterior_id, archivos=None):
+    """
+    Detalles que difieren entre dos revisiones, uno por equipo, con 'tipo':
+    'cambio' (distinto estado u observaciones), 'nuevo' o 'faltante'.
+    `archivos` son los detalles archivados de revisiones_a_comparar().
+    """
+    if archivos:
+        return _diferencias_archivadas(actual_id, anterior_id, archivos)
+
+    def de(revision_id, campo):
+        return Max(Case(When(revision_id=revision_id, then=F(campo))))
+
+    filas = DetalleRevision.objects.filter(
+        revision_id__in=[actual_id, anterior_id],
+    ).values(
+        'equipo_id',
+        equipo_nombre=F('equipo__nombre'),
+        compartimento_id=F('equipo__compartimento_id'),
+        compartimento_nombre=F('equipo__compartimento__nombre'),
+    ).annotate(
+        estado_anterior=de(anterior_id, 'estado'),
+        estado_actual=de(actual_id, 'estado'),
+        observaciones_anterior=de(anterior_id, 'observaciones'),
+        observaciones_actual=de(actual_id, 'observaciones'),
+    ).filter(
+        Q(estado_anterior__isnull=True)
+        | Q(estado_actual__isnull=True)
+        | ~Q(estado_anterior=F('estado_actual'))
+        | ~Q(observaciones_anterior=F('observaciones_actual'))
+    ).order_by('compartimento_nombre', 'equipo_nombre', 'equipo_id')
+
+    resultado = []
+    for fila in filas:
+        fila['tipo'] = _tipo(fila)
+        resultado.append(fila)
+    return resultado
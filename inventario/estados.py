@@ -0,0 +1,235 @@
+"""
+Motor de cálculo de estados de vehículos y revisiones.
+
+Calcula el estado de muchos vehículos a la vez con un número constante de
+consultas, independiente del tamaño de la flota. La API, los modelos y los
+endpoints de estado usan este módulo para que los números siempre coincidan.
+
+El estado actual de cada vehículo (general y por responsable) se guarda en
+VehiculoEstadoSnapshot y se mantiene al escribir revisiones.
+"""
+from django.db import transaction
+from django.db.models import Count, FilteredRelation, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Vehiculo, Equipo, Revision, VehiculoEstadoSnapshot
+
+
+def estado_desde_conteos(revisados, si, no):
+    """
+    Deriva el estado a partir de los conteos de una revisión.
+    Retorna: 'pendiente', 'completo', 'critico'
+    """
+    if not revisados:
+        return 'pendiente'
+    # Si hay algún equipo marcado como NO, es crítico
+    if no:
+        return 'critico'
+    # Si todos están marcados como SI, está completo
+    if si == revisados:
+        return 'completo'
+    return 'pendiente'
+
+
+def resumen_desde_estados(estados):
+    """
+    Calcula los contadores de una revisión a partir de los estados de sus detalles.
+    Retorna un dict con los campos de resumen de Revision.
+    """
+    estados = list(estados)
+    si = estados.count('si')
+    no = estados.count('no')
+    return {
+        'total_equipos': len(estados),
+        'equipos_si': si,
+        'equipos_no': no,
+        'estado': estado_desde_conteos(len(estados), si, no),
+    }
+
+
+def contar_detalles(revision_ids):
+    """
+    Recuenta los detalles de varias revisiones en una sola consulta.
+    Retorna un dict {revision_id: resumen} con los campos de resumen de Revision.
+    """
+    if not revision_ids:
+        return {}
+    # Las revisiones archivadas ya no tienen filas de detalle: su resumen no se toca
+    filas = Revision.objects.filter(
+        id__in=revision_ids, detalles_archivados__isnull=True
+    ).values('id').annotate(
+        revisados=Count('detalles_revision'),
+        si=Count('detalles_revision', filter=Q(detalles_revision__estado='si')),
+        no=Count('detalles_revision', filter=Q(detalles_revision__estado='no')),
+    ).order_by()
+    return {
+        fila['id']: {
+            'total_equipos': fila['revisados'],
+            'equipos_si': fila['si'],
+            'equipos_no': fila['no'],
+            'estado': estado_desde_conteos(fila['revisados'], fila['si'], fila['no']),
+        }
+        for fila in filas
+    }
+
+
+def actualizar_resumenes(revision_ids):
+    """
+    Recalcula y guarda el resumen desnormalizado de varias revisiones.
+    Usa update() para no fallar si la revisión se está eliminando en cascada.
+    """
+    resumenes = contar_detalles(revision_ids)
+    for revision_id, resumen in resumenes.items():
+        Revision.objects.filter(pk=revision_id).update(**resumen)
+    sincronizar_snapshots(resumenes)
+    return resumenes
+
+
+CAMPOS_REVISION_SNAPSHOT = (
+    'id', 'fecha', 'responsable', 'estado', 'total_equipos', 'equipos_si', 'equipos_no',
+)
+
+
+def _campos_snapshot(revision):
+    """Campos de VehiculoEstadoSnapshot a partir de una fila de Revision (dict)."""
+    return {
+        'revision_id': revision['id'],
+        'ultima_revision_fecha': revision['fecha'],
+        'ultima_revision_responsable': revision['responsable'],
+        'estado': revision['estado'],
+        'equipos_revisados': revision['total_equipos'],
+        'equipos_si': revision['equipos_si'],
+        'equipos_no': revision['equipos_no'],
+    }
+
+
+def actualizar_snapshots(vehiculo_id, responsables=(), crear=True):
+    """
+    Recalcula los snapshots de un vehículo: el general y el de cada responsable dado.
+
+    Con crear=False solo se actualizan snapshots existentes; se usa al eliminar
+    revisiones, cuando el vehículo mismo puede estar eliminándose.
+    """
+    for responsable in {'', *responsables}:
+        revisiones = Revision.objects.filter(vehiculo_id=vehiculo_id)
+        if responsable:
+            revisiones = revisiones.filter(responsable=responsable)
+        ultima = revisiones.order_by('-fecha', '-id').values(*CAMPOS_REVISION_SNAPSHOT).first()
+
+        snapshots = VehiculoEstadoSnapshot.objects.filter(
+            vehiculo_id=vehiculo_id, responsable=responsable
+        )
+        if ultima is None:
+            snapshots.delete()
+        elif crear:
+            VehiculoEstadoSnapshot.objects.update_or_create(
+                vehiculo_id=vehiculo_id,
+                responsable=responsable,
+                defaults=_campos_snapshot(ultima),
+            )
+        else:
+            snapshots.update(**_campos_snapshot(ultima))
+
+
+def sincronizar_snapshots(resumenes):
+    """Copia resúmenes de revisión recalculados a los snapshots que apuntan a ellas."""
+    for revision_id, resumen in resumenes.items():
+        VehiculoEstadoSnapshot.objects.filter(revision_id=revision_id).update(
+            estado=resumen['estado'],
+            equipos_revisados=resumen['total_equipos'],
+            equipos_si=resumen['equipos_si'],
+            equipos_no=resumen['equipos_no'],
+        )
+
+
+def reconstruir_snapshots():
+    """
+    Reconstruye todos los snapshots desde las revisiones.
+    Recorre las revisiones una sola vez, ordenadas, con memoria acotada al resultado.
+    """
+    ultimas = {}
+    revisiones = Revision.objects.order_by(
+        'vehiculo_id', '-fecha', '-id'
+    ).values('vehiculo_id', *CAMPOS_REVISION_SNAPSHOT)
+    for revision in revisiones.iterator(chunk_size=2000):
+        for responsable in ('', revision['responsable']):
+            ultimas.setdefault((revision['vehiculo_id'], responsable), revision)
+
+    snapshots = [
+        VehiculoEstadoSnapshot(vehiculo_id=vehiculo_id, responsable=responsable, **_campos_snapshot(revision))
+        for (vehiculo_id, responsable), revision in ultimas.items()
+    ]
+    with transaction.atomic():
+        VehiculoEstadoSnapshot.objects.all().delete()
+        VehiculoEstadoSnapshot.objects.bulk_create(snapshots, batch_size=500)
+    return len(snapshots)
+
+
+def consulta_estados(vehiculos=None, responsable=None):
+    """
+    Arma la consulta única del estado de varios vehículos, leyendo los snapshots.
+    `vehiculos` es un queryset de Vehiculo (por defecto, los activos).
+    Cada fila se convierte con fila_a_estado().
+    """
+    if vehiculos is None:
+        vehiculos = Vehiculo.objects.filter(activo=True)
+
+    total_equipos = Equipo.objects.filter(
+        compartimento__vehiculo=OuterRef('pk'),
+        activo=True,
+    ).order_by().values('compartimento__vehiculo').annotate(
+        total=Count('id')
+    ).values('total')
+
+    return vehiculos.annotate(
+        _snapshot=FilteredRelation(
+            'estados_snapshot',
+            condition=Q(estados_snapshot__responsable=responsable or ''),
+        ),
+        _total_equipos=Coalesce(
+            Subquery(total_equipos, output_field=IntegerField()), Value(0)
+        ),
+    ).values(
+        'id', 'codigo', 'nombre', '_total_equipos',
+        '_snapshot__estado',
+        '_snapshot__ultima_revision_fecha',
+        '_snapshot__ultima_revision_responsable',
+        '_snapshot__equipos_revisados',
+        '_snapshot__equipos_si',
+        '_snapshot__equipos_no',
+    )
+
+
+def fila_a_estado(fila):
+    """Convierte una fila de consulta_estados() a la forma de VehiculoEstadoSerializer."""
+    return {
+        'vehiculo_id': fila['id'],
+        'codigo': fila['codigo'],
+        'nombre': fila['nombre'] or '',
+        'estado': fila['_snapshot__estado'] or 'pendiente',
+        'ultima_revision_fecha': fila['_snapshot__ultima_revision_fecha'],
+        'ultima_revision_responsable': fila['_snapshot__ultima_revision_responsable'],
+        'total_equipos': fila['_total_equipos'],
+        'equipos_revisados': fila['_snapshot__equipos_revisados'] or 0,
+        'equipos_si': fila['_snapshot__equipos_si'] or 0,
+        'equipos_no': fila['_snapshot__equipos_no'] or 0,
+    }
+
+
+def calcular_estados(vehiculos=None, responsable=None):
+    """
+    Calcula el estado de varios vehículos en una sola consulta.
+    Retorna una lista de dicts con la forma de VehiculoEstadoSerializer,
+    en el mismo orden que el queryset.
+    """
+    return [fila_a_estado(fila) for fila in consulta_estados(vehiculos, responsable)]
+
+
+async def acalcular_estados(vehiculos=None, responsable=None):
+    """Versión asíncrona de calcular_estados(), con el ORM asíncrono."""
+    return [fila_a_estado(fila) async for fila in consulta_estados(vehiculos, responsable)]
+
+
+def calcular_estado_vehiculo(vehiculo, responsable=None):
+    """Calcula el estado de un único vehículo con el mismo motor."""
+    return calcular_estados(Vehiculo.objects.filter(pk=vehiculo.pk), responsable)[0]
@@ -0,0 +1,149 @@
+"""
+Exportación del historial de revisiones para auditorías.
+
+Genera una fila por DetalleRevision (revisión, vehículo, compartimento,
+equipo, estado y observaciones), incluidas las de revisiones archivadas (ver
+inventario/archivo.py), leyendo la base por bloques con `iterator()`: la
+memoria usada no depende de la cantidad de filas. El CSV se arma a medida que
+se envía; el XLSX (requiere openpyxl) se escribe en modo solo escritura a un
+archivo temporal.
+"""
+import csv
+import heapq
+import tempfile
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import archivo
+from .models import DetalleRevision, Equipo, Revision
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - openpyxl es opcional
+    Workbook = None
+
+ENCABEZADOS = [
+    'revision_id', 'fecha', 'vehiculo', 'responsable', 'estado_revision',
+    'compartimento', 'equipo', 'estado', 'observaciones', 'observaciones_generales',
+]
+CAMPOS = [
+    'revision_id', 'revision__fecha', 'revision__vehiculo__codigo', 'revision__responsable',
+    'revision__estado', 'equipo__compartimento__nombre', 'equipo__nombre', 'estado',
+    'observaciones', 'revision__observaciones_generales',
+]
+TAMANO_BLOQUE = 2000
+
+
+def formatos_disponibles():
+    return ['csv', 'xlsx'] if Workbook is not None else ['csv']
+
+
+def parsear_limite(valor, fin=False):
+    """
+    Convierte 'AAAA-MM-DD' o una fecha ISO con hora en un datetime con zona.
+    Una fecha sin hora como `fin` incluye el día completo. Lanza ValueError si no es válida.
+    """
+    dia = parse_date(valor)
+    if dia is not None:
+        momento = datetime.combine(dia + timedelta(days=1) if fin else dia, time.min)
+    else:
+        momento = parse_datetime(valor)
+        if momento is None:
+            raise ValueError(f"Fecha inválida: {valor}")
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    return momento
+
+
+def _filtrar(queryset, prefijo, desde, hasta, vehiculo_id):
+    if desde is not None:
+        queryset = queryset.filter(**{f'{prefijo}fecha__gte': desde})
+    if hasta is not None:
+        queryset = queryset.filter(**{f'{prefijo}fecha__lt': hasta})
+    if vehiculo_id is not None:
+        queryset = queryset.filter(**{f'{prefijo}vehiculo_id': vehiculo_id})
+    return queryset
+
+
+def consulta_detalles(desde=None, hasta=None, vehiculo_id=None):
+    """Detalles a exportar como tuplas en el orden de CAMPOS, por fecha de revisión."""
+    detalles = _filtrar(DetalleRevision.objects.all(), 'revision__', desde, hasta, vehiculo_id)
+    return detalles.order_by('revision__fecha', 'revision_id', 'id').values_list(*CAMPOS)
+
+
+def _filas_archivadas(desde, hasta, vehiculo_id):
+    """Filas de las revisiones archivadas, en el mismo orden y formato que consulta_detalles()."""
+    revisiones = _filtrar(
+        Revision.objects.filter(detalles_archivados__isnull=False), '', desde, hasta, vehiculo_id
+    ).order_by('fecha', 'id').values_list(
+        'id', 'fecha', 'vehiculo__codigo', 'responsable', 'estado',
+        'observaciones_generales', 'detalles_archivados',
+    )
+    # Nombres de los equipos ya vistos: crece con el inventario, no con las filas
+    nombres = {}
+    for *revision, compacto in revisiones.iterator(chunk_size=TAMANO_BLOQUE // 20):
+        revision_id, fecha, vehiculo, responsable, estado_revision, generales = revision
+        detalles = archivo.decodificar(compacto)
+        faltantes = {equipo_id for equipo_id, _, _ in detalles} - nombres.keys()
+        if faltantes:
+            nombres.update(
+                (equipo_id, (compartimento, equipo))
+                for equipo_id, compartimento, equipo in Equipo.objects.filter(
+                    id__in=faltantes
+                ).values_list('id', 'compartimento__nombre', 'nombre')
+            )
+        for equipo_id, estado, observaciones in detalles:
+            if equipo_id in nombres:
+                compartimento, equipo = nombres[equipo_id]
+                yield (revision_id, fecha, vehiculo, responsable, estado_revision,
+                       compartimento, equipo, estado, observaciones, generales)
+
+
+def filas(desde=None, hasta=None, vehiculo_id=None):
+    """
+    Filas a exportar (detalles en la tabla y archivados), por fecha de revisión,
+    con las fechas en hora local. La base se recorre por bloques, sin cachear resultados.
+    """
+    en_tabla = consulta_detalles(desde, hasta, vehiculo_id).iterator(chunk_size=TAMANO_BLOQUE)
+    archivadas = _filas_archivadas(desde, hasta, vehiculo_id)
+    for fila in heapq.merge(en_tabla, archivadas, key=lambda fila: (fila[1], fila[0])):
+        fila = list(fila)
+        fila[1] = timezone.localtime(fila[1]).strftime('%Y-%m-%d %H:%M:%S')
+        yield fila
+
+
+class _Eco:
+    """Pseudo archivo: csv.writer escribe en él y se recupera cada línea."""
+
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(filas):
+    """Genera el CSV línea por línea (con BOM para que Excel detecte UTF-8)."""
+    escritor = csv.writer(_Eco())
+    yield '\ufeff' + escritor.writerow(ENCABEZADOS)
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+def escribir_xlsx(filas, destino):
+    """Escribe el XLSX en `destino` (ruta o archivo) sin mantener las filas en memoria."""
+    if Workbook is None:
+        raise RuntimeError("Exportar a XLSX requiere openpyxl (pip install openpyxl)")
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Revisiones')
+    hoja.append(ENCABEZADOS)
+    for fila in filas:
+        hoja.append(fila)
+    libro.save(destino)
+
+
+def archivo_xlsx(filas):
+    """XLSX en un archivo temporal (se borra al cerrarse), listo para leer desde el inicio."""
+    temporal = tempfile.TemporaryFile(suffix='.xlsx')
+    escribir_xlsx(filas, temporal)
+    temporal.seek(0)
+    return temporal
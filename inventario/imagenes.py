@@ -0,0 +1,138 @@
+"""
+Variantes reducidas de las fotos de vehículos.
+
+Al subir `Vehiculo.imagen` se generan versiones WebP y JPEG en algunos anchos
+fijos, con nombres que incluyen el hash de su contenido: nunca cambian, así el
+servidor web puede servirlas con caché inmutable. El original se procesa una
+sola vez; las variantes se regeneran solo si cambia el contenido de la foto.
+"""
+import hashlib
+import io
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Vehiculo
+
+ANCHOS = (160, 320, 640)
+FORMATOS = {
+    'webp': {'formato': 'WEBP', 'opciones': {'quality': 80, 'method': 6}},
+    'jpeg': {'formato': 'JPEG', 'opciones': {'quality': 82, 'optimize': True, 'progressive': True}},
+}
+CARPETA = 'vehiculos/variantes'
+
+
+def hash_archivo(archivo):
+    """SHA-256 del contenido de un archivo de Django, leído por bloques."""
+    digest = hashlib.sha256()
+    archivo.open('rb')
+    try:
+        for bloque in archivo.chunks():
+            digest.update(bloque)
+    finally:
+        archivo.close()
+    return digest.hexdigest()
+
+
+def _guardar_variante(imagen, vehiculo_id, ancho, extension):
+    """Codifica una variante y la guarda con nombre inmutable; retorna su ruta."""
+    buffer = io.BytesIO()
+    config = FORMATOS[extension]
+    imagen.save(buffer, config['formato'], **config['opciones'])
+    contenido = buffer.getvalue()
+    huella = hashlib.sha256(contenido).hexdigest()[:16]
+    ruta = posixpath.join(CARPETA, f'{vehiculo_id}-{ancho}w.{huella}.{extension}')
+    if not default_storage.exists(ruta):
+        default_storage.save(ruta, ContentFile(contenido))
+    return ruta
+
+
+def rutas_variantes(variantes):
+    return {ruta for por_ancho in variantes.get('formatos', {}).values() for ruta in por_ancho.values()}
+
+
+def eliminar_variantes(rutas):
+    for ruta in rutas:
+        default_storage.delete(ruta)
+
+
+def generar_variantes(vehiculo, forzar=False):
+    """
+    Genera (o reutiliza) las variantes de la foto del vehículo y las guarda en
+    `imagen_variantes`. Retorna True si se procesó la imagen.
+    """
+    anteriores = vehiculo.imagen_variantes or {}
+    if not vehiculo.imagen:
+        variantes = {}
+    else:
+        huella = hash_archivo(vehiculo.imagen)
+        if not forzar and anteriores.get('hash') == huella:
+            if anteriores.get('origen') != vehiculo.imagen.name:
+                # Mismo contenido con otro nombre: solo se anota el origen
+                variantes = {**anteriores, 'origen': vehiculo.imagen.name}
+                Vehiculo.objects.filter(pk=vehiculo.pk).update(imagen_variantes=variantes)
+                vehiculo.imagen_variantes = variantes
+            return False
+
+        vehiculo.imagen.open('rb')
+        try:
+            original = ImageOps.exif_transpose(Image.open(vehiculo.imagen))
+            original = original.convert('RGB')
+        finally:
+            vehiculo.imagen.close()
+
+        formatos = {extension: {} for extension in FORMATOS}
+        # Nunca se amplía: los anchos mayores al original se reemplazan por el original
+        for ancho in sorted({min(ancho, original.width) for ancho in ANCHOS}):
+            reducida = original.copy()
+            reducida.thumbnail((ancho, original.height), Image.LANCZOS)
+            for extension in FORMATOS:
+                formatos[extension][str(ancho)] = _guardar_variante(reducida, vehiculo.pk, ancho, extension)
+
+        variantes = {
+            'origen': vehiculo.imagen.name,
+            'hash': huella,
+            'ancho': original.width,
+            'alto': original.height,
+            'formatos': formatos,
+        }
+
+    eliminar_variantes(rutas_variantes(anteriores) - rutas_variantes(variantes))
+    # Cambia la representación del vehículo: se invalida su entrada en la caché
+    Vehiculo.objects.filter(pk=vehiculo.pk).update(
+        imagen_variantes=variantes,
+        version_inventario=F('version_inventario') + 1,
+        fecha_actualizacion=timezone.now(),
+    )
+    vehiculo.imagen_variantes = variantes
+    return bool(variantes)
+
+
+def necesita_variantes(vehiculo):
+    """Indica si la foto guardada no coincide con la que originó las variantes."""
+    variantes = vehiculo.imagen_variantes or {}
+    if not vehiculo.imagen:
+        return bool(variantes)
+    return variantes.get('origen') != vehiculo.imagen.name
+
+
+def srcset(vehiculo, request=None):
+    """
+    Mapa {formato: srcset} de las variantes del vehículo, por ejemplo
+    {'webp': '/media/...-160w.ab12.webp 160w, ...', 'jpeg': '...'}.
+    """
+    formatos = (vehiculo.imagen_variantes or {}).get('formatos', {})
+    resultado = {}
+    for extension, por_ancho in formatos.items():
+        candidatos = []
+        for ancho, ruta in sorted(por_ancho.items(), key=lambda item: int(item[0])):
+            url = default_storage.url(ruta)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            candidatos.append(f'{url} {ancho}w')
+        resultado[extension] = ', '.join(candidatos)
+    return resultado
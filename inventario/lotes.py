@@ -0,0 +1,194 @@
+"""
+Edición en lote del inventario de un vehículo o de un compartimento.
+
+Reorganizar un vehículo desde GestionarInventario (crear, renombrar, mover,
+reordenar y desactivar compartimentos y equipos) se envía en una sola
+petición. Todo el lote se valida contra el inventario actual antes de
+escribir y se aplica en una transacción con bulk_create, bulk_update y
+update, con un número fijo de consultas: o se aplica completo o no se
+aplica nada. La lectura, la validación y la escritura ocurren en la misma
+transacción, con el vehículo bloqueado: dos lotes del mismo vehículo no se
+validan contra un inventario que el otro está cambiando.
+
+Las operaciones en bloque no disparan las señales, así que aquí se hace lo
+que ellas harían: se sella `fecha_actualizacion` de cada fila tocada (la
+sincronización incremental la lee) y se incrementa una vez la versión del
+vehículo (ETag y caché del inventario). Los equipos solo se mueven entre
+compartimentos del mismo vehículo, por lo que no hay registros de eliminados.
+En MySQL bulk_create no devuelve los ids que necesitan los `ref`, así que las
+filas nuevas se insertan una por una (ver crear_en_bloque()).
+"""
+from collections import Counter
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Vehiculo, Compartimento, Equipo
+from .versiones import incrementar_version
+
+CAMPOS_COMPARTIMENTO = ('nombre', 'orden', 'activo')
+CAMPOS_EQUIPO = ('nombre', 'cantidad_esperada', 'orden', 'activo')
+
+
+def _validar(datos, compartimentos, equipos, compartimento_id):
+    """Verifica ids, referencias y nombres del lote. Retorna los errores por sección e índice."""
+    errores = {}
+
+    def error(seccion, indice, mensaje):
+        errores.setdefault(seccion, {})[indice] = [mensaje]
+
+    refs = {item['ref'] for item in datos.get('compartimentos', []) if 'ref' in item and 'id' not in item}
+    nombres = {compartimento.id: compartimento.nombre for compartimento in compartimentos.values()}
+    for indice, item in enumerate(datos.get('compartimentos', [])):
+        if 'id' in item and item['id'] not in compartimentos:
+            error('compartimentos', indice, f"Compartimento inexistente o de otro vehículo: {item['id']}")
+        elif 'nombre' in item:
+            nombres[item.get('id', ('nuevo', indice))] = item['nombre']
+    # unique_together (vehiculo, nombre), incluidos los compartimentos inactivos
+    repetidos = sorted(nombre for nombre, veces in Counter(nombres.values()).items() if veces > 1)
+    if repetidos:
+        error('compartimentos', 'nombres', f'Nombres repetidos en el vehículo: {repetidos}')
+
+    for indice, item in enumerate(datos['equipos']):
+        if 'id' in item and item['id'] not in equipos:
+            ambito = 'compartimento' if compartimento_id else 'vehículo'
+            error('equipos', indice, f"Equipo inexistente o de otro {ambito}: {item['id']}")
+            continue
+        destino = item.get('compartimento', compartimento_id)
+        if destino is None:
+            if 'id' not in item:
+                error('equipos', indice, 'Indicar el compartimento del equipo nuevo.')
+        elif isinstance(destino, str):
+            if destino not in refs:
+                error('equipos', indice, f'No hay un compartimento nuevo con ref {destino!r} en el lote.')
+        elif destino not in compartimentos or (compartimento_id and destino != compartimento_id):
+            error('equipos', indice, f'Compartimento inexistente o de otro vehículo: {destino}')
+
+    for seccion, existentes in [
+        ('desactivar_compartimentos', compartimentos), ('desactivar_equipos', equipos),
+    ]:
+        invalidos = [objeto_id for objeto_id in datos.get(seccion, []) if objeto_id not in existentes]
+        if invalidos:
+            errores[seccion] = [f'Ids inexistentes o de otro vehículo: {invalidos}']
+    return errores
+
+
+def crear_en_bloque(modelo, objetos):
+    """
+    bulk_create que deja asignado el id de cada objeto. MySQL (y cualquier base
+    sin RETURNING en inserciones en bloque) no los asigna: ahí se guarda fila
+    por fila, con las señales de cada save().
+    """
+    if connections[router.db_for_write(modelo)].features.can_return_rows_from_bulk_insert:
+        return modelo.objects.bulk_create(objetos, batch_size=500)
+    for objeto in objetos:
+        objeto.save(force_insert=True)
+    return objetos
+
+
+def _modificar(objetos, items, campos, extra=()):
+    """Aplica a las filas existentes los campos presentes en cada item. Retorna (filas, campos tocados)."""
+    modificados, tocados = [], set()
+    for item in items:
+        objeto = objetos[item['id']]
+        for campo in (*campos, *extra):
+            if campo in item:
+                setattr(objeto, campo, item[campo])
+                tocados.add(campo)
+        modificados.append(objeto)
+    return modificados, tocados
+
+
+def aplicar_lote(vehiculo_id, datos, compartimento_id=None):
+    """
+    Valida y aplica un lote de InventarioLoteSerializer (o EquiposLoteSerializer
+    con `compartimento_id`). Las desactivaciones se aplican al final; desactivar
+    un compartimento desactiva también sus equipos. Lanza ValidationError sin
+    escribir nada si el lote no es válido. Retorna los ids asignados a los `ref`
+    de las filas creadas: {'compartimentos': {ref: id}, 'equipos': {ref: id}}.
+    """
+    try:
+        with transaction.atomic():
+            return _aplicar(vehiculo_id, datos, compartimento_id)
+    except IntegrityError:
+        # Un cambio fuera de los lotes (p. ej. un compartimento creado por la API) chocó con este
+        raise serializers.ValidationError(
+            {'non_field_errors': ['El inventario cambió mientras se aplicaba el lote; volver a enviarlo.']}
+        )
+
+
+def _aplicar(vehiculo_id, datos, compartimento_id):
+    """aplicar_lote() dentro de su transacción."""
+    Vehiculo.objects.select_for_update().get(pk=vehiculo_id)
+    compartimentos = Compartimento.objects.filter(vehiculo_id=vehiculo_id).in_bulk()
+    equipos = Equipo.objects.filter(compartimento__vehiculo_id=vehiculo_id)
+    if compartimento_id:
+        equipos = equipos.filter(compartimento_id=compartimento_id)
+    equipos = equipos.in_bulk()
+    errores = _validar(datos, compartimentos, equipos, compartimento_id)
+    if errores:
+        raise serializers.ValidationError(errores)
+
+    items_compartimentos = datos.get('compartimentos', [])
+    items_equipos = datos['equipos']
+    desactivar_compartimentos = datos.get('desactivar_compartimentos', [])
+    desactivar_equipos = datos['desactivar_equipos']
+    creados = {'compartimentos': {}, 'equipos': {}}
+    ahora = timezone.now()
+
+    nuevos = [item for item in items_compartimentos if 'id' not in item]
+    refs = {}
+    for item, compartimento in zip(nuevos, crear_en_bloque(Compartimento, [
+        Compartimento(vehiculo_id=vehiculo_id, **{
+            campo: item[campo] for campo in CAMPOS_COMPARTIMENTO if campo in item
+        })
+        for item in nuevos
+    ])):
+        if 'ref' in item:
+            refs[item['ref']] = creados['compartimentos'][item['ref']] = compartimento.id
+
+    def destino(item):
+        valor = item.get('compartimento', compartimento_id)
+        return refs[valor] if isinstance(valor, str) else valor
+
+    nuevos = [item for item in items_equipos if 'id' not in item]
+    for item, equipo in zip(nuevos, crear_en_bloque(Equipo, [
+        Equipo(compartimento_id=destino(item), **{
+            campo: item[campo] for campo in CAMPOS_EQUIPO if campo in item
+        })
+        for item in nuevos
+    ])):
+        if 'ref' in item:
+            creados['equipos'][item['ref']] = equipo.id
+
+    # bulk_update no aplica auto_now: la fecha se sella a mano
+    modificados, campos = _modificar(
+        compartimentos, [item for item in items_compartimentos if 'id' in item], CAMPOS_COMPARTIMENTO
+    )
+    if modificados:
+        for compartimento in modificados:
+            compartimento.fecha_actualizacion = ahora
+        Compartimento.objects.bulk_update(modificados, [*campos, 'fecha_actualizacion'], batch_size=500)
+
+    items = [{**item, 'compartimento_id': destino(item)} if 'compartimento' in item else item
+             for item in items_equipos if 'id' in item]
+    modificados, campos = _modificar(equipos, items, CAMPOS_EQUIPO, extra=('compartimento_id',))
+    if modificados:
+        for equipo in modificados:
+            equipo.fecha_actualizacion = ahora
+        Equipo.objects.bulk_update(modificados, [*campos, 'fecha_actualizacion'], batch_size=500)
+
+    if desactivar_compartimentos:
+        Compartimento.objects.filter(id__in=desactivar_compartimentos).update(
+            activo=False, fecha_actualizacion=ahora
+        )
+    if desactivar_equipos or desactivar_compartimentos:
+        Equipo.objects.filter(
+            Q(id__in=desactivar_equipos) | Q(compartimento_id__in=desactivar_compartimentos)
+        ).update(activo=False, fecha_actualizacion=ahora)
+
+    if items_compartimentos or items_equipos or desactivar_compartimentos or desactivar_equipos:
+        incrementar_version(Vehiculo.objects.filter(pk=vehiculo_id))
+    return creados
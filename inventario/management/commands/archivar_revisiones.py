@@ -0,0 +1,28 @@
+"""
+Archiva los detalles de las revisiones antiguas en su forma compacta.
+
+Uso: python manage.py archivar_revisiones [--dias 365] [--lote 500]
+Las revisiones archivadas se siguen leyendo igual en la API y en las
+exportaciones; sus filas se borran de DetalleRevision.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventario.archivo import antiguedad_archivo, archivar_revisiones
+
+
+class Command(BaseCommand):
+    help = "Archiva las revisiones más antiguas que INVENTARIO_ARCHIVO_DIAS (o --dias)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None, help="Antigüedad mínima en días")
+        parser.add_argument('--lote', type=int, default=500, help="Revisiones archivadas por transacción")
+
+    def handle(self, *args, **options):
+        antiguedad = timedelta(days=options['dias']) if options['dias'] is not None else antiguedad_archivo()
+        revisiones, detalles = archivar_revisiones(timezone.now() - antiguedad, lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {revisiones} revisiones archivadas ({detalles} detalles quitados de la tabla)"
+        ))
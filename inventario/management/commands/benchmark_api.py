@@ -0,0 +1,89 @@
+"""
+Mide latencia, consultas SQL y memoria de los endpoints de la API.
+
+Uso:
+    python manage.py benchmark_api --repeticiones 50 --salida bench/resultado.json
+    python manage.py benchmark_api --concurrencia 50 --peticiones 1000
+    python manage.py benchmark_api --gzip
+
+Con --concurrencia además compara, con la misma carga, los endpoints síncronos
+atendidos por un pool de workers WSGI contra sus versiones asíncronas en un
+único bucle de eventos ASGI.
+
+Las peticiones se ejecutan dentro del proceso con el cliente de pruebas de Django
+sobre la base configurada. Generar datos antes con `generar_flota`.
+"""
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.benchmark import (
+    endpoints_por_defecto, ejecutar_benchmark, endpoints_concurrentes, ejecutar_concurrencia,
+)
+
+
+class Command(BaseCommand):
+    help = "Ejecuta un benchmark de los endpoints de la API y guarda el resultado en JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--calentamiento', type=int, default=2)
+        parser.add_argument('--salida', default=None, help="Archivo JSON de salida")
+        parser.add_argument('--solo', nargs='*', default=None, help="Nombres de endpoints a medir")
+        parser.add_argument('--escrituras', action='store_true', help="Incluye POST (se revierten)")
+        parser.add_argument('--cache-caliente', action='store_true', help="No limpiar la caché entre peticiones")
+        parser.add_argument('--gzip', action='store_true', help="Acepta respuestas comprimidas (Accept-Encoding: gzip)")
+        parser.add_argument('--concurrencia', type=int, default=0, help="Clientes simultáneos (0: no medir)")
+        parser.add_argument('--peticiones', type=int, default=500, help="Peticiones por endpoint en la prueba concurrente")
+        parser.add_argument('--trabajadores-wsgi', type=int, default=4, help="Workers del servidor WSGI simulado")
+        parser.add_argument(
+            '--latencia-bd-ms', type=float, default=0,
+            help="Espera agregada a cada consulta en la prueba concurrente, para simular una base en red",
+        )
+
+    def handle(self, *args, **options):
+        endpoints = endpoints_por_defecto(escrituras=options['escrituras'])
+        if options['solo']:
+            endpoints = [endpoint for endpoint in endpoints if endpoint['nombre'] in options['solo']]
+            if not endpoints:
+                raise CommandError("Ningún endpoint coincide con --solo")
+
+        resultado = ejecutar_benchmark(
+            endpoints,
+            repeticiones=options['repeticiones'],
+            calentamiento=options['calentamiento'],
+            cache_fria=not options['cache_caliente'],
+            gzip=options['gzip'],
+        )
+
+        for nombre, metricas in resultado['endpoints'].items():
+            latencia = metricas['latencia_ms']
+            self.stdout.write(
+                f"{nombre:28} {metricas['estado_http']}  p50={latencia['p50']:8.2f}ms  "
+                f"p90={latencia['p90']:8.2f}ms  p99={latencia['p99']:8.2f}ms  "
+                f"consultas={metricas['consultas']['max']:3}  memoria={metricas['memoria_pico_kb']:.0f}KB  "
+                f"tamaño={metricas['bytes'] / 1024:.1f}KB"
+            )
+
+        if options['concurrencia'] > 0:
+            resultado['concurrencia'] = ejecutar_concurrencia(
+                endpoints_concurrentes(),
+                clientes=options['concurrencia'],
+                peticiones=options['peticiones'],
+                trabajadores_wsgi=options['trabajadores_wsgi'],
+                latencia_bd_ms=options['latencia_bd_ms'],
+            )
+            for nombre, modos in resultado['concurrencia']['pares'].items():
+                for modo, metricas in modos.items():
+                    self.stdout.write(
+                        f"{nombre:20} {modo}  {metricas['peticiones_por_segundo']:8.1f} req/s  "
+                        f"p50={metricas['latencia_ms']['p50']:8.2f}ms  p99={metricas['latencia_ms']['p99']:8.2f}ms  "
+                        f"errores={metricas['errores']}"
+                    )
+
+        if options['salida']:
+            salida = Path(options['salida'])
+            salida.parent.mkdir(parents=True, exist_ok=True)
+            salida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+            self.stdout.write(self.style.SUCCESS(f"✓ Resultado guardado en {salida}"))
@@ -0,0 +1,49 @@
+"""
+Copia el inventario (compartimentos y equipos) de un vehículo plantilla a otros.
+
+Uso: python manage.py clonar_inventario PMH-01 PMH-02 PMH-03 [--sincronizar]
+Sin --sincronizar solo agrega lo que falta en cada destino; con --sincronizar
+además iguala orden y cantidades y desactiva lo que la plantilla no tiene.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.models import Vehiculo
+from inventario.plantillas import clonar_inventario
+
+
+class Command(BaseCommand):
+    help = "Copia el inventario de un vehículo plantilla a uno o varios vehículos, en una transacción."
+
+    def add_arguments(self, parser):
+        parser.add_argument('plantilla', help="Código del vehículo plantilla")
+        parser.add_argument('destinos', nargs='+', help="Códigos de los vehículos destino")
+        parser.add_argument(
+            '--sincronizar', action='store_true',
+            help="Iguala orden y cantidades y desactiva lo que la plantilla no tiene",
+        )
+
+    def handle(self, *args, **options):
+        codigos = [options['plantilla'], *options['destinos']]
+        ids = dict(Vehiculo.objects.filter(codigo__in=codigos).values_list('codigo', 'id'))
+        faltantes = [codigo for codigo in codigos if codigo not in ids]
+        if faltantes:
+            raise CommandError(f"Vehículos inexistentes: {', '.join(faltantes)}")
+        try:
+            resultados = clonar_inventario(
+                ids[options['plantilla']], [ids[codigo] for codigo in options['destinos']],
+                sincronizar=options['sincronizar'],
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        codigo_de = {vehiculo_id: codigo for codigo, vehiculo_id in ids.items()}
+        for resultado in resultados:
+            self.stdout.write(
+                "  {codigo}: {compartimentos_creados} compartimentos y {equipos_creados} equipos creados, "
+                "{actualizados} actualizados, {desactivados} desactivados".format(
+                    codigo=codigo_de[resultado['vehiculo']], **resultado
+                )
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Inventario de {options['plantilla']} copiado a {len(resultados)} vehículos"
+        ))
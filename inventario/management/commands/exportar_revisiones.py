@@ -0,0 +1,49 @@
+"""
+Exporta el historial de revisiones (una fila por equipo revisado) a CSV o XLSX.
+
+Uso:
+    python manage.py exportar_revisiones --desde 2025-01-01 --hasta 2025-12-31 --salida auditoria.csv
+    python manage.py exportar_revisiones --vehiculo 3 --formato xlsx --salida auditoria.xlsx
+
+Sin --salida el CSV se escribe en la salida estándar. Las filas se leen de la
+base por bloques: la memoria usada no depende de la cantidad exportada.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario import exportacion
+
+
+class Command(BaseCommand):
+    help = "Exporta revisiones con sus detalles a CSV o XLSX para auditorías."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', default=None, help="Fecha inicial (AAAA-MM-DD o ISO con hora)")
+        parser.add_argument('--hasta', default=None, help="Fecha final, inclusive (AAAA-MM-DD o ISO con hora)")
+        parser.add_argument('--vehiculo', type=int, default=None, help="Id del vehículo")
+        parser.add_argument('--formato', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument('--salida', default=None, help="Archivo de salida (obligatorio para XLSX)")
+
+    def handle(self, *args, **options):
+        limites = {}
+        for nombre in ('desde', 'hasta'):
+            if options[nombre]:
+                try:
+                    limites[nombre] = exportacion.parsear_limite(options[nombre], fin=nombre == 'hasta')
+                except ValueError as error:
+                    raise CommandError(str(error))
+        if options['formato'] not in exportacion.formatos_disponibles():
+            raise CommandError("Exportar a XLSX requiere openpyxl (pip install openpyxl)")
+        if options['formato'] == 'xlsx' and not options['salida']:
+            raise CommandError("Indicar --salida para exportar a XLSX")
+
+        filas = exportacion.filas(vehiculo_id=options['vehiculo'], **limites)
+        if options['formato'] == 'xlsx':
+            exportacion.escribir_xlsx(filas, options['salida'])
+        elif options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8', newline='') as archivo:
+                archivo.writelines(exportacion.lineas_csv(filas))
+        else:
+            for linea in exportacion.lineas_csv(filas):
+                self.stdout.write(linea, ending='')
+            return
+        self.stdout.write(self.style.SUCCESS(f"✓ Exportación guardada en {options['salida']}"))
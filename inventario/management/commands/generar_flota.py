@@ -0,0 +1,134 @@
+"""
+Genera una flota sintética de tamaño configurable para pruebas de rendimiento.
+
+Uso:
+    python manage.py generar_flota --vehiculos 500 --compartimentos 10 --equipos 30 --dias 730
+
+Todo se inserta con bulk_create, un vehículo por transacción. Los vehículos
+generados usan el prefijo indicado en su código y se pueden borrar con --limpiar.
+"""
+import random
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from inventario.models import Vehiculo, Compartimento, Equipo, Revision, DetalleRevision
+from inventario.estados import resumen_desde_estados, reconstruir_snapshots
+
+
+class Command(BaseCommand):
+    help = "Genera vehículos, compartimentos, equipos y revisiones sintéticos en bloque."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehiculos', type=int, default=50)
+        parser.add_argument('--compartimentos', type=int, default=10, help="Compartimentos por vehículo")
+        parser.add_argument('--equipos', type=int, default=30, help="Equipos por compartimento")
+        parser.add_argument('--dias', type=int, default=365, help="Días de historial de revisiones")
+        parser.add_argument('--revisiones-por-dia', type=int, default=1, help="Revisiones por vehículo y día")
+        parser.add_argument('--responsables', type=int, default=3, help="Cantidad de guardias responsables")
+        parser.add_argument('--prob-no', type=float, default=0.03, help="Probabilidad de marcar un equipo como NO")
+        parser.add_argument('--prefijo', default='SIM', help="Prefijo del código de los vehículos generados")
+        parser.add_argument('--semilla', type=int, default=None)
+        parser.add_argument('--limpiar', action='store_true', help="Elimina antes los vehículos con el prefijo")
+
+    def handle(self, *args, **options):
+        aleatorio = random.Random(options['semilla'])
+        prefijo = options['prefijo']
+
+        if options['limpiar']:
+            self.limpiar(prefijo)
+
+        inicio = Vehiculo.objects.filter(codigo__startswith=f'{prefijo}-').count()
+        responsables = [f'Guardia {n + 1}' for n in range(options['responsables'])]
+        ahora = timezone.now()
+        total_revisiones = 0
+        total_detalles = 0
+
+        for n in range(inicio, inicio + options['vehiculos']):
+            with transaction.atomic():
+                vehiculo = Vehiculo.objects.create(
+                    codigo=f'{prefijo}-{n:05d}', nombre=f'Vehículo sintético {n}'
+                )
+                compartimentos = Compartimento.objects.bulk_create([
+                    Compartimento(vehiculo=vehiculo, nombre=f'Compartimento {c + 1}', orden=c)
+                    for c in range(options['compartimentos'])
+                ])
+                equipos = Equipo.objects.bulk_create([
+                    Equipo(
+                        compartimento=compartimento,
+                        nombre=f'Equipo {e + 1}',
+                        cantidad_esperada=aleatorio.randint(1, 4),
+                        orden=e,
+                    )
+                    for compartimento in compartimentos
+                    for e in range(options['equipos'])
+                ], batch_size=1000)
+
+                revisiones, detalles = self.generar_revisiones(
+                    vehiculo, equipos, responsables, ahora, aleatorio, options
+                )
+                total_revisiones += revisiones
+                total_detalles += detalles
+
+            self.stdout.write(f"  ✓ {vehiculo.codigo}: {len(equipos)} equipos, {revisiones} revisiones")
+
+        estados = reconstruir_snapshots()
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {options['vehiculos']} vehículos, {total_revisiones} revisiones, "
+            f"{total_detalles} detalles, {estados} estados"
+        ))
+
+    def limpiar(self, prefijo):
+        """
+        Elimina los vehículos generados con un delete() normal, en cascada y con
+        señales: quedan los registros de eliminación para la sincronización y las
+        versiones del inventario al día. Las señales omiten el mantenimiento de
+        las filas borradas en cascada; al final se reconstruyen los snapshots.
+        """
+        vehiculos = Vehiculo.objects.filter(codigo__startswith=f'{prefijo}-')
+        with transaction.atomic():
+            eliminados, _ = vehiculos.delete()
+        self.stdout.write(f"  → {eliminados} filas eliminadas")
+        self.stdout.write(f"  → {reconstruir_snapshots()} snapshots reconstruidos")
+
+    def generar_revisiones(self, vehiculo, equipos, responsables, ahora, aleatorio, options):
+        """Crea el historial de revisiones de un vehículo, día por día."""
+        fechas = [
+            ahora - timedelta(days=dia, hours=aleatorio.randint(0, 23), minutes=aleatorio.randint(0, 59))
+            for dia in range(options['dias'])
+            for _ in range(options['revisiones_por_dia'])
+        ]
+        prob_no = options['prob_no']
+        total_detalles = 0
+
+        # Se crean en bloques para acotar la memoria con historiales largos
+        for inicio in range(0, len(fechas), 100):
+            bloque = fechas[inicio:inicio + 100]
+            estados_por_revision = [
+                ['no' if aleatorio.random() < prob_no else 'si' for _ in equipos]
+                for _ in bloque
+            ]
+            revisiones = Revision.objects.bulk_create([
+                Revision(
+                    vehiculo=vehiculo,
+                    responsable=aleatorio.choice(responsables),
+                    **resumen_desde_estados(estados)
+                )
+                for estados in estados_por_revision
+            ])
+            # `fecha` es auto_now_add: se corrige después de insertar
+            for revision, fecha in zip(revisiones, bloque):
+                revision.fecha = fecha
+            Revision.objects.bulk_update(revisiones, ['fecha'], batch_size=500)
+
+            detalles = [
+                DetalleRevision(revision=revision, equipo=equipo, estado=estado)
+                for revision, estados in zip(revisiones, estados_por_revision)
+                for equipo, estado in zip(equipos, estados)
+            ]
+            DetalleRevision.objects.bulk_create(detalles, batch_size=2000)
+            total_detalles += len(detalles)
+
+        return len(fechas), total_detalles
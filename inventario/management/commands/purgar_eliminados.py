@@ -0,0 +1,20 @@
+"""
+Elimina los registros de compartimentos y equipos eliminados más antiguos que la retención.
+
+Uso: python manage.py purgar_eliminados
+Los clientes que no sincronizan desde antes de la retención reciben el inventario completo.
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventario.cambios import retencion_eliminados
+from inventario.models import RegistroEliminado
+
+
+class Command(BaseCommand):
+    help = "Elimina los registros de eliminación más antiguos que INVENTARIO_RETENCION_ELIMINADOS_DIAS."
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - retencion_eliminados()
+        total, _ = RegistroEliminado.objects.filter(fecha__lt=limite).delete()
+        self.stdout.write(self.style.SUCCESS(f"✓ {total} registros purgados"))
@@ -0,0 +1,34 @@
+"""
+Recalcula el resumen desnormalizado (contadores y estado) de las revisiones.
+
+Uso: python manage.py recalcular_resumenes [--lote 500]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventario.models import Revision
+from inventario.estados import contar_detalles, sincronizar_snapshots
+
+
+class Command(BaseCommand):
+    help = "Recalcula total_equipos, equipos_si, equipos_no y estado de todas las revisiones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help="Revisiones procesadas por lote")
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        ids = list(Revision.objects.order_by('id').values_list('id', flat=True))
+        actualizadas = 0
+
+        for inicio in range(0, len(ids), lote):
+            resumenes = contar_detalles(ids[inicio:inicio + lote])
+            revisiones = [Revision(id=revision_id, **resumen) for revision_id, resumen in resumenes.items()]
+            with transaction.atomic():
+                Revision.objects.bulk_update(
+                    revisiones, ['total_equipos', 'equipos_si', 'equipos_no', 'estado']
+                )
+                sincronizar_snapshots(resumenes)
+            actualizadas += len(revisiones)
+
+        self.stdout.write(self.style.SUCCESS(f"✓ {actualizadas} revisiones recalculadas"))
@@ -0,0 +1,17 @@
+"""
+Reconstruye la tabla de estados de vehículos (VehiculoEstadoSnapshot) desde las revisiones.
+
+Uso: python manage.py reconstruir_snapshots
+Ejecutar después de recalcular_resumenes si los resúmenes de revisión no están al día.
+"""
+from django.core.management.base import BaseCommand
+
+from inventario.estados import reconstruir_snapshots
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los estados actuales de los vehículos a partir de las revisiones."
+
+    def handle(self, *args, **options):
+        total = reconstruir_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"✓ {total} estados reconstruidos"))
@@ -0,0 +1,29 @@
+"""
+Genera las variantes reducidas de las fotos de vehículos.
+
+Uso: python manage.py regenerar_imagenes [--forzar]
+Sin --forzar solo procesa los vehículos cuya foto cambió o aún no tiene variantes.
+"""
+from django.core.management.base import BaseCommand
+
+from inventario.imagenes import generar_variantes, necesita_variantes
+from inventario.models import Vehiculo
+
+
+class Command(BaseCommand):
+    help = "Genera las variantes WebP/JPEG de las fotos de vehículos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forzar', action='store_true',
+            help='Regenera las variantes de todas las fotos, aunque no hayan cambiado',
+        )
+
+    def handle(self, *args, **options):
+        forzar = options['forzar']
+        procesados = 0
+        for vehiculo in Vehiculo.objects.order_by('id').iterator():
+            if forzar or necesita_variantes(vehiculo):
+                if generar_variantes(vehiculo, forzar=forzar):
+                    procesados += 1
+        self.stdout.write(self.style.SUCCESS(f"✓ {procesados} fotos procesadas"))
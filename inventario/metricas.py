@@ -0,0 +1,145 @@
+"""
+Métricas de rendimiento por ruta de la API.
+
+MetricasMiddleware (inventario/middleware.py) mide cada petición a /api/ y
+acumula aquí, por ruta y método: un histograma de la duración total, la
+cantidad y el tiempo de consultas SQL, y el tiempo de la vista fuera de SQL
+(serialización y renderizado). /api/metrics/ los expone en el formato de
+texto de Prometheus. Los valores son de este proceso: con varios workers,
+cada uno lleva los suyos.
+
+Las consultas se miden con un execute_wrapper instalado en cada conexión que
+solo suma si hay una petición en curso (ContextVar), así también cuenta las
+consultas que el ORM asíncrono ejecuta en otro hilo.
+"""
+import threading
+import time
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+
+# Límites superiores (segundos) de los buckets del histograma
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_peticion = ContextVar('inventario_metricas_peticion', default=None)
+_lock = threading.Lock()
+_rutas = {}
+
+
+class Medicion:
+    """Acumuladores de una petición en curso."""
+    __slots__ = ('inicio', 'consultas', 'sql', 'inicio_vista', 'sql_inicio_vista')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.sql = 0.0
+        self.inicio_vista = None
+        self.sql_inicio_vista = 0.0
+
+
+def iniciar():
+    medicion = Medicion()
+    return medicion, _peticion.set(medicion)
+
+
+def terminar(token):
+    _peticion.reset(token)
+
+
+def inicio_vista():
+    """Marca el comienzo de la vista en la petición en curso."""
+    medicion = _peticion.get()
+    if medicion is not None:
+        medicion.inicio_vista = time.perf_counter()
+        medicion.sql_inicio_vista = medicion.sql
+
+
+def _medir_sql(execute, sql, params, many, context):
+    medicion = _peticion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.sql += time.perf_counter() - inicio
+        medicion.consultas += 1
+
+
+def _instalar(sender, connection, **kwargs):
+    # La misma conexión se reabre: no volver a agregar el wrapper
+    if _medir_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_sql)
+
+
+connection_created.connect(_instalar, dispatch_uid='inventario_metricas_sql')
+
+
+def registrar(ruta, metodo, total, consultas, sql, serializacion):
+    """Acumula una petición terminada (duraciones en segundos)."""
+    with _lock:
+        datos = _rutas.get((ruta, metodo))
+        if datos is None:
+            datos = _rutas[(ruta, metodo)] = {
+                'buckets': [0] * len(BUCKETS), 'cantidad': 0, 'total': 0.0,
+                'consultas': 0, 'sql': 0.0, 'serializacion': 0.0,
+            }
+        for indice, limite in enumerate(BUCKETS):
+            if total <= limite:
+                datos['buckets'][indice] += 1
+                break
+        datos['cantidad'] += 1
+        datos['total'] += total
+        datos['consultas'] += consultas
+        datos['sql'] += sql
+        datos['serializacion'] += serializacion
+
+
+def reiniciar():
+    with _lock:
+        _rutas.clear()
+
+
+def _etiquetas(ruta, metodo, **extra):
+    pares = {'ruta': ruta, 'metodo': metodo, **extra}
+    return ','.join(
+        '%s="%s"' % (clave, str(valor).replace('\\', '\\\\').replace('"', '\\"'))
+        for clave, valor in pares.items()
+    )
+
+
+def exportar_prometheus():
+    """Métricas acumuladas en el formato de texto de Prometheus (0.0.4)."""
+    with _lock:
+        rutas = {clave: {**datos, 'buckets': list(datos['buckets'])} for clave, datos in _rutas.items()}
+
+    lineas = [
+        '# HELP inventario_http_request_duration_seconds Duración total de las peticiones a la API.',
+        '# TYPE inventario_http_request_duration_seconds histogram',
+    ]
+    for (ruta, metodo), datos in sorted(rutas.items()):
+        acumulado = 0
+        for limite, cantidad in zip(BUCKETS, datos['buckets']):
+            acumulado += cantidad
+            lineas.append('inventario_http_request_duration_seconds_bucket{%s} %d' % (
+                _etiquetas(ruta, metodo, le=repr(limite)), acumulado))
+        lineas.append('inventario_http_request_duration_seconds_bucket{%s} %d' % (
+            _etiquetas(ruta, metodo, le='+Inf'), datos['cantidad']))
+        lineas.append('inventario_http_request_duration_seconds_sum{%s} %r' % (
+            _etiquetas(ruta, metodo), datos['total']))
+        lineas.append('inventario_http_request_duration_seconds_count{%s} %d' % (
+            _etiquetas(ruta, metodo), datos['cantidad']))
+
+    contadores = [
+        ('inventario_sql_queries_total', 'counter', 'Consultas SQL ejecutadas.', 'consultas'),
+        ('inventario_sql_duration_seconds_total', 'counter', 'Tiempo en consultas SQL.', 'sql'),
+        ('inventario_serialization_duration_seconds_total', 'counter',
+         'Tiempo de la vista fuera de SQL (serialización y renderizado).', 'serializacion'),
+    ]
+    for nombre, tipo, ayuda, campo in contadores:
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+        for (ruta, metodo), datos in sorted(rutas.items()):
+            lineas.append('%s{%s} %r' % (nombre, _etiquetas(ruta, metodo), datos[campo]))
+    return '\n'.join(lineas) + '\n'
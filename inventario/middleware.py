@@ -0,0 +1,122 @@
+"""
+Middleware del inventario.
+"""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware.gzip import GZipMiddleware
+
+from . import metricas
+from .detector_consultas import detectar_consultas
+
+
+class CompresionAPIMiddleware(GZipMiddleware):
+    """
+    Comprime con gzip las respuestas de la API mayores que
+    INVENTARIO_COMPRESION_MIN_BYTES, si el cliente lo acepta (Accept-Encoding).
+    Las respuestas chicas no se comprimen: el ahorro no compensa el costo.
+    """
+
+    def process_response(self, request, response):
+        if not request.path.startswith('/api/'):
+            return response
+        umbral = getattr(settings, 'INVENTARIO_COMPRESION_MIN_BYTES', 1024)
+        if not response.streaming and len(response.content) < umbral:
+            return response
+        return super().process_response(request, response)
+
+
+class MetricasMiddleware:
+    """
+    Mide cada petición a la API: consultas y tiempo SQL, tiempo de la vista
+    fuera de SQL (serialización y renderizado) y tiempo total. Los agrega en
+    inventario.metricas por ruta (nombre de la URL, p. ej. `vehiculo-estados`)
+    y los envía en el encabezado Server-Timing.
+    Se desactiva con INVENTARIO_METRICAS = False.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INVENTARIO_METRICAS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+            self.process_view = self._process_view_async
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        if not request.path.startswith('/api/'):
+            return self.get_response(request)
+        medicion, token = metricas.iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            metricas.terminar(token)
+        return self.registrar(request, response, medicion)
+
+    async def __acall__(self, request):
+        if not request.path.startswith('/api/'):
+            return await self.get_response(request)
+        medicion, token = metricas.iniciar()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metricas.terminar(token)
+        return self.registrar(request, response, medicion)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metricas.inicio_vista()
+
+    async def _process_view_async(self, request, view_func, view_args, view_kwargs):
+        # Con ASGI Django espera un process_view asíncrono; uno síncrono pasaría por un hilo
+        metricas.inicio_vista()
+
+    def registrar(self, request, response, medicion):
+        fin = time.perf_counter()
+        total = fin - medicion.inicio
+        serializacion = 0.0
+        if medicion.inicio_vista is not None:
+            sql_vista = medicion.sql - medicion.sql_inicio_vista
+            serializacion = max(fin - medicion.inicio_vista - sql_vista, 0.0)
+        coincidencia = request.resolver_match
+        ruta = coincidencia.url_name if coincidencia and coincidencia.url_name else 'sin_ruta'
+
+        metricas.registrar(ruta, request.method, total, medicion.consultas, medicion.sql, serializacion)
+        response['Server-Timing'] = (
+            f'sql;dur={medicion.sql * 1000:.1f};desc="consultas: {medicion.consultas}", '
+            f'serializacion;dur={serializacion * 1000:.1f}, total;dur={total * 1000:.1f}'
+        )
+        return response
+
+
+class DetectorConsultasMiddleware:
+    """
+    Busca consultas N+1 y lentas en cada petición (ver inventario/detector_consultas.py).
+    Solo se activa con INVENTARIO_DETECTAR_CONSULTAS = 'log' o 'estricto'.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INVENTARIO_DETECTAR_CONSULTAS', ''):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        with detectar_consultas(contexto=f'{request.method} {request.get_full_path()}'):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with detectar_consultas(contexto=f'{request.method} {request.get_full_path()}'):
+            return await self.get_response(request)
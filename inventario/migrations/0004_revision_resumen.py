@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0003_remove_itemrevision_item_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='revision',
+            name='equipos_no',
+            field=models.PositiveIntegerField(default=0, help_text='Cantidad de equipos marcados como NO'),
+        ),
+        migrations.AddField(
+            model_name='revision',
+            name='equipos_si',
+            field=models.PositiveIntegerField(default=0, help_text='Cantidad de equipos marcados como SI'),
+        ),
+        migrations.AddField(
+            model_name='revision',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('completo', 'Completo'), ('critico', 'Crítico')], db_index=True, default='pendiente', help_text='Estado general calculado a partir de los detalles', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='revision',
+            name='total_equipos',
+            field=models.PositiveIntegerField(default=0, help_text='Cantidad de equipos revisados'),
+        ),
+    ]
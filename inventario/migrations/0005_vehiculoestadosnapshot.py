@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0004_revision_resumen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehiculoEstadoSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('responsable', models.CharField(blank=True, help_text='Responsable al que corresponde el estado (vacío: cualquier responsable)', max_length=100)),
+                ('ultima_revision_fecha', models.DateTimeField(blank=True, null=True)),
+                ('ultima_revision_responsable', models.CharField(blank=True, max_length=100)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('completo', 'Completo'), ('critico', 'Crítico')], default='pendiente', max_length=10)),
+                ('equipos_revisados', models.PositiveIntegerField(default=0)),
+                ('equipos_si', models.PositiveIntegerField(default=0)),
+                ('equipos_no', models.PositiveIntegerField(default=0)),
+                ('revision', models.ForeignKey(blank=True, help_text='Última revisión del vehículo para este responsable', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventario.revision')),
+                ('vehiculo', models.ForeignKey(help_text='Vehículo al que corresponde el estado', on_delete=django.db.models.deletion.CASCADE, related_name='estados_snapshot', to='inventario.vehiculo')),
+            ],
+            options={
+                'verbose_name': 'Estado de vehículo',
+                'verbose_name_plural': 'Estados de vehículos',
+                'unique_together': {('vehiculo', 'responsable')},
+            },
+        ),
+    ]
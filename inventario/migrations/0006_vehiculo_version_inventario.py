@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0005_vehiculoestadosnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehiculo',
+            name='version_inventario',
+            field=models.PositiveIntegerField(default=0, help_text='Se incrementa con cada cambio en sus compartimentos o equipos'),
+        ),
+    ]
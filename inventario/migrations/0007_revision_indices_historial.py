@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0006_vehiculo_version_inventario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detallerevision',
+            index=models.Index(fields=['revision', 'estado'], name='detalle_rev_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='revision',
+            index=models.Index(fields=['vehiculo', 'responsable', 'fecha'], name='revision_veh_resp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='revision',
+            index=models.Index(fields=['vehiculo', 'fecha'], name='revision_veh_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='revision',
+            index=models.Index(fields=['fecha', 'id'], name='revision_fecha_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0007_revision_indices_historial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='revision',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, help_text='Clave generada por el cliente para que reenviar la revisión no la duplique', max_length=64, null=True, unique=True),
+        ),
+    ]
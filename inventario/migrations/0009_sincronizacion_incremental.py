@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0008_revision_clave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroEliminado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('compartimento', 'Compartimento'), ('equipo', 'Equipo')], max_length=20)),
+                ('objeto_id', models.PositiveIntegerField(help_text='ID del compartimento o equipo')),
+                ('vehiculo_id', models.PositiveIntegerField(blank=True, help_text='Vehículo de cuyo inventario salió (sin clave foránea: puede haberse eliminado)', null=True)),
+                ('fecha', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Registro eliminado',
+                'verbose_name_plural': 'Registros eliminados',
+                'ordering': ['fecha'],
+            },
+        ),
+        migrations.AddField(
+            model_name='compartimento',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, db_index=True, help_text='Última modificación'),
+        ),
+        migrations.AddField(
+            model_name='equipo',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, db_index=True, help_text='Última modificación'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0009_sincronizacion_incremental'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehiculo',
+            name='imagen_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Versiones reducidas de la foto (ver inventario/imagenes.py)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0010_vehiculo_imagen_variantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='revision',
+            name='detalles_archivados',
+            field=models.JSONField(blank=True, editable=False, help_text='Detalles compactados al archivar la revisión (ver inventario/archivo.py)', null=True),
+        ),
+    ]
@@ -1,8 +1,10 @@
 """
 Modelos para el sistema de inventario de vehículos de bomberos.
 """
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Vehiculo(models.Model):
@@ -10,9 +12,19 @@ class Vehiculo(models.Model):
     codigo = models.CharField(max_length=20, unique=True, help_text="Código único del vehículo (ej: PMH-01)")
     nombre = models.CharField(max_length=100, blank=True, help_text="Nombre descriptivo del vehículo")
     imagen = models.ImageField(upload_to='vehiculos/', null=True, blank=True, help_text="Foto del vehículo")
+    imagen_variantes = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Versiones reducidas de la foto (ver inventario/imagenes.py)"
+    )
     activo = models.BooleanField(default=True, help_text="Indica si el vehículo está activo en el inventario")
     fecha_creacion = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True, null=True, blank=True)
+    version_inventario = models.PositiveIntegerField(
+        default=0,
+        help_text="Se incrementa con cada cambio en sus compartimentos o equipos"
+    )
 
     class Meta:
         verbose_name = "Vehículo"
@@ -27,31 +39,8 @@ class Vehiculo(models.Model):
         Calcula el estado general del vehículo basado en la última revisión.
         Retorna: 'pendiente', 'completo', 'critico'
         """
-        if responsable:
-            revisiones = self.revisiones.filter(responsable=responsable).order_by('-fecha')
-        else:
-            revisiones = self.revisiones.all().order_by('-fecha')
-
-        if not revisiones.exists():
-            return 'pendiente'
-
-        ultima_revision = revisiones.first()
-        detalles = ultima_revision.detalles_revision.all()
-
-        if not detalles.exists():
-            return 'pendiente'
-
-        # Si hay algún equipo marcado como NO, es crítico
-        tiene_no = detalles.filter(estado='no').exists()
-        if tiene_no:
-            return 'critico'
-
-        # Si todos están marcados como SI, está completo
-        todos_si = detalles.filter(estado='si').count() == detalles.count()
-        if todos_si:
-            return 'completo'
-
-        return 'pendiente'
+        from .estados import calcular_estado_vehiculo
+        return calcular_estado_vehiculo(self, responsable)['estado']
 
 
 class Compartimento(models.Model):
@@ -65,6 +54,7 @@ class Compartimento(models.Model):
     nombre = models.CharField(max_length=100, help_text="Nombre del compartimento (ej: Lateral izquierdo)")
     orden = models.PositiveIntegerField(default=0, help_text="Orden de visualización")
     activo = models.BooleanField(default=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, db_index=True, help_text="Última modificación")
 
     class Meta:
         verbose_name = "Compartimento"
@@ -88,6 +78,7 @@ class Equipo(models.Model):
     cantidad_esperada = models.PositiveIntegerField(default=1, help_text="Cantidad esperada de este equipo")
     orden = models.PositiveIntegerField(default=0, help_text="Orden de visualización")
     activo = models.BooleanField(default=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True, db_index=True, help_text="Última modificación")
 
     class Meta:
         verbose_name = "Equipo"
@@ -98,8 +89,42 @@ class Equipo(models.Model):
         return f"{self.compartimento} - {self.nombre}"
 
 
+class RegistroEliminado(models.Model):
+    """
+    Marca de un compartimento o equipo que salió del inventario de un vehículo
+    (eliminado o movido a otro vehículo), para la sincronización incremental.
+    """
+    MODELO_CHOICES = [
+        ('compartimento', 'Compartimento'),
+        ('equipo', 'Equipo'),
+    ]
+
+    modelo = models.CharField(max_length=20, choices=MODELO_CHOICES)
+    objeto_id = models.PositiveIntegerField(help_text="ID del compartimento o equipo")
+    vehiculo_id = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Vehículo de cuyo inventario salió (sin clave foránea: puede haberse eliminado)"
+    )
+    fecha = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "Registro eliminado"
+        verbose_name_plural = "Registros eliminados"
+        ordering = ['fecha']
+
+    def __str__(self):
+        return f"{self.modelo} {self.objeto_id} ({self.fecha:%Y-%m-%d %H:%M})"
+
+
 class Revision(models.Model):
     """Modelo para representar una revisión completa de un vehículo."""
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('completo', 'Completo'),
+        ('critico', 'Crítico'),
+    ]
+
     vehiculo = models.ForeignKey(
         Vehiculo,
         on_delete=models.CASCADE,
@@ -120,25 +145,57 @@ class Revision(models.Model):
     )
     fecha = models.DateTimeField(auto_now_add=True, help_text="Fecha y hora de la revisión")
     observaciones_generales = models.TextField(blank=True, help_text="Observaciones generales de la revisión")
+    clave_idempotencia = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        unique=True,
+        help_text="Clave generada por el cliente para que reenviar la revisión no la duplique"
+    )
+    detalles_archivados = models.JSONField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Detalles compactados al archivar la revisión (ver inventario/archivo.py)"
+    )
+    # Resumen desnormalizado de los detalles, mantenido al escribir
+    total_equipos = models.PositiveIntegerField(default=0, help_text="Cantidad de equipos revisados")
+    equipos_si = models.PositiveIntegerField(default=0, help_text="Cantidad de equipos marcados como SI")
+    equipos_no = models.PositiveIntegerField(default=0, help_text="Cantidad de equipos marcados como NO")
+    estado = models.CharField(
+        max_length=10,
+        choices=ESTADO_CHOICES,
+        default='pendiente',
+        db_index=True,
+        help_text="Estado general calculado a partir de los detalles"
+    )
 
     class Meta:
         verbose_name = "Revisión"
         verbose_name_plural = "Revisiones"
         ordering = ['-fecha']
+        indexes = [
+            # Historial por vehículo y responsable, y listado general, paginados por (fecha, id)
+            models.Index(fields=['vehiculo', 'responsable', 'fecha'], name='revision_veh_resp_fecha_idx'),
+            models.Index(fields=['vehiculo', 'fecha'], name='revision_veh_fecha_idx'),
+            models.Index(fields=['fecha', 'id'], name='revision_fecha_id_idx'),
+        ]
 
     def __str__(self):
         return f"Revisión {self.vehiculo.codigo} - {self.fecha.strftime('%Y-%m-%d %H:%M')}"
 
     def calcular_estado(self):
         """Calcula el estado general de la revisión."""
-        detalles = self.detalles_revision.all()
-        if not detalles.exists():
-            return 'pendiente'
-        if detalles.filter(estado='no').exists():
-            return 'critico'
-        if detalles.filter(estado='si').count() == detalles.count():
-            return 'completo'
-        return 'pendiente'
+        from .estados import estado_desde_conteos
+        return estado_desde_conteos(self.total_equipos, self.equipos_si, self.equipos_no)
+
+    def actualizar_resumen(self):
+        """Recalcula los contadores desde los detalles y los guarda."""
+        from .estados import actualizar_resumenes
+        resumen = actualizar_resumenes([self.pk]).get(self.pk)
+        if resumen:
+            for campo, valor in resumen.items():
+                setattr(self, campo, valor)
 
 
 class DetalleRevision(models.Model):
@@ -173,6 +230,58 @@ class DetalleRevision(models.Model):
         verbose_name = "Detalle de Revisión"
         verbose_name_plural = "Detalles de Revisión"
         unique_together = [['revision', 'equipo']]
+        indexes = [
+            models.Index(fields=['revision', 'estado'], name='detalle_rev_estado_idx'),
+        ]
 
     def __str__(self):
         return f"{self.revision} - {self.equipo.nombre}: {self.get_estado_display()}"
+
+    def clean(self):
+        """Una revisión archivada no acepta detalles: la API y las exportaciones solo leen su archivo."""
+        if self.revision_id and Revision.objects.filter(
+            pk=self.revision_id, detalles_archivados__isnull=False
+        ).exists():
+            raise ValidationError({
+                'revision': 'La revisión está archivada; sus detalles no se pueden modificar.'
+            })
+
+
+class VehiculoEstadoSnapshot(models.Model):
+    """
+    Estado actual de un vehículo, en general o para un responsable.
+    Se mantiene incrementalmente al guardar o eliminar revisiones.
+    """
+    vehiculo = models.ForeignKey(
+        Vehiculo,
+        on_delete=models.CASCADE,
+        related_name='estados_snapshot',
+        help_text="Vehículo al que corresponde el estado"
+    )
+    responsable = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Responsable al que corresponde el estado (vacío: cualquier responsable)"
+    )
+    revision = models.ForeignKey(
+        Revision,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Última revisión del vehículo para este responsable"
+    )
+    ultima_revision_fecha = models.DateTimeField(null=True, blank=True)
+    ultima_revision_responsable = models.CharField(max_length=100, blank=True)
+    estado = models.CharField(max_length=10, choices=Revision.ESTADO_CHOICES, default='pendiente')
+    equipos_revisados = models.PositiveIntegerField(default=0)
+    equipos_si = models.PositiveIntegerField(default=0)
+    equipos_no = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Estado de vehículo"
+        verbose_name_plural = "Estados de vehículos"
+        unique_together = [['vehiculo', 'responsable']]
+
+    def __str__(self):
+        return f"{self.vehiculo_id} [{self.responsable or 'todos'}]: {self.estado}"
@@ -0,0 +1,142 @@
+"""
+Paginación por cursor (keyset) para el historial de revisiones.
+
+En lugar de OFFSET y COUNT(*), cada página filtra a partir de la clave
+(fecha, id) del último elemento entregado, así la página más antigua de un
+vehículo cuesta lo mismo que la más reciente. Se activa con `?paginacion=cursor`
+o al seguir un enlace con `?cursor=`.
+"""
+import base64
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class RevisionCursorPagination(BasePagination):
+    """Paginación por cursor sobre (fecha, id), de la más reciente a la más antigua."""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    invalid_cursor_message = 'Cursor inválido'
+
+    def __init__(self):
+        self.page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE') or 50
+
+    @classmethod
+    def solicitada(cls, request):
+        """Indica si la petición pide paginación por cursor."""
+        return (
+            request.query_params.get('paginacion') == 'cursor'
+            or cls.cursor_query_param in request.query_params
+        )
+
+    def get_page_size(self, request):
+        try:
+            tamano = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(tamano, 1), self.max_page_size)
+
+    def codificar_cursor(self, objeto, direccion):
+        valor = f'{objeto.fecha.isoformat()}|{objeto.pk}|{direccion}'
+        return base64.urlsafe_b64encode(valor.encode()).decode()
+
+    def decodificar_cursor(self, request):
+        """Retorna (fecha, id, direccion) o None si no hay cursor."""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            fecha, pk, direccion = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            fecha = parse_datetime(fecha)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if fecha is None or direccion not in ('siguiente', 'anterior'):
+            raise NotFound(self.invalid_cursor_message)
+        return fecha, pk, direccion
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.asignar_resultados(list(self.preparar_consulta(queryset, request)))
+
+    def preparar_consulta(self, queryset, request):
+        """
+        Filtra y ordena el queryset según el cursor de la petición.
+        Separado de asignar_resultados() para poder evaluarlo con el ORM asíncrono.
+        """
+        self.request = request
+        self.tamano = self.get_page_size(request)
+        self.cursor = self.decodificar_cursor(request)
+
+        if self.cursor is None:
+            self.direccion = 'siguiente'
+            queryset = queryset.order_by('-fecha', '-id')
+        else:
+            fecha, pk, self.direccion = self.cursor
+            if self.direccion == 'siguiente':
+                queryset = queryset.filter(
+                    Q(fecha__lt=fecha) | Q(fecha=fecha, id__lt=pk)
+                ).order_by('-fecha', '-id')
+            else:
+                queryset = queryset.filter(
+                    Q(fecha__gt=fecha) | Q(fecha=fecha, id__gt=pk)
+                ).order_by('fecha', 'id')
+
+        # Se pide un elemento extra para saber si hay más en esa dirección
+        return queryset[:self.tamano + 1]
+
+    def asignar_resultados(self, resultados):
+        """Recibe las filas de preparar_consulta() y retorna las de la página."""
+        hay_mas = len(resultados) > self.tamano
+        resultados = resultados[:self.tamano]
+        if self.direccion == 'anterior':
+            resultados.reverse()
+
+        if self.direccion == 'siguiente':
+            self.hay_siguiente, self.hay_anterior = hay_mas, self.cursor is not None
+        else:
+            self.hay_siguiente, self.hay_anterior = self.cursor is not None, hay_mas
+        self.resultados = resultados
+        return resultados
+
+    def enlace(self, objeto, direccion):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'paginacion')
+        return replace_query_param(url, self.cursor_query_param, self.codificar_cursor(objeto, direccion))
+
+    def get_next_link(self):
+        if not (self.hay_siguiente and self.resultados):
+            return None
+        return self.enlace(self.resultados[-1], 'siguiente')
+
+    def get_previous_link(self):
+        if not (self.hay_anterior and self.resultados):
+            return None
+        return self.enlace(self.resultados[0], 'anterior')
+
+    def datos_paginados(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.datos_paginados(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
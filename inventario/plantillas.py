@@ -0,0 +1,171 @@
+"""
+Inventario de un vehículo usado como plantilla de otros.
+
+Las unidades de un mismo modelo (p. ej. PMH-01, PMH-02 y PMH-03) llevan los
+mismos compartimentos y equipos. clonar_inventario() copia el árbol activo de
+un vehículo plantilla a uno o varios vehículos destino en una transacción,
+con bulk_create y bulk_update y un número fijo de consultas, sin importar
+cuántos destinos o equipos haya.
+
+Los compartimentos se corresponden por nombre (únicos por vehículo) y los
+equipos por nombre dentro de su compartimento; con nombres repetidos, el
+n-ésimo de la plantilla con el n-ésimo del destino. Al clonar solo se agrega
+lo que falta, y lo desactivado en el destino se respeta: a un compartimento
+inactivo no se le agregan equipos. Al sincronizar además se copian orden y
+cantidad esperada, se reactiva lo que corresponde y se desactiva lo que la
+plantilla no tiene. Nunca se borra nada: los detalles de revisiones
+anteriores siguen apuntando a sus equipos.
+
+Los árboles se leen dentro de la transacción, con la plantilla y los destinos
+bloqueados, así que un lote (inventario/lotes.py) no puede cambiarlos entre la
+lectura y la escritura. Como allí, las operaciones en bloque no disparan
+señales: se sella `fecha_actualizacion` de cada fila tocada y se incrementa
+una vez la versión de cada vehículo modificado; y en MySQL, donde bulk_create
+no devuelve ids, los compartimentos nuevos se insertan uno por uno para que
+sus equipos tengan a qué apuntar.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .lotes import crear_en_bloque
+from .models import Vehiculo, Compartimento, Equipo
+from .versiones import incrementar_version
+
+
+def _arboles(vehiculo_ids):
+    """
+    Árbol de cada vehículo con dos consultas:
+    {vehiculo_id: {nombre: (compartimento, {(nombre, n): equipo})}}.
+    """
+    arboles = {vehiculo_id: {} for vehiculo_id in vehiculo_ids}
+    por_id = {}
+    for compartimento in Compartimento.objects.filter(vehiculo_id__in=vehiculo_ids).order_by('orden', 'id'):
+        nodo = por_id[compartimento.id] = (compartimento, {})
+        arboles[compartimento.vehiculo_id][compartimento.nombre] = nodo
+    repetidos = Counter()
+    for equipo in Equipo.objects.filter(compartimento__vehiculo_id__in=vehiculo_ids).order_by('orden', 'id'):
+        clave = (equipo.compartimento_id, equipo.nombre)
+        por_id[equipo.compartimento_id][1][(equipo.nombre, repetidos[clave])] = equipo
+        repetidos[clave] += 1
+    return arboles
+
+
+def _plantilla(arbol):
+    """Solo lo activo de la plantilla, con los equipos renumerados sin los inactivos."""
+    activo = {}
+    for nombre, (compartimento, equipos) in arbol.items():
+        if not compartimento.activo:
+            continue
+        repetidos = Counter()
+        activos = {}
+        for (nombre_equipo, _), equipo in equipos.items():
+            if equipo.activo:
+                activos[(nombre_equipo, repetidos[nombre_equipo])] = equipo
+                repetidos[nombre_equipo] += 1
+        activo[nombre] = (compartimento, activos)
+    return activo
+
+
+def _cambiar(objeto, ahora, **valores):
+    """Asigna los valores que difieren. Retorna True si cambió algo."""
+    distintos = {campo: valor for campo, valor in valores.items() if getattr(objeto, campo) != valor}
+    for campo, valor in distintos.items():
+        setattr(objeto, campo, valor)
+    if distintos:
+        objeto.fecha_actualizacion = ahora
+    return bool(distintos)
+
+
+def clonar_inventario(plantilla_id, destino_ids, sincronizar=False):
+    """
+    Copia el inventario activo del vehículo `plantilla_id` a cada vehículo de
+    `destino_ids` (que no debe incluirlo). Retorna un resumen por destino, en
+    el mismo orden: {'vehiculo', 'compartimentos_creados', 'equipos_creados',
+    'actualizados', 'desactivados'}.
+    """
+    destino_ids = list(dict.fromkeys(destino_ids))
+    if plantilla_id in destino_ids:
+        raise ValueError('El vehículo plantilla no puede ser también destino.')
+    with transaction.atomic():
+        # Bloqueo en orden de id: dos clonaciones con vehículos en común no se traban
+        list(Vehiculo.objects.select_for_update().filter(
+            pk__in=[plantilla_id, *destino_ids]
+        ).order_by('id').values_list('id', flat=True))
+        resumen = _clonar(plantilla_id, destino_ids, sincronizar)
+
+    return [{
+        'vehiculo': vehiculo_id,
+        'compartimentos_creados': resumen[vehiculo_id]['compartimentos_creados'],
+        'equipos_creados': resumen[vehiculo_id]['equipos_creados'],
+        'actualizados': resumen[vehiculo_id]['actualizados'],
+        'desactivados': resumen[vehiculo_id]['desactivados'],
+    } for vehiculo_id in destino_ids]
+
+
+def _clonar(plantilla_id, destino_ids, sincronizar):
+    """clonar_inventario() dentro de su transacción. Retorna {vehiculo_id: Counter}."""
+    arboles = _arboles([plantilla_id, *destino_ids])
+    plantilla = _plantilla(arboles[plantilla_id])
+    ahora = timezone.now()
+
+    resumen = {vehiculo_id: Counter() for vehiculo_id in destino_ids}
+    nuevos_compartimentos, nuevos_equipos = [], []
+    compartimentos_modificados, equipos_modificados = [], []
+    for vehiculo_id in destino_ids:
+        destino = arboles[vehiculo_id]
+        for nombre, (modelo, equipos_modelo) in plantilla.items():
+            if nombre in destino:
+                compartimento, equipos = destino[nombre]
+                if not sincronizar and not compartimento.activo:
+                    continue
+                if sincronizar and _cambiar(compartimento, ahora, orden=modelo.orden, activo=True):
+                    compartimentos_modificados.append(compartimento)
+                    resumen[vehiculo_id]['actualizados'] += 1
+            else:
+                compartimento = Compartimento(vehiculo_id=vehiculo_id, nombre=nombre, orden=modelo.orden)
+                equipos = {}
+                nuevos_compartimentos.append(compartimento)
+                resumen[vehiculo_id]['compartimentos_creados'] += 1
+
+            for clave, equipo_modelo in equipos_modelo.items():
+                valores = {'cantidad_esperada': equipo_modelo.cantidad_esperada, 'orden': equipo_modelo.orden}
+                if clave not in equipos:
+                    # El compartimento puede ser nuevo: ya tiene id cuando se crean los equipos
+                    nuevos_equipos.append(
+                        Equipo(compartimento=compartimento, nombre=equipo_modelo.nombre, **valores)
+                    )
+                    resumen[vehiculo_id]['equipos_creados'] += 1
+                elif sincronizar and _cambiar(equipos[clave], ahora, activo=True, **valores):
+                    equipos_modificados.append(equipos[clave])
+                    resumen[vehiculo_id]['actualizados'] += 1
+
+        if not sincronizar:
+            continue
+        for nombre, (compartimento, equipos) in destino.items():
+            sobrantes = list(equipos.items()) if nombre not in plantilla else [
+                (clave, equipo) for clave, equipo in equipos.items() if clave not in plantilla[nombre][1]
+            ]
+            if nombre not in plantilla and _cambiar(compartimento, ahora, activo=False):
+                compartimentos_modificados.append(compartimento)
+                resumen[vehiculo_id]['desactivados'] += 1
+            for _, equipo in sobrantes:
+                if _cambiar(equipo, ahora, activo=False):
+                    equipos_modificados.append(equipo)
+                    resumen[vehiculo_id]['desactivados'] += 1
+
+    crear_en_bloque(Compartimento, nuevos_compartimentos)
+    Equipo.objects.bulk_create(nuevos_equipos, batch_size=500)
+    # bulk_update no aplica auto_now: _cambiar ya selló la fecha
+    Compartimento.objects.bulk_update(
+        compartimentos_modificados, ['orden', 'activo', 'fecha_actualizacion'], batch_size=500
+    )
+    Equipo.objects.bulk_update(
+        equipos_modificados, ['cantidad_esperada', 'orden', 'activo', 'fecha_actualizacion'],
+        batch_size=500,
+    )
+    modificados = [vehiculo_id for vehiculo_id, contadores in resumen.items() if sum(contadores.values())]
+    if modificados:
+        incrementar_version(Vehiculo.objects.filter(pk__in=modificados))
+    return resumen
@@ -0,0 +1,47 @@
+"""
+Renderizado JSON rápido para la API.
+
+Usa orjson cuando está instalado: serializa los árboles de vehículos y los
+detalles de revisiones varias veces más rápido que el módulo json estándar.
+Sin orjson, o si se pide JSON indentado, se usa el renderer de DRF.
+"""
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+_encoder = JSONEncoder()
+# Las fechas pasan por el encoder de DRF para que el formato no cambie
+_OPCIONES = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else None
+
+
+def _por_defecto(obj):
+    """Tipos que orjson no conoce o que DRF formatea distinto (fechas, Decimal, textos traducibles...)."""
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    """Serializa `data` a bytes JSON compactos en UTF-8."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_por_defecto, option=_OPCIONES)
+    return JSONRenderer().render(data)
+
+
+def respuesta_json(data, status=200):
+    """Equivalente a JsonResponse(data, safe=False) usando dumps()."""
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """JSONRenderer de DRF que serializa con orjson cuando está disponible."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
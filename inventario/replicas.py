@@ -0,0 +1,78 @@
+"""
+Enrutamiento opcional de lecturas a réplicas de la base de datos.
+
+Las vistas marcan sus lecturas seguras con LecturaReplicaMixin; dentro de ese
+contexto ReplicaRouter envía las consultas de lectura a una de las réplicas de
+`settings.INVENTARIO_DB_REPLICAS`. Todo lo demás queda en `default`:
+escrituras, lecturas fuera del contexto, lecturas dentro de una transacción y
+cualquier lectura posterior a una escritura en la misma petición.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Si la petición actual puede leer de una réplica
+_lectura_replica = ContextVar('inventario_lectura_replica', default=False)
+# Si la petición actual ya escribió: sus lecturas siguientes van al primario
+_escritura_realizada = ContextVar('inventario_escritura_realizada', default=False)
+
+
+def replicas_configuradas():
+    return list(getattr(settings, 'INVENTARIO_DB_REPLICAS', []))
+
+
+@contextmanager
+def lecturas_en_replica():
+    """Permite que las lecturas del bloque vayan a una réplica."""
+    token_lectura = _lectura_replica.set(True)
+    token_escritura = _escritura_realizada.set(False)
+    try:
+        yield
+    finally:
+        _escritura_realizada.reset(token_escritura)
+        _lectura_replica.reset(token_lectura)
+
+
+class ReplicaRouter:
+    """Router de Django: lecturas marcadas a réplicas, el resto al primario."""
+
+    def db_for_read(self, model, **hints):
+        replicas = replicas_configuradas()
+        if not replicas or not _lectura_replica.get():
+            return None
+        if _escritura_realizada.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if _lectura_replica.get():
+            _escritura_realizada.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario y réplicas tienen los mismos datos
+        return True
+
+
+class LecturaReplicaMixin:
+    """
+    Envía a las réplicas las lecturas de las acciones indicadas en peticiones
+    GET/HEAD. `acciones_replica = None` habilita todas las acciones.
+    """
+    acciones_replica = None
+
+    def usa_replica(self, request):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return False
+        return self.acciones_replica is None or self.action in self.acciones_replica
+
+    def dispatch(self, request, *args, **kwargs):
+        # self.action aún no existe: se resuelve igual que ViewSetMixin.initialize_request
+        self.action = self.action_map.get(request.method.lower()) if hasattr(self, 'action_map') else None
+        if not self.usa_replica(request):
+            return super().dispatch(request, *args, **kwargs)
+        with lecturas_en_replica():
+            return super().dispatch(request, *args, **kwargs)
@@ -1,9 +1,43 @@
 """
 Serializers para la API REST del sistema de inventario.
 """
+from collections import Counter
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
 from .models import Vehiculo, Compartimento, Equipo, Revision, DetalleRevision
+from .estados import resumen_desde_estados
+from .imagenes import srcset
+
+
+class CamposDinamicosMixin:
+    """
+    Permite elegir los campos de salida de un serializer.
+    - `campos`: lista de nombres a incluir (?fields=); None incluye todos.
+    - `expandir`: nombres de `expansiones` a agregar (?expand=), por ejemplo
+      el vehículo anidado en lugar de su id.
+    """
+    expansiones = {}
+
+    def __init__(self, *args, **kwargs):
+        campos = kwargs.pop('campos', None)
+        expandir = kwargs.pop('expandir', None)
+        super().__init__(*args, **kwargs)
+
+        for nombre in expandir or ():
+            if nombre in self.expansiones:
+                self.fields[nombre] = self.expansiones[nombre]()
+        if campos:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
+
+def conteo_anotado(obj, anotacion, relacion):
+    """Usa el conteo anotado por el queryset si existe; si no, cuenta la relación (precargada)."""
+    if hasattr(obj, anotacion):
+        return getattr(obj, anotacion)
+    return getattr(obj, relacion).count()
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -18,35 +52,82 @@ class EquipoSerializer(serializers.ModelSerializer):
     """Serializer para equipos."""
     class Meta:
         model = Equipo
-        fields = ['id', 'compartimento', 'nombre', 'cantidad_esperada', 'orden', 'activo']
-        read_only_fields = ['id']
+        fields = ['id', 'compartimento', 'nombre', 'cantidad_esperada', 'orden', 'activo', 'fecha_actualizacion']
+        read_only_fields = ['id', 'fecha_actualizacion']
 
 
-class CompartimentoSerializer(serializers.ModelSerializer):
+class VehiculoResumenSerializer(serializers.ModelSerializer):
+    """Serializer mínimo de vehículo, usado al expandir relaciones (?expand=vehiculo)."""
+    class Meta:
+        model = Vehiculo
+        fields = ['id', 'codigo', 'nombre']
+
+
+class CompartimentoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para compartimentos con sus equipos."""
     equipos = EquipoSerializer(many=True, read_only=True)
-    equipos_count = serializers.IntegerField(source='equipos.count', read_only=True)
+    equipos_count = serializers.SerializerMethodField()
+
+    expansiones = {
+        'vehiculo': lambda: VehiculoResumenSerializer(read_only=True),
+    }
 
     class Meta:
         model = Compartimento
-        fields = ['id', 'vehiculo', 'nombre', 'orden', 'activo', 'equipos', 'equipos_count']
-        read_only_fields = ['id']
+        fields = ['id', 'vehiculo', 'nombre', 'orden', 'activo', 'fecha_actualizacion', 'equipos', 'equipos_count']
+        read_only_fields = ['id', 'fecha_actualizacion']
+
+    def get_equipos_count(self, obj):
+        return conteo_anotado(obj, '_equipos_count', 'equipos')
+
+
+class VehiculoListSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    """
+    Serializer compacto para el listado de vehículos, sin el árbol de compartimentos.
+    Los conteos se leen de anotaciones del queryset.
+    """
+    compartimentos_count = serializers.SerializerMethodField()
+    equipos_count = serializers.SerializerMethodField()
+    imagen_srcset = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Vehiculo
+        fields = [
+            'id', 'codigo', 'nombre', 'imagen', 'imagen_srcset', 'activo',
+            'fecha_creacion', 'fecha_actualizacion',
+            'compartimentos_count', 'equipos_count'
+        ]
+
+    def get_imagen_srcset(self, obj):
+        return srcset(obj, self.context.get('request'))
+
+    def get_compartimentos_count(self, obj):
+        return conteo_anotado(obj, '_compartimentos_count', 'compartimentos')
+
+    def get_equipos_count(self, obj):
+        if hasattr(obj, '_equipos_count'):
+            return obj._equipos_count
+        return Equipo.objects.filter(compartimento__vehiculo=obj).count()
 
 
 class VehiculoSerializer(serializers.ModelSerializer):
-    """Serializer básico para vehículos."""
+    """Serializer completo de vehículos, con el árbol de compartimentos y equipos."""
     compartimentos = CompartimentoSerializer(many=True, read_only=True)
     compartimentos_count = serializers.IntegerField(source='compartimentos.count', read_only=True)
+    imagen_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Vehiculo
         fields = [
-            'id', 'codigo', 'nombre', 'imagen', 'activo',
+            'id', 'codigo', 'nombre', 'imagen', 'imagen_srcset', 'activo',
             'fecha_creacion', 'fecha_actualizacion',
             'compartimentos', 'compartimentos_count'
         ]
         read_only_fields = ['id', 'fecha_creacion', 'fecha_actualizacion']
 
+    def get_imagen_srcset(self, obj):
+        return srcset(obj, self.context.get('request'))
+
 
 class VehiculoEstadoSerializer(serializers.Serializer):
     """Serializer para el estado calculado de un vehículo."""
@@ -76,16 +157,17 @@ class DetalleRevisionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RevisionSerializer(serializers.ModelSerializer):
+class RevisionSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """Serializer para revisiones con sus detalles."""
     detalles_revision = DetalleRevisionSerializer(many=True, read_only=True)
     vehiculo_codigo = serializers.CharField(source='vehiculo.codigo', read_only=True)
     vehiculo_nombre = serializers.CharField(source='vehiculo.nombre', read_only=True)
     usuario_nombre = serializers.CharField(source='usuario.username', read_only=True, allow_null=True)
-    estado_calculado = serializers.CharField(read_only=True)
-    total_equipos = serializers.IntegerField(read_only=True)
-    equipos_si = serializers.IntegerField(read_only=True)
-    equipos_no = serializers.IntegerField(read_only=True)
+    estado_calculado = serializers.CharField(source='estado', read_only=True)
+
+    expansiones = {
+        'vehiculo': lambda: VehiculoResumenSerializer(read_only=True),
+    }
 
     class Meta:
         model = Revision
@@ -99,19 +181,189 @@ class RevisionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'fecha', 'estado_calculado', 'total_equipos', 'equipos_si', 'equipos_no']
 
 
+class DetalleRevisionCreateSerializer(serializers.Serializer):
+    """
+    Serializer de escritura para detalles de revisión.
+    Los equipos se validan en bloque en RevisionCreateSerializer.
+    """
+    equipo = serializers.IntegerField()
+    estado = serializers.ChoiceField(choices=DetalleRevision.ESTADO_CHOICES, default='pendiente')
+    observaciones = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+def validar_equipos_no_repetidos(detalles):
+    """Rechaza detalles que repiten un mismo equipo."""
+    repetidos = sorted(
+        equipo_id
+        for equipo_id, veces in Counter(detalle['equipo'] for detalle in detalles).items()
+        if veces > 1
+    )
+    if repetidos:
+        raise serializers.ValidationError(f"Equipos repetidos en la revisión: {repetidos}")
+    return detalles
+
+
 class RevisionCreateSerializer(serializers.ModelSerializer):
-    """Serializer para crear una nueva revisión con sus detalles."""
-    detalles = DetalleRevisionSerializer(many=True, write_only=True)
+    """
+    Serializer para crear una nueva revisión con sus detalles.
+    Con `clave_idempotencia`, la vista devuelve la revisión ya creada en lugar de duplicarla.
+    """
+    detalles = DetalleRevisionCreateSerializer(many=True, write_only=True)
 
     class Meta:
         model = Revision
-        fields = ['vehiculo', 'responsable', 'observaciones_generales', 'detalles']
+        fields = ['vehiculo', 'responsable', 'observaciones_generales', 'clave_idempotencia', 'detalles']
+        # La unicidad de la clave la resuelve la vista, respondiendo con la revisión existente
+        extra_kwargs = {'clave_idempotencia': {'validators': []}}
+
+    def validate_detalles(self, detalles):
+        return validar_equipos_no_repetidos(detalles)
+
+    def validate(self, attrs):
+        """Valida en una sola consulta que los equipos estén activos y sean del vehículo."""
+        equipo_ids = [detalle['equipo'] for detalle in attrs['detalles']]
+
+        validos = set(Equipo.objects.filter(
+            id__in=equipo_ids,
+            activo=True,
+            compartimento__vehiculo=attrs['vehiculo'],
+        ).values_list('id', flat=True))
+        invalidos = [equipo_id for equipo_id in equipo_ids if equipo_id not in validos]
+        if invalidos:
+            raise serializers.ValidationError({
+                'detalles': f"Equipos inexistentes, inactivos o de otro vehículo: {invalidos}"
+            })
+
+        return attrs
 
     def create(self, validated_data):
         detalles_data = validated_data.pop('detalles')
-        revision = Revision.objects.create(**validated_data)
+        resumen = resumen_desde_estados(detalle_data['estado'] for detalle_data in detalles_data)
 
-        for detalle_data in detalles_data:
-            DetalleRevision.objects.create(revision=revision, **detalle_data)
+        with transaction.atomic():
+            revision = Revision.objects.create(**validated_data, **resumen)
+            DetalleRevision.objects.bulk_create([
+                DetalleRevision(
+                    revision=revision,
+                    equipo_id=detalle_data['equipo'],
+                    estado=detalle_data['estado'],
+                    observaciones=detalle_data['observaciones'],
+                )
+                for detalle_data in detalles_data
+            ], batch_size=500)
 
         return revision
+
+
+class RevisionSincronizarItemSerializer(serializers.Serializer):
+    """
+    Una revisión encolada en el dispositivo, dentro de una sincronización en lote.
+    Vehículo y equipos se validan en bloque para todo el lote (ver sincronizacion.py).
+    """
+    clave_idempotencia = serializers.CharField(max_length=64)
+    vehiculo = serializers.IntegerField()
+    responsable = serializers.CharField(max_length=100)
+    observaciones_generales = serializers.CharField(required=False, allow_blank=True, default='')
+    detalles = DetalleRevisionCreateSerializer(many=True)
+
+    def validate_detalles(self, detalles):
+        return validar_equipos_no_repetidos(detalles)
+
+
+class SincronizarRevisionesSerializer(serializers.Serializer):
+    """Lote de revisiones a sincronizar; cada elemento se valida por separado."""
+    revisiones = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=500)
+
+
+class ReferenciaCompartimentoField(serializers.Field):
+    """Id de un compartimento existente (entero) o `ref` de uno creado en el mismo lote (texto)."""
+    default_error_messages = {
+        'invalid': 'Usar el id de un compartimento o el `ref` de uno nuevo del lote.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not isinstance(data, (int, str)) or data == '':
+            self.fail('invalid')
+        return data
+
+    def to_representation(self, value):
+        return value
+
+
+class CompartimentoLoteSerializer(serializers.Serializer):
+    """Un compartimento a crear (sin `id`, con `ref` opcional) o a modificar (con `id`)."""
+    id = serializers.IntegerField(required=False)
+    ref = serializers.CharField(max_length=50, required=False)
+    nombre = serializers.CharField(max_length=100, required=False)
+    orden = serializers.IntegerField(min_value=0, required=False)
+    activo = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        if 'id' in attrs and 'ref' in attrs:
+            raise serializers.ValidationError('`ref` solo identifica compartimentos nuevos.')
+        if 'id' not in attrs and not attrs.get('nombre'):
+            raise serializers.ValidationError({'nombre': 'Requerido para crear un compartimento.'})
+        return attrs
+
+
+class EquipoLoteSerializer(serializers.Serializer):
+    """
+    Un equipo a crear (sin `id`) o a modificar (con `id`). `compartimento` admite
+    el `ref` de un compartimento nuevo del mismo lote.
+    """
+    id = serializers.IntegerField(required=False)
+    ref = serializers.CharField(max_length=50, required=False)
+    compartimento = ReferenciaCompartimentoField(required=False)
+    nombre = serializers.CharField(max_length=200, required=False)
+    cantidad_esperada = serializers.IntegerField(min_value=0, required=False)
+    orden = serializers.IntegerField(min_value=0, required=False)
+    activo = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        if 'id' in attrs and 'ref' in attrs:
+            raise serializers.ValidationError('`ref` solo identifica equipos nuevos.')
+        if 'id' not in attrs and not attrs.get('nombre'):
+            raise serializers.ValidationError({'nombre': 'Requerido para crear un equipo.'})
+        return attrs
+
+
+def validar_sin_repetidos(items, clave, descripcion):
+    """Rechaza elementos del lote que repiten un mismo `id` o `ref`."""
+    repetidos = sorted(
+        valor
+        for valor, veces in Counter(item[clave] for item in items if clave in item).items()
+        if veces > 1
+    )
+    if repetidos:
+        raise serializers.ValidationError(f"{descripcion} repetidos en el lote: {repetidos}")
+    return items
+
+
+class EquiposLoteSerializer(serializers.Serializer):
+    """Cambios en lote sobre los equipos de un compartimento."""
+    equipos = EquipoLoteSerializer(many=True, required=False, default=list, max_length=2000)
+    desactivar_equipos = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list, max_length=2000
+    )
+
+    def validate_equipos(self, equipos):
+        validar_sin_repetidos(equipos, 'id', 'Equipos')
+        return validar_sin_repetidos(equipos, 'ref', 'Referencias')
+
+
+class InventarioLoteSerializer(EquiposLoteSerializer):
+    """Cambios en lote sobre los compartimentos y equipos de un vehículo."""
+    compartimentos = CompartimentoLoteSerializer(many=True, required=False, default=list, max_length=500)
+    desactivar_compartimentos = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list, max_length=500
+    )
+
+    def validate_compartimentos(self, compartimentos):
+        validar_sin_repetidos(compartimentos, 'id', 'Compartimentos')
+        return validar_sin_repetidos(compartimentos, 'ref', 'Referencias')
+
+
+class ClonarInventarioSerializer(serializers.Serializer):
+    """Vehículos a los que se copia el inventario de la plantilla."""
+    destinos = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=500)
+    sincronizar = serializers.BooleanField(default=False)
@@ -0,0 +1,218 @@
+"""
+Señales para mantener los datos desnormalizados del inventario.
+"""
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Vehiculo, Compartimento, Equipo, Revision, DetalleRevision, VehiculoEstadoSnapshot
+from .estados import actualizar_resumenes, actualizar_snapshots
+from .versiones import incrementar_version
+from .cambios import registrar_eliminados
+from .imagenes import necesita_variantes, generar_variantes, eliminar_variantes, rutas_variantes
+
+
+def _origen_es(origin, modelo):
+    """Indica si una eliminación fue iniciada sobre `modelo` (instancia o queryset)."""
+    return getattr(origin, 'model', type(origin)) is modelo
+
+
+def _revisiones_con_equipos(equipos):
+    """Revisiones con detalles de los equipos dados, que el borrado en cascada va a modificar."""
+    return list(
+        DetalleRevision.objects.filter(equipo__in=equipos).values_list('revision_id', flat=True).distinct()
+    )
+
+
+@receiver(pre_save, sender=DetalleRevision)
+def detalle_por_guardar(sender, instance, raw=False, **kwargs):
+    """Rechaza detalles de revisiones archivadas también fuera de los formularios."""
+    if not raw:
+        instance.clean()
+
+
+@receiver(post_save, sender=DetalleRevision)
+def detalle_guardado(sender, instance, raw=False, **kwargs):
+    """Recalcula el resumen de la revisión cuando cambia uno de sus detalles."""
+    if raw:
+        return
+    actualizar_resumenes([instance.revision_id])
+
+
+@receiver(post_delete, sender=DetalleRevision)
+def detalle_eliminado(sender, instance, origin=None, **kwargs):
+    """
+    Recalcula el resumen al eliminar un detalle.
+    En cascada desde la revisión o el vehículo no hay nada que mantener; desde
+    un equipo o compartimento, sus señales recalculan una vez cada revisión afectada.
+    """
+    if origin is not None and not _origen_es(origin, DetalleRevision):
+        return
+    actualizar_resumenes([instance.revision_id])
+
+
+@receiver(pre_save, sender=Revision)
+def revision_por_guardar(sender, instance, raw=False, **kwargs):
+    """Recuerda el vehículo anterior si la revisión cambia de vehículo."""
+    if raw or instance.pk is None:
+        return
+    anterior = Revision.objects.filter(pk=instance.pk).values_list('vehiculo_id', flat=True).first()
+    if anterior is not None and anterior != instance.vehiculo_id:
+        instance._vehiculo_anterior = anterior
+
+
+@receiver(post_save, sender=Revision)
+def revision_guardada(sender, instance, raw=False, **kwargs):
+    """
+    Actualiza los snapshots del vehículo (general, del responsable y los que
+    apuntaban a ella). Si cambió de vehículo, también los del anterior.
+    """
+    if raw:
+        return
+    por_vehiculo = {instance.vehiculo_id: {instance.responsable}}
+    for vehiculo_id, responsable in VehiculoEstadoSnapshot.objects.filter(
+        revision=instance
+    ).values_list('vehiculo_id', 'responsable'):
+        por_vehiculo.setdefault(vehiculo_id, set()).add(responsable)
+    anterior = instance.__dict__.pop('_vehiculo_anterior', None)
+    if anterior is not None:
+        por_vehiculo.setdefault(anterior, set()).add(instance.responsable)
+    for vehiculo_id, responsables in por_vehiculo.items():
+        actualizar_snapshots(vehiculo_id, responsables, crear=vehiculo_id == instance.vehiculo_id)
+
+
+@receiver(post_delete, sender=Revision)
+def revision_eliminada(sender, instance, origin=None, **kwargs):
+    """
+    Recalcula los snapshots afectados al eliminar una revisión.
+    Si el borrado viene en cascada desde el vehículo, sus snapshots también se eliminan.
+    """
+    if origin is not None and not _origen_es(origin, Revision):
+        return
+    actualizar_snapshots(instance.vehiculo_id, [instance.responsable], crear=False)
+
+
+@receiver(pre_save, sender=Compartimento)
+def compartimento_por_guardar(sender, instance, raw=False, **kwargs):
+    """
+    Si el compartimento cambia de vehículo, versiona el vehículo anterior y
+    registra que sus equipos salieron de su inventario.
+    """
+    if raw or instance.pk is None:
+        return
+    anterior = Compartimento.objects.filter(pk=instance.pk).values_list(
+        'vehiculo_id', flat=True
+    ).first()
+    if anterior is None or anterior == instance.vehiculo_id:
+        return
+    incrementar_version(Vehiculo.objects.filter(pk=anterior))
+    equipos = Equipo.objects.filter(compartimento=instance.pk)
+    registrar_eliminados('compartimento', [instance.pk], anterior)
+    registrar_eliminados('equipo', equipos.values_list('id', flat=True), anterior)
+    # Para el vehículo nuevo, sus equipos son filas nuevas
+    equipos.update(fecha_actualizacion=timezone.now())
+
+
+@receiver(post_save, sender=Compartimento)
+def compartimento_guardado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    incrementar_version(Vehiculo.objects.filter(pk=instance.vehiculo_id))
+
+
+@receiver(pre_delete, sender=Compartimento)
+def compartimento_por_eliminar(sender, instance, origin=None, **kwargs):
+    """Registra el compartimento y sus equipos, que se eliminan en cascada."""
+    if origin is not None and not _origen_es(origin, Compartimento):
+        return
+    equipos = Equipo.objects.filter(compartimento=instance.pk)
+    registrar_eliminados('compartimento', [instance.pk], instance.vehiculo_id)
+    registrar_eliminados('equipo', equipos.values_list('id', flat=True), instance.vehiculo_id)
+    instance._revisiones_afectadas = _revisiones_con_equipos(equipos)
+
+
+@receiver(post_delete, sender=Compartimento)
+def compartimento_eliminado(sender, instance, origin=None, **kwargs):
+    """Versiona el vehículo y recalcula las revisiones que perdieron detalles en la cascada."""
+    if origin is not None and not _origen_es(origin, Compartimento):
+        return
+    incrementar_version(Vehiculo.objects.filter(pk=instance.vehiculo_id))
+    actualizar_resumenes(getattr(instance, '_revisiones_afectadas', []))
+
+
+@receiver(pre_save, sender=Equipo)
+def equipo_por_guardar(sender, instance, raw=False, **kwargs):
+    """Si el equipo cambia de vehículo, versiona el anterior y registra la salida de su inventario."""
+    if raw or instance.pk is None:
+        return
+    anterior = Equipo.objects.filter(pk=instance.pk).values_list(
+        'compartimento_id', 'compartimento__vehiculo_id'
+    ).first()
+    if anterior is None or anterior[0] == instance.compartimento_id:
+        return
+    nuevo = Compartimento.objects.filter(pk=instance.compartimento_id).values_list(
+        'vehiculo_id', flat=True
+    ).first()
+    if anterior[1] != nuevo:
+        incrementar_version(Vehiculo.objects.filter(pk=anterior[1]))
+        registrar_eliminados('equipo', [instance.pk], anterior[1])
+
+
+@receiver(post_save, sender=Equipo)
+def equipo_guardado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    incrementar_version(Vehiculo.objects.filter(compartimentos=instance.compartimento_id))
+
+
+@receiver(pre_delete, sender=Equipo)
+def equipo_por_eliminar(sender, instance, origin=None, **kwargs):
+    if origin is not None and not _origen_es(origin, Equipo):
+        return
+    vehiculo_id = Compartimento.objects.filter(
+        pk=instance.compartimento_id
+    ).values_list('vehiculo_id', flat=True).first()
+    registrar_eliminados('equipo', [instance.pk], vehiculo_id)
+    instance._revisiones_afectadas = _revisiones_con_equipos([instance.pk])
+
+
+@receiver(post_delete, sender=Equipo)
+def equipo_eliminado(sender, instance, origin=None, **kwargs):
+    """Versiona el vehículo y recalcula las revisiones que perdieron el detalle del equipo."""
+    if origin is not None and not _origen_es(origin, Equipo):
+        return
+    incrementar_version(Vehiculo.objects.filter(compartimentos=instance.compartimento_id))
+    # Los detalles ya se borraron; actualizar_resumenes también corrige los snapshots que apuntan a ellas
+    actualizar_resumenes(getattr(instance, '_revisiones_afectadas', []))
+
+
+@receiver(post_save, sender=Vehiculo)
+def vehiculo_guardado(sender, instance, raw=False, **kwargs):
+    """Genera las variantes de la foto, una vez confirmada la transacción, si la foto cambió."""
+    if raw or not necesita_variantes(instance):
+        return
+    vehiculo_id = instance.pk
+
+    def procesar():
+        vehiculo = Vehiculo.objects.filter(pk=vehiculo_id).first()
+        if vehiculo is not None:
+            generar_variantes(vehiculo)
+
+    transaction.on_commit(procesar)
+
+
+@receiver(pre_delete, sender=Vehiculo)
+def vehiculo_por_eliminar(sender, instance, origin=None, **kwargs):
+    """Registra los compartimentos y equipos del vehículo, que se eliminan en cascada."""
+    if origin is not None and not _origen_es(origin, Vehiculo):
+        return
+    equipos = Equipo.objects.filter(compartimento__vehiculo=instance.pk)
+    registrar_eliminados('compartimento', instance.compartimentos.values_list('id', flat=True), instance.pk)
+    registrar_eliminados('equipo', equipos.values_list('id', flat=True), instance.pk)
+
+
+@receiver(post_delete, sender=Vehiculo)
+def vehiculo_eliminado(sender, instance, **kwargs):
+    """Borra los archivos de las variantes de la foto."""
+    eliminar_variantes(rutas_variantes(instance.imagen_variantes or {}))
@@ -0,0 +1,175 @@
+"""
+Sincronización en lote de revisiones hechas sin conexión.
+
+Las tablets encolan revisiones mientras no tienen señal y las envían todas
+juntas. Cada revisión trae una clave de idempotencia generada en el
+dispositivo: si el envío se corta y se reintenta, las revisiones ya guardadas
+se informan como existentes en lugar de duplicarse. Una clave que llega con
+otro vehículo o responsable que la revisión guardada se informa como conflicto.
+
+Todo el lote se valida y se guarda con un número fijo de consultas, en una
+sola transacción: las revisiones inválidas se informan sin impedir que se
+guarden las demás.
+"""
+from django.db import IntegrityError, transaction
+
+from .models import Vehiculo, Equipo, Revision, DetalleRevision
+from .serializers import RevisionSincronizarItemSerializer
+from .estados import resumen_desde_estados, actualizar_snapshots
+
+CONFLICTO_CLAVE = 'La clave de idempotencia ya se usó para una revisión de otro vehículo o responsable.'
+
+
+def _validar_items(items):
+    """
+    Valida la forma de cada revisión por separado.
+    Retorna (validas, errores): validas es una lista de (indice, datos) y
+    errores un dict {indice: errores}.
+    """
+    validas, errores = [], {}
+    for indice, item in enumerate(items):
+        serializer = RevisionSincronizarItemSerializer(data=item)
+        if serializer.is_valid():
+            validas.append((indice, serializer.validated_data))
+        else:
+            errores[indice] = serializer.errors
+    return validas, errores
+
+
+def _validar_referencias(validas, errores):
+    """Verifica vehículos y equipos de todo el lote con dos consultas."""
+    vehiculo_ids = {datos['vehiculo'] for _, datos in validas}
+    equipo_ids = {detalle['equipo'] for _, datos in validas for detalle in datos['detalles']}
+
+    vehiculos = set(Vehiculo.objects.filter(id__in=vehiculo_ids).values_list('id', flat=True))
+    vehiculo_de_equipo = dict(Equipo.objects.filter(
+        id__in=equipo_ids, activo=True
+    ).values_list('id', 'compartimento__vehiculo_id'))
+
+    aceptadas = []
+    for indice, datos in validas:
+        if datos['vehiculo'] not in vehiculos:
+            errores[indice] = {'vehiculo': [f"Vehículo inexistente: {datos['vehiculo']}"]}
+            continue
+        invalidos = [
+            detalle['equipo'] for detalle in datos['detalles']
+            if vehiculo_de_equipo.get(detalle['equipo']) != datos['vehiculo']
+        ]
+        if invalidos:
+            errores[indice] = {'detalles': [f"Equipos inexistentes, inactivos o de otro vehículo: {invalidos}"]}
+            continue
+        aceptadas.append((indice, datos))
+    return aceptadas
+
+
+def _guardar(aceptadas, usuario):
+    """
+    Guarda las revisiones cuyas claves aún no existen. Retorna
+    {clave: (revision_id, creada, vehiculo_id, responsable)} para todas las claves aceptadas.
+    """
+    claves = {datos['clave_idempotencia'] for _, datos in aceptadas}
+    guardadas = {
+        clave: (revision_id, False, vehiculo_id, responsable)
+        for clave, revision_id, vehiculo_id, responsable in Revision.objects.filter(
+            clave_idempotencia__in=claves
+        ).values_list('clave_idempotencia', 'id', 'vehiculo_id', 'responsable')
+    }
+
+    nuevas = {}
+    for _, datos in aceptadas:
+        clave = datos['clave_idempotencia']
+        if clave not in guardadas and clave not in nuevas:
+            nuevas[clave] = datos
+    if not nuevas:
+        return guardadas
+
+    revisiones = Revision.objects.bulk_create([
+        Revision(
+            vehiculo_id=datos['vehiculo'],
+            usuario=usuario,
+            responsable=datos['responsable'],
+            observaciones_generales=datos['observaciones_generales'],
+            clave_idempotencia=clave,
+            **resumen_desde_estados(detalle['estado'] for detalle in datos['detalles'])
+        )
+        for clave, datos in nuevas.items()
+    ], batch_size=500)
+    if any(revision.pk is None for revision in revisiones):
+        # MySQL (y cualquier base sin RETURNING) no asigna los ids en bulk_create:
+        # se leen por la clave de idempotencia, que es única
+        ids = dict(Revision.objects.filter(
+            clave_idempotencia__in=nuevas
+        ).values_list('clave_idempotencia', 'id'))
+        for revision in revisiones:
+            revision.pk = ids[revision.clave_idempotencia]
+    DetalleRevision.objects.bulk_create([
+        DetalleRevision(
+            revision=revision,
+            equipo_id=detalle['equipo'],
+            estado=detalle['estado'],
+            observaciones=detalle['observaciones'],
+        )
+        for revision, datos in zip(revisiones, nuevas.values())
+        for detalle in datos['detalles']
+    ], batch_size=500)
+
+    # bulk_create no dispara las señales: se actualizan los snapshots por vehículo
+    responsables = {}
+    for datos in nuevas.values():
+        responsables.setdefault(datos['vehiculo'], set()).add(datos['responsable'])
+    for vehiculo_id, nombres in responsables.items():
+        actualizar_snapshots(vehiculo_id, nombres)
+
+    for revision in revisiones:
+        guardadas[revision.clave_idempotencia] = (
+            revision.id, True, revision.vehiculo_id, revision.responsable
+        )
+    return guardadas
+
+
+def sincronizar_revisiones(items, usuario=None):
+    """
+    Valida y guarda un lote de revisiones en una sola transacción.
+    Retorna una lista de resultados, uno por revisión recibida y en el mismo orden:
+    {'indice', 'clave_idempotencia', 'resultado': 'creada' | 'existente' | 'conflicto' | 'error',
+    'id' y/o 'errores'}.
+    """
+    validas, errores = _validar_items(items)
+    aceptadas = _validar_referencias(validas, errores)
+
+    try:
+        with transaction.atomic():
+            guardadas = _guardar(aceptadas, usuario)
+    except IntegrityError:
+        # Otra sincronización guardó las mismas claves a la vez: al reintentar se ven como existentes
+        with transaction.atomic():
+            guardadas = _guardar(aceptadas, usuario)
+
+    aceptadas_por_indice = dict(aceptadas)
+    claves = {indice: datos['clave_idempotencia'] for indice, datos in aceptadas}
+    resultados = []
+    informadas = set()
+    for indice, item in enumerate(items):
+        if indice in errores:
+            resultados.append({
+                'indice': indice, 'clave_idempotencia': item.get('clave_idempotencia'),
+                'resultado': 'error', 'errores': errores[indice],
+            })
+            continue
+        clave = claves[indice]
+        revision_id, creada, vehiculo_id, responsable = guardadas[clave]
+        datos = aceptadas_por_indice[indice]
+        if (datos['vehiculo'], datos['responsable']) != (vehiculo_id, responsable):
+            resultados.append({
+                'indice': indice, 'clave_idempotencia': clave, 'resultado': 'conflicto', 'id': revision_id,
+                'errores': {'clave_idempotencia': [CONFLICTO_CLAVE]},
+            })
+            continue
+        # Una clave repetida dentro del mismo lote se crea una sola vez
+        resultados.append({
+            'indice': indice, 'clave_idempotencia': clave,
+            'resultado': 'creada' if creada and clave not in informadas else 'existente',
+            'id': revision_id,
+        })
+        informadas.add(clave)
+    return resultados
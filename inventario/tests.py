@@ -1,3 +1,1171 @@
-from django.test import TestCase
+"""
+Tests del sistema de inventario.
 
-# Create your tests here.
+Presupuesto de consultas: cada endpoint de la API debe ejecutar un número fijo
+de consultas SQL, el mismo para una flota chica y para una diez veces mayor.
+Así se detectan patrones N+1 antes de que lleguen a producción.
+"""
+import csv
+import gzip
+import io
+import json
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.paginator import EmptyPage
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from PIL import Image
+
+from . import analitica, metricas
+from .admin import PaginadorConteoEstimado
+from .models import Vehiculo, Compartimento, Equipo, Revision, DetalleRevision
+from .estados import resumen_desde_estados, reconstruir_snapshots
+from .replicas import ReplicaRouter, lecturas_en_replica
+from .renderers import JSONRapidoRenderer
+from .archivo import archivar_revisiones
+from .detector_consultas import ConsultasProblematicas, detectar_consultas
+
+
+def crear_flota(vehiculos, compartimentos, equipos, revisiones):
+    """
+    Crea una flota sintética con bulk_create.
+    `compartimentos`, `equipos` y `revisiones` son cantidades por vehículo / compartimento.
+    """
+    inicio = Vehiculo.objects.count()
+    flota = Vehiculo.objects.bulk_create([
+        Vehiculo(codigo=f'T-{inicio + i:04d}', nombre=f'Vehículo {inicio + i}')
+        for i in range(vehiculos)
+    ])
+    comps = Compartimento.objects.bulk_create([
+        Compartimento(vehiculo=vehiculo, nombre=f'Compartimento {j}', orden=j)
+        for vehiculo in flota
+        for j in range(compartimentos)
+    ])
+    Equipo.objects.bulk_create([
+        Equipo(compartimento=compartimento, nombre=f'Equipo {k}', orden=k)
+        for compartimento in comps
+        for k in range(equipos)
+    ])
+
+    equipos_por_vehiculo = {}
+    for equipo_id, vehiculo_id in Equipo.objects.filter(
+        compartimento__vehiculo__in=flota
+    ).values_list('id', 'compartimento__vehiculo'):
+        equipos_por_vehiculo.setdefault(vehiculo_id, []).append(equipo_id)
+
+    for vehiculo in flota:
+        equipo_ids = equipos_por_vehiculo[vehiculo.id]
+        for n in range(revisiones):
+            estados = ['no' if (n + i) % 7 == 0 else 'si' for i in range(len(equipo_ids))]
+            revision = Revision.objects.create(
+                vehiculo=vehiculo,
+                responsable=f'Guardia {n % 3}',
+                **resumen_desde_estados(estados)
+            )
+            DetalleRevision.objects.bulk_create([
+                DetalleRevision(revision=revision, equipo_id=equipo_id, estado=estado)
+                for equipo_id, estado in zip(equipo_ids, estados)
+            ])
+    reconstruir_snapshots()
+    return flota
+
+
+# Consultas máximas por endpoint (sin caché de inventario)
+PRESUPUESTO = {
+    'vehiculos-list': 3,
+    'vehiculos-list-expand': 5,
+    'vehiculos-retrieve': 4,
+    'vehiculos-estado': 2,
+    'vehiculos-estados': 1,
+    'vehiculos-estados-responsable': 1,
+    'compartimentos-list': 4,
+    'compartimentos-retrieve': 3,
+    'equipos-list': 3,
+    'equipos-retrieve': 2,
+    'revisiones-list': 3,
+    'revisiones-list-campos': 2,
+    'revisiones-retrieve': 2,
+    'revisiones-create': 17,
+}
+
+
+class PresupuestoConsultasTest(TestCase):
+    """Verifica que el número de consultas por endpoint no crece con la flota."""
+
+    FLOTA_CHICA = dict(vehiculos=3, compartimentos=2, equipos=4, revisiones=2)
+    FLOTA_GRANDE = dict(vehiculos=30, compartimentos=4, equipos=8, revisiones=4)
+
+    def setUp(self):
+        cache.clear()
+
+    def contar_consultas(self, metodo, url, **kwargs):
+        cache.clear()
+        # Además del total, falla si aparece una consulta repetida fila por fila
+        with detectar_consultas(estricto=True, lenta_ms=0), CaptureQueriesContext(connection) as consultas:
+            response = getattr(self.client, metodo)(url, **kwargs)
+        self.assertLess(response.status_code, 300, response.content[:500])
+        return len(consultas)
+
+    def medir(self, flota):
+        """Mide las consultas de cada endpoint sobre la flota dada."""
+        vehiculo = flota[0]
+        compartimento = vehiculo.compartimentos.first()
+        equipo = Equipo.objects.filter(compartimento=compartimento).first()
+        revision = vehiculo.revisiones.first()
+        nueva_revision = {
+            'vehiculo': vehiculo.id,
+            'responsable': 'Guardia 0',
+            'detalles': [
+                {'equipo': equipo_id, 'estado': 'si'}
+                for equipo_id in Equipo.objects.filter(
+                    compartimento__vehiculo=vehiculo
+                ).values_list('id', flat=True)
+            ],
+        }
+
+        return {
+            'vehiculos-list': self.contar_consultas('get', '/api/vehiculos/'),
+            'vehiculos-list-expand': self.contar_consultas('get', '/api/vehiculos/?expand=compartimentos'),
+            'vehiculos-retrieve': self.contar_consultas('get', f'/api/vehiculos/{vehiculo.id}/'),
+            'vehiculos-estado': self.contar_consultas('get', f'/api/vehiculos/{vehiculo.id}/estado/'),
+            'vehiculos-estados': self.contar_consultas('get', '/api/vehiculos/estados/'),
+            'vehiculos-estados-responsable': self.contar_consultas(
+                'get', '/api/vehiculos/estados/?responsable=Guardia%201'
+            ),
+            'compartimentos-list': self.contar_consultas('get', f'/api/compartimentos/?vehiculo={vehiculo.id}'),
+            'compartimentos-retrieve': self.contar_consultas('get', f'/api/compartimentos/{compartimento.id}/'),
+            'equipos-list': self.contar_consultas('get', f'/api/equipos/?vehiculo={vehiculo.id}'),
+            'equipos-retrieve': self.contar_consultas('get', f'/api/equipos/{equipo.id}/'),
+            'revisiones-list': self.contar_consultas('get', '/api/revisiones/'),
+            'revisiones-list-campos': self.contar_consultas(
+                'get', '/api/revisiones/?fields=id,fecha,estado_calculado'
+            ),
+            'revisiones-retrieve': self.contar_consultas('get', f'/api/revisiones/{revision.id}/'),
+            'revisiones-create': self.contar_consultas(
+                'post', '/api/revisiones/', data=nueva_revision, content_type='application/json'
+            ),
+        }
+
+    def test_presupuesto_constante_al_crecer_la_flota(self):
+        chica = self.medir(crear_flota(**self.FLOTA_CHICA))
+        grande = self.medir(crear_flota(**self.FLOTA_GRANDE))
+
+        for endpoint, maximo in PRESUPUESTO.items():
+            with self.subTest(endpoint=endpoint):
+                self.assertLessEqual(chica[endpoint], maximo)
+                self.assertEqual(chica[endpoint], grande[endpoint])
+
+    def test_respuesta_no_modificada_no_consulta_datos(self):
+        vehiculo = crear_flota(**self.FLOTA_CHICA)[0]
+        url = f'/api/vehiculos/{vehiculo.id}/'
+        etag = self.client.get(url)['ETag']
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(consultas), 1)
+
+    def test_cache_de_inventario_evita_serializar(self):
+        crear_flota(**self.FLOTA_CHICA)
+        self.client.get('/api/vehiculos/?expand=compartimentos')
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get('/api/vehiculos/?expand=compartimentos')
+        self.assertEqual(len(consultas), 1)
+
+
+class EstadosTest(TestCase):
+    """Verifica que el motor de estados, los snapshots y los resúmenes coincidan."""
+
+    def setUp(self):
+        self.vehiculo = crear_flota(vehiculos=1, compartimentos=1, equipos=3, revisiones=0)[0]
+        self.equipos = list(Equipo.objects.filter(compartimento__vehiculo=self.vehiculo))
+
+    def crear_revision(self, responsable, estados):
+        response = self.client.post('/api/revisiones/', {
+            'vehiculo': self.vehiculo.id,
+            'responsable': responsable,
+            'detalles': [
+                {'equipo': equipo.id, 'estado': estado}
+                for equipo, estado in zip(self.equipos, estados)
+            ],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return Revision.objects.latest('id')
+
+    def estado(self, responsable=None):
+        params = {'responsable': responsable} if responsable else {}
+        return self.client.get(f'/api/vehiculos/{self.vehiculo.id}/estado/', params).json()
+
+    def test_sin_revisiones_es_pendiente(self):
+        self.assertEqual(self.estado()['estado'], 'pendiente')
+        self.assertEqual(self.estado()['total_equipos'], 3)
+
+    def test_estado_general_y_por_responsable(self):
+        self.crear_revision('A', ['si', 'si', 'si'])
+        self.crear_revision('B', ['si', 'no', 'si'])
+
+        self.assertEqual(self.estado()['estado'], 'critico')
+        self.assertEqual(self.estado()['ultima_revision_responsable'], 'B')
+        self.assertEqual(self.estado('A')['estado'], 'completo')
+        self.assertEqual(self.vehiculo.calcular_estado('A'), 'completo')
+
+    def test_editar_y_eliminar_detalles_actualiza_resumen(self):
+        revision = self.crear_revision('A', ['si', 'no', 'si'])
+        detalle = revision.detalles_revision.get(estado='no')
+        detalle.estado = 'si'
+        detalle.save()
+
+        revision.refresh_from_db()
+        self.assertEqual(revision.estado, 'completo')
+        self.assertEqual(self.estado()['estado'], 'completo')
+
+        revision.detalles_revision.all().delete()
+        revision.refresh_from_db()
+        self.assertEqual((revision.estado, revision.total_equipos), ('pendiente', 0))
+
+    def test_eliminar_equipo_recalcula_revisiones_y_snapshots(self):
+        anterior = self.crear_revision('A', ['si', 'si', 'no'])
+        ultima = self.crear_revision('A', ['no', 'si', 'si'])
+        self.equipos[0].delete()
+
+        anterior.refresh_from_db()
+        ultima.refresh_from_db()
+        self.assertEqual(
+            (ultima.total_equipos, ultima.equipos_si, ultima.equipos_no, ultima.estado), (2, 2, 0, 'completo')
+        )
+        self.assertEqual((anterior.total_equipos, anterior.equipos_no, anterior.estado), (2, 1, 'critico'))
+        for responsable in (None, 'A'):
+            estado = self.estado(responsable)
+            self.assertEqual((estado['estado'], estado['total_equipos']), ('completo', 2))
+
+        self.equipos[2].compartimento.delete()
+        ultima.refresh_from_db()
+        self.assertEqual((ultima.total_equipos, ultima.estado), (0, 'pendiente'))
+
+    def test_cambiar_vehiculo_de_revision_actualiza_ambos(self):
+        self.crear_revision('A', ['si', 'si', 'si'])
+        revision = self.crear_revision('A', ['no', 'si', 'si'])
+        otro = crear_flota(vehiculos=1, compartimentos=1, equipos=1, revisiones=0)[0]
+
+        revision.vehiculo = otro
+        revision.save()
+
+        self.assertEqual(self.estado()['estado'], 'completo')
+        self.assertEqual(self.estado('A')['estado'], 'completo')
+        response = self.client.get(f'/api/vehiculos/{otro.id}/estado/', {'responsable': 'A'})
+        self.assertEqual(response.json()['estado'], 'critico')
+
+    def test_eliminar_revision_vuelve_a_la_anterior(self):
+        self.crear_revision('A', ['si', 'si', 'si'])
+        ultima = self.crear_revision('A', ['no', 'no', 'no'])
+        ultima.delete()
+
+        self.assertEqual(self.estado()['estado'], 'completo')
+
+    def test_revision_invalida_no_deja_datos(self):
+        otro = crear_flota(vehiculos=1, compartimentos=1, equipos=1, revisiones=0)[0]
+        equipo_ajeno = Equipo.objects.get(compartimento__vehiculo=otro)
+
+        response = self.client.post('/api/revisiones/', {
+            'vehiculo': self.vehiculo.id,
+            'responsable': 'A',
+            'detalles': [{'equipo': equipo_ajeno.id, 'estado': 'si'}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Revision.objects.exists())
+
+
+class PaginacionCursorTest(TestCase):
+    """Verifica la paginación por cursor del historial de revisiones."""
+
+    def setUp(self):
+        self.vehiculo = crear_flota(vehiculos=1, compartimentos=1, equipos=2, revisiones=7)[0]
+        # Fechas repetidas: el desempate por id no debe perder ni repetir revisiones
+        Revision.objects.update(fecha=Revision.objects.first().fecha)
+
+    def test_recorre_todo_el_historial_sin_repetir(self):
+        url = f'/api/revisiones/?vehiculo={self.vehiculo.id}&paginacion=cursor&page_size=3&fields=id'
+        vistos = []
+        while url:
+            datos = self.client.get(url).json()
+            vistos += [revision['id'] for revision in datos['results']]
+            url = datos['next']
+
+        esperados = list(Revision.objects.order_by('-fecha', '-id').values_list('id', flat=True))
+        self.assertEqual(vistos, esperados)
+
+        anterior = self.client.get(datos['previous']).json()
+        self.assertEqual([revision['id'] for revision in anterior['results']], esperados[3:6])
+
+    def test_pagina_profunda_cuesta_igual_que_la_primera(self):
+        primera = self.client.get('/api/revisiones/?paginacion=cursor&page_size=2').json()
+        with CaptureQueriesContext(connection) as inicial:
+            self.client.get('/api/revisiones/?paginacion=cursor&page_size=2')
+        with CaptureQueriesContext(connection) as profunda:
+            self.client.get(primera['next'])
+
+        self.assertNotIn('count', primera)
+        self.assertEqual(len(inicial), len(profunda))
+
+    def test_cursor_invalido(self):
+        response = self.client.get('/api/revisiones/?cursor=no-es-un-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(INVENTARIO_DB_REPLICAS=['replica1'])
+class ReplicaRouterTest(TransactionTestCase):
+    """
+    Verifica qué lecturas se envían a las réplicas.
+    Sin la transacción de TestCase, que por sí sola fija las lecturas en el primario.
+    """
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_solo_lecturas_marcadas_van_a_la_replica(self):
+        self.assertIsNone(self.router.db_for_read(Vehiculo))
+        with lecturas_en_replica():
+            self.assertEqual(self.router.db_for_read(Vehiculo), 'replica1')
+            with transaction.atomic():
+                self.assertEqual(self.router.db_for_read(Vehiculo), 'default')
+
+    def test_lectura_despues_de_escribir_usa_el_primario(self):
+        with lecturas_en_replica():
+            self.assertEqual(self.router.db_for_write(Revision), 'default')
+            self.assertEqual(self.router.db_for_read(Revision), 'default')
+        with lecturas_en_replica():
+            self.assertEqual(self.router.db_for_read(Revision), 'replica1')
+
+    def test_vistas_marcan_solo_lecturas_seguras(self):
+        vehiculo = crear_flota(vehiculos=1, compartimentos=1, equipos=1, revisiones=0)[0]
+        destinos = []
+        original = ReplicaRouter.db_for_read
+
+        def registrar(router, model, **hints):
+            # Registra la decisión pero consulta siempre 'default', la única base de los tests
+            destinos.append(original(router, model, **hints))
+            return 'default'
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', autospec=True, side_effect=registrar), \
+                override_settings(DATABASE_ROUTERS=['inventario.replicas.ReplicaRouter']):
+            self.client.get('/api/vehiculos/estados/')
+            self.assertEqual(set(destinos), {'replica1'})
+
+            destinos.clear()
+            self.client.post('/api/revisiones/', {
+                'vehiculo': vehiculo.id, 'responsable': 'A', 'detalles': [],
+            }, content_type='application/json')
+            self.assertNotIn('replica1', destinos)
+
+
+class VistasAsincronasTest(TestCase):
+    """Verifica que los endpoints asíncronos respondan lo mismo que los síncronos."""
+
+    def setUp(self):
+        self.flota = crear_flota(vehiculos=2, compartimentos=1, equipos=3, revisiones=3)
+
+    async def test_estados_coinciden_con_la_version_sincrona(self):
+        asincrono = await self.async_client.get('/api/async/vehiculos/estados/', {'responsable': 'Guardia 1'})
+        sincrono = await self.async_client.get('/api/vehiculos/estados/', {'responsable': 'Guardia 1'})
+        self.assertEqual(asincrono.json(), sincrono.json())
+
+        vehiculo = self.flota[0]
+        asincrono = await self.async_client.get(f'/api/async/vehiculos/{vehiculo.id}/estado/')
+        sincrono = await self.async_client.get(f'/api/vehiculos/{vehiculo.id}/estado/')
+        self.assertEqual(asincrono.json(), sincrono.json())
+
+    async def test_historial_paginado_por_cursor(self):
+        vehiculo = self.flota[1]
+        url = f'/api/async/revisiones/?vehiculo={vehiculo.id}&page_size=2'
+        primera = (await self.async_client.get(url)).json()
+        segunda = (await self.async_client.get(primera['next'])).json()
+        sincrono = (await self.async_client.get(f'{url}&paginacion=cursor')).json()
+
+        self.assertEqual(primera['results'], sincrono['results'])
+        self.assertEqual(len(primera['results'] + segunda['results']), 3)
+        self.assertIsNone(segunda['next'])
+
+        response = await self.async_client.get('/api/async/revisiones/?vehiculo=x')
+        self.assertEqual(response.status_code, 400)
+
+
+class SincronizacionTest(TestCase):
+    """Verifica la sincronización en lote y la idempotencia de las revisiones."""
+
+    def setUp(self):
+        self.vehiculo = crear_flota(vehiculos=1, compartimentos=1, equipos=3, revisiones=0)[0]
+        self.equipo_ids = list(Equipo.objects.filter(
+            compartimento__vehiculo=self.vehiculo
+        ).values_list('id', flat=True))
+
+    def lote(self, cantidad, prefijo='c'):
+        return [
+            {
+                'clave_idempotencia': f'{prefijo}-{n}',
+                'vehiculo': self.vehiculo.id,
+                'responsable': f'Guardia {n % 2}',
+                'detalles': [{'equipo': equipo_id, 'estado': 'si'} for equipo_id in self.equipo_ids],
+            }
+            for n in range(cantidad)
+        ]
+
+    def sincronizar(self, revisiones):
+        response = self.client.post(
+            '/api/revisiones/sincronizar/', {'revisiones': revisiones}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_reintentar_un_lote_no_duplica(self):
+        revisiones = self.lote(3)
+        revisiones.append({
+            **revisiones[0], 'clave_idempotencia': 'mala', 'detalles': [{'equipo': 999999, 'estado': 'si'}],
+        })
+
+        primera = self.sincronizar(revisiones)
+        self.assertEqual((primera['creadas'], primera['existentes'], primera['errores']), (3, 0, 1))
+        self.assertIn('detalles', primera['resultados'][3]['errores'])
+
+        segunda = self.sincronizar(revisiones)
+        self.assertEqual((segunda['creadas'], segunda['existentes']), (0, 3))
+        self.assertEqual(
+            [r['id'] for r in primera['resultados'][:3]], [r['id'] for r in segunda['resultados'][:3]]
+        )
+        self.assertEqual(Revision.objects.count(), 3)
+        self.assertEqual(DetalleRevision.objects.count(), 9)
+        self.assertEqual(
+            self.client.get(f'/api/vehiculos/{self.vehiculo.id}/estado/').json()['estado'], 'completo'
+        )
+
+    def test_consultas_constantes_por_lote(self):
+        # El primer lote crea los snapshots del vehículo; los siguientes solo los actualizan
+        self.sincronizar(self.lote(2, 'inicial'))
+        with CaptureQueriesContext(connection) as chico:
+            self.sincronizar(self.lote(2, 'a'))
+        with CaptureQueriesContext(connection) as grande:
+            self.sincronizar(self.lote(20, 'b'))
+        self.assertEqual(len(chico), len(grande))
+
+    def test_post_individual_con_clave_es_idempotente(self):
+        revision = self.lote(1)[0]
+        primera = self.client.post('/api/revisiones/', revision, content_type='application/json')
+        segunda = self.client.post('/api/revisiones/', revision, content_type='application/json')
+
+        self.assertEqual((primera.status_code, segunda.status_code), (201, 200))
+        self.assertEqual(Revision.objects.count(), 1)
+
+        otra = self.client.post(
+            '/api/revisiones/', {**revision, 'responsable': 'Otro'}, content_type='application/json'
+        )
+        self.assertEqual(otra.status_code, 409)
+        self.assertEqual(otra.json()['id'], Revision.objects.get().id)
+
+    def test_clave_reutilizada_con_otros_datos_es_conflicto(self):
+        self.sincronizar(self.lote(2))
+        revisiones = self.lote(3)
+        revisiones[1]['responsable'] = 'Otro'
+
+        respuesta = self.sincronizar(revisiones)
+        self.assertEqual(
+            [r['resultado'] for r in respuesta['resultados']], ['existente', 'conflicto', 'creada']
+        )
+        self.assertEqual(respuesta['conflictos'], 1)
+        self.assertEqual(Revision.objects.filter(responsable='Otro').count(), 0)
+
+    def test_base_sin_ids_en_bulk_create(self):
+        # Como MySQL: bulk_create no asigna los ids y se leen por la clave
+        with mock.patch.object(
+            type(connection.features), 'can_return_rows_from_bulk_insert', new_callable=mock.PropertyMock,
+            return_value=False,
+        ):
+            respuesta = self.sincronizar(self.lote(3))
+        ids = [r['id'] for r in respuesta['resultados']]
+        self.assertEqual(sorted(ids), sorted(Revision.objects.values_list('id', flat=True)))
+        for revision in Revision.objects.all():
+            self.assertEqual(revision.detalles_revision.count(), 3)
+
+
+class CambiosInventarioTest(TestCase):
+    """Verifica la sincronización incremental de compartimentos y equipos."""
+
+    def setUp(self):
+        self.vehiculo, self.otro = crear_flota(vehiculos=2, compartimentos=2, equipos=2, revisiones=0)
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        Compartimento.objects.update(fecha_actualizacion=hace_una_hora)
+        Equipo.objects.update(fecha_actualizacion=hace_una_hora)
+        self.desde = (timezone.now() - timedelta(minutes=30)).isoformat()
+
+    def cambios(self, **params):
+        response = self.client.get('/api/inventario/cambios/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_sin_marca_devuelve_todo(self):
+        datos = self.cambios(vehiculo=self.vehiculo.id)
+        self.assertTrue(datos['completo'])
+        self.assertEqual((len(datos['compartimentos']), len(datos['equipos'])), (2, 4))
+
+    def test_solo_devuelve_lo_que_cambio(self):
+        compartimento, eliminado = self.vehiculo.compartimentos.all()
+        equipo = compartimento.equipos.first()
+        equipo.activo = False
+        equipo.save()
+        eliminado_id = eliminado.id
+        equipos_eliminados = list(eliminado.equipos.values_list('id', flat=True))
+        eliminado.delete()
+
+        datos = self.cambios(since=self.desde, vehiculo=self.vehiculo.id)
+        self.assertFalse(datos['completo'])
+        self.assertEqual(datos['compartimentos'], [])
+        self.assertEqual([(e['id'], e['activo']) for e in datos['equipos']], [(equipo.id, False)])
+        self.assertEqual(datos['eliminados'], {
+            'compartimentos': [eliminado_id], 'equipos': sorted(equipos_eliminados),
+        })
+        self.assertEqual(self.cambios(since=self.desde, vehiculo=self.otro.id)['equipos'], [])
+
+    def test_mover_un_compartimento_lo_saca_del_vehiculo_anterior(self):
+        compartimento = self.vehiculo.compartimentos.first()
+        compartimento.vehiculo = self.otro
+        compartimento.nombre = 'Movido'
+        compartimento.save()
+
+        anterior = self.cambios(since=self.desde, vehiculo=self.vehiculo.id)
+        nuevo = self.cambios(since=self.desde, vehiculo=self.otro.id)
+        self.assertEqual(anterior['eliminados']['compartimentos'], [compartimento.id])
+        self.assertEqual(len(anterior['eliminados']['equipos']), 2)
+        self.assertEqual([c['id'] for c in nuevo['compartimentos']], [compartimento.id])
+        self.assertEqual(len(nuevo['equipos']), 2)
+
+    def test_marca_invalida(self):
+        response = self.client.get('/api/inventario/cambios/', {'since': 'ayer'})
+        self.assertEqual(response.status_code, 400)
+
+
+def foto(ancho=800, alto=600, color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (ancho, alto), color).save(buffer, 'JPEG')
+    return SimpleUploadedFile('foto.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImagenesVehiculoTest(TestCase):
+    """Verifica las variantes reducidas de la foto del vehículo."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def guardar(self, vehiculo):
+        with self.captureOnCommitCallbacks(execute=True):
+            vehiculo.save()
+        vehiculo.refresh_from_db()
+        return vehiculo
+
+    def test_genera_variantes_una_sola_vez(self):
+        vehiculo = self.guardar(Vehiculo(codigo='IMG-01', imagen=foto()))
+        formatos = vehiculo.imagen_variantes['formatos']
+        self.assertEqual(set(formatos), {'webp', 'jpeg'})
+        self.assertEqual(sorted(formatos['webp'], key=int), ['160', '320', '640'])
+        for ruta in formatos['jpeg'].values():
+            self.assertTrue(default_storage.exists(ruta))
+
+        version = vehiculo.version_inventario
+        vehiculo.nombre = 'Renombrado'
+        with mock.patch('inventario.imagenes.Image.open') as abrir:
+            vehiculo = self.guardar(vehiculo)
+        abrir.assert_not_called()
+        self.assertEqual(vehiculo.version_inventario, version)
+
+        response = self.client.get(f'/api/vehiculos/{vehiculo.id}/')
+        self.assertIn('-320w.', response.json()['imagen_srcset']['webp'])
+
+    def test_cambiar_la_foto_reemplaza_las_variantes(self):
+        vehiculo = self.guardar(Vehiculo(codigo='IMG-02', imagen=foto(ancho=200)))
+        anteriores = vehiculo.imagen_variantes['formatos']['jpeg']
+        self.assertEqual(sorted(anteriores, key=int), ['160', '200'])
+
+        vehiculo.imagen = foto(color='blue')
+        vehiculo = self.guardar(vehiculo)
+        for ruta in anteriores.values():
+            self.assertFalse(default_storage.exists(ruta))
+        self.assertEqual(len(vehiculo.imagen_variantes['formatos']['jpeg']), 3)
+
+
+class RespuestasComprimidasTest(TestCase):
+    """Verifica el renderer JSON rápido y la compresión de la API."""
+
+    def setUp(self):
+        self.vehiculo = crear_flota(vehiculos=1, compartimentos=3, equipos=5, revisiones=2)[0]
+
+    def test_renderer_responde_lo_mismo_que_el_de_drf(self):
+        response = self.client.get(f'/api/vehiculos/{self.vehiculo.id}/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(response.content), json.loads(JSONRenderer().render(response.data)))
+
+    def test_orjson_y_json_estandar_producen_el_mismo_json(self):
+        data = {
+            **self.client.get(f'/api/vehiculos/{self.vehiculo.id}/').data,
+            'fecha': timezone.now(), 'dia': timezone.now().date(), 'monto': Decimal('1.50'), 1: 'ñandú',
+        }
+        rapido = JSONRapidoRenderer().render(data)
+        with mock.patch('inventario.renderers.orjson', None):
+            estandar = JSONRapidoRenderer().render(data)
+        self.assertEqual(json.loads(rapido), json.loads(estandar))
+
+    def test_comprime_solo_si_el_cliente_acepta_y_supera_el_umbral(self):
+        url = f'/api/vehiculos/{self.vehiculo.id}/'
+        plano = self.client.get(url)
+        self.assertFalse(plano.has_header('Content-Encoding'))
+
+        comprimido = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(comprimido['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', comprimido['Vary'])
+        self.assertLess(len(comprimido.content), len(plano.content))
+        self.assertEqual(gzip.decompress(comprimido.content), plano.content)
+
+        # El mismo ETag débil con y sin gzip, y cualquiera de los dos sirve para el 304
+        self.assertTrue(plano['ETag'].startswith('W/"'))
+        self.assertEqual(comprimido['ETag'], plano['ETag'])
+        for etag, codificacion in [(comprimido['ETag'], 'gzip'), (plano['ETag'], 'gzip'), (comprimido['ETag'], '')]:
+            with self.subTest(codificacion=codificacion):
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING=codificacion, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+        with override_settings(INVENTARIO_COMPRESION_MIN_BYTES=len(plano.content) + 1):
+            self.assertFalse(self.client.get(url, HTTP_ACCEPT_ENCODING='gzip').has_header('Content-Encoding'))
+
+
+class ExportacionRevisionesTest(TestCase):
+    """Verifica la exportación del historial de revisiones."""
+
+    def setUp(self):
+        self.vehiculo, self.otro = crear_flota(vehiculos=2, compartimentos=2, equipos=3, revisiones=2)
+
+    def exportar(self, **params):
+        response = self.client.get('/api/revisiones/exportar/', params, HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as consultas:
+            contenido = b''.join(response.streaming_content).decode('utf-8-sig')
+        # Detalles en la tabla y revisiones archivadas
+        self.assertEqual(len(consultas), 2)
+        return list(csv.reader(io.StringIO(contenido)))
+
+    def test_una_fila_por_detalle(self):
+        encabezados, *filas = self.exportar()
+        self.assertEqual(encabezados[:3], ['revision_id', 'fecha', 'vehiculo'])
+        self.assertEqual(len(filas), DetalleRevision.objects.count())
+        self.assertEqual({fila[2] for fila in self.exportar(vehiculo=self.vehiculo.id)[1:]}, {self.vehiculo.codigo})
+
+    def test_rango_de_fechas(self):
+        Revision.objects.filter(vehiculo=self.otro).update(fecha=timezone.now() - timedelta(days=10))
+        hoy = timezone.localdate().isoformat()
+        filas = self.exportar(desde=hoy, hasta=hoy)[1:]
+        self.assertEqual({fila[2] for fila in filas}, {self.vehiculo.codigo})
+        self.assertEqual(self.client.get('/api/revisiones/exportar/', {'desde': 'ayer'}).status_code, 400)
+
+
+class AnaliticaFallasTest(TestCase):
+    """Verifica las tasas de fallas por período y la caché de períodos cerrados."""
+
+    def setUp(self):
+        cache.clear()
+        self.vehiculo = crear_flota(vehiculos=1, compartimentos=1, equipos=7, revisiones=2)[0]
+        # Una revisión en la semana en curso y otra dos semanas antes
+        self.antigua = Revision.objects.filter(vehiculo=self.vehiculo).order_by('id').first()
+        Revision.objects.filter(pk=self.antigua.pk).update(fecha=timezone.now() - timedelta(days=14))
+
+    def fallas(self, **params):
+        response = self.client.get('/api/analitica/fallas/', {'agrupar': 'vehiculo', **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return {periodo['inicio']: periodo for periodo in response.json()['periodos']}
+
+    def test_tasas_por_semana(self):
+        periodos = self.fallas(todos=1)
+        self.assertEqual(len(periodos), 12)
+        con_datos = [periodo for periodo in periodos.values() if periodo['filas']]
+        self.assertEqual(len(con_datos), 2)
+        self.assertEqual([periodo['cerrado'] for periodo in con_datos], [True, False])
+        for periodo in con_datos:
+            fila, = periodo['filas']
+            self.assertEqual((fila['vehiculo_id'], fila['revisados'], fila['fallas']), (self.vehiculo.id, 7, 1))
+            self.assertEqual(fila['tasa_fallas'], round(1 / 7, 4))
+
+    def test_periodos_cerrados_se_leen_de_la_cache(self):
+        antes = self.fallas()
+        self.antigua.delete()
+        with CaptureQueriesContext(connection) as consultas:
+            despues = self.fallas()
+        # Detalles en la tabla y revisiones archivadas del período en curso, y los códigos de vehículo
+        self.assertEqual(len(consultas), 3)
+        self.assertEqual(despues, antes)
+        self.assertNotEqual(self.fallas(vehiculo=self.vehiculo.id), antes)
+
+    def test_periodos_cerrados_muestran_los_nombres_actuales(self):
+        self.fallas(agrupar='equipo')
+        Vehiculo.objects.filter(pk=self.vehiculo.pk).update(codigo='NUEVO-01')
+        Equipo.objects.filter(compartimento__vehiculo=self.vehiculo).update(nombre='Renombrado')
+        for periodo in self.fallas(agrupar='equipo').values():
+            for fila in periodo['filas']:
+                self.assertEqual((fila['vehiculo_codigo'], fila['equipo_nombre']), ('NUEVO-01', 'Renombrado'))
+
+    def test_responsable_vacio_usa_la_misma_cache(self):
+        self.fallas()
+        with mock.patch('inventario.analitica._consultar') as consultar:
+            consultar.return_value = {}
+            self.fallas(responsable='')
+        # Solo el período en curso: los cerrados salen de la caché de la consulta sin responsable
+        self.assertEqual(consultar.call_count, 1)
+        _, periodo, desde, hasta, *_ = consultar.call_args.args
+        self.assertEqual(analitica.siguiente_periodo(desde, periodo), hasta)
+
+    def test_incluye_revisiones_archivadas(self):
+        antes = self.fallas(agrupar='equipo', todos=1)
+        cache.clear()
+        archivar_revisiones(timezone.now() - timedelta(days=7))
+        self.assertTrue(Revision.objects.get(pk=self.antigua.pk).detalles_archivados)
+        self.assertEqual(self.fallas(agrupar='equipo', todos=1), antes)
+
+    def test_parametros_invalidos(self):
+        response = self.client.get('/api/analitica/fallas/', {'periodo': 'dia', 'desde': 'ayer'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'periodo', 'desde'})
+
+
+class DiferenciasRevisionesTest(TestCase):
+    """Verifica la comparación entre revisiones de un vehículo."""
+
+    def setUp(self):
+        self.vehiculo = crear_flota(vehiculos=1, compartimentos=2, equipos=3, revisiones=0)[0]
+        self.equipos = list(Equipo.objects.filter(compartimento__vehiculo=self.vehiculo).order_by('id'))
+
+    def revisar(self, estados):
+        revision = Revision.objects.create(vehiculo=self.vehiculo, responsable='Guardia')
+        DetalleRevision.objects.bulk_create([
+            DetalleRevision(revision=revision, equipo=equipo, estado=estado)
+            for equipo, estado in zip(self.equipos, estados) if estado
+        ])
+        return revision
+
+    def test_ultima_contra_la_anterior(self):
+        primera = self.revisar(['si', 'si', 'no', 'si', 'si', None])
+        anterior = self.revisar(['si', 'si', 'si', 'si', 'si', None])
+        ultima = self.revisar(['si', 'no', 'si', 'si', None, 'si'])
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(f'/api/vehiculos/{self.vehiculo.id}/diferencias/')
+        self.assertEqual(len(consultas), 2)
+        data = response.json()
+        self.assertEqual((data['revision']['id'], data['anterior']['id']), (ultima.id, anterior.id))
+        self.assertEqual(
+            [(fila['equipo_id'], fila['tipo'], fila['estado_anterior'], fila['estado_actual'])
+             for fila in data['diferencias']],
+            [(self.equipos[1].id, 'cambio', 'si', 'no'),
+             (self.equipos[4].id, 'faltante', 'si', None),
+             (self.equipos[5].id, 'nuevo', None, 'si')],
+        )
+
+        data = self.client.get(
+            f'/api/vehiculos/{self.vehiculo.id}/diferencias/', {'revision': anterior.id, 'anterior': primera.id}
+        ).json()
+        self.assertEqual([fila['equipo_id'] for fila in data['diferencias']], [self.equipos[2].id])
+
+    def test_revisiones_archivadas(self):
+        primera = self.revisar(['si', 'si', 'no', 'si', 'si', None])
+        anterior = self.revisar(['si', 'si', 'si', 'si', 'si', None])
+        ultima = self.revisar(['si', 'no', 'si', 'si', None, 'si'])
+        DetalleRevision.objects.filter(revision=ultima, equipo=self.equipos[3]).update(observaciones='Vencido')
+        url = f'/api/vehiculos/{self.vehiculo.id}/diferencias/'
+        comparar = {'revision': anterior.id, 'anterior': primera.id}
+        antes = [self.client.get(url).json(), self.client.get(url, comparar).json()]
+
+        hace_400_dias = timezone.now() - timedelta(days=400)
+        Revision.objects.filter(pk__in=[primera.pk, anterior.pk]).update(fecha=hace_400_dias)
+        Revision.objects.filter(pk=ultima.pk).update(fecha=timezone.now() - timedelta(days=1))
+        self.assertEqual(archivar_revisiones(timezone.now() - timedelta(days=365))[0], 2)
+        despues = [self.client.get(url).json(), self.client.get(url, comparar).json()]
+        for data in antes + despues:
+            data.pop('revision')
+            data.pop('anterior')
+        self.assertEqual(despues, antes)
+
+    def test_sin_revision_anterior(self):
+        self.revisar(['si'] * 6)
+        response = self.client.get(f'/api/vehiculos/{self.vehiculo.id}/diferencias/')
+        self.assertEqual(response.status_code, 404)
+
+
+class ArchivoRevisionesTest(TestCase):
+    """Verifica que las revisiones archivadas se lean igual que antes de archivarlas."""
+
+    def setUp(self):
+        self.vehiculo = crear_flota(vehiculos=1, compartimentos=2, equipos=3, revisiones=3)[0]
+        self.revision = Revision.objects.order_by('id').first()
+        detalle = DetalleRevision.objects.filter(revision=self.revision).first()
+        detalle.observaciones = 'Manguera vencida'
+        detalle.save()
+        Revision.objects.filter(pk=self.revision.pk).update(fecha=timezone.now() - timedelta(days=400))
+
+    def detalles(self, data):
+        return sorted((d['equipo'], d['equipo_nombre'], d['estado'], d['observaciones']) for d in data)
+
+    def test_archivar_y_leer(self):
+        url = f'/api/revisiones/{self.revision.id}/'
+        antes = self.client.get(url).json()
+        lista_antes = self.client.get('/api/revisiones/').json()['results']
+        exportado_antes = b''.join(self.client.get('/api/revisiones/exportar/').streaming_content)
+
+        revisiones, detalles = archivar_revisiones(timezone.now() - timedelta(days=365))
+        self.assertEqual((revisiones, detalles), (1, 6))
+        self.assertFalse(DetalleRevision.objects.filter(revision=self.revision).exists())
+        self.assertEqual(DetalleRevision.objects.count(), 12)
+        self.assertEqual(archivar_revisiones(timezone.now() - timedelta(days=365)), (0, 0))
+
+        despues = self.client.get(url).json()
+        self.assertEqual(self.detalles(despues.pop('detalles_revision')), self.detalles(antes.pop('detalles_revision')))
+        self.assertEqual(despues, antes)
+
+        with CaptureQueriesContext(connection) as consultas:
+            lista = self.client.get('/api/revisiones/').json()['results']
+        self.assertEqual(len(consultas), PRESUPUESTO['revisiones-list'] + 1)
+        self.assertEqual(
+            [self.detalles(revision['detalles_revision']) for revision in lista],
+            [self.detalles(revision['detalles_revision']) for revision in lista_antes],
+        )
+
+        exportado = b''.join(self.client.get('/api/revisiones/exportar/').streaming_content)
+        self.assertEqual(sorted(exportado.splitlines()), sorted(exportado_antes.splitlines()))
+
+    def test_revision_archivada_no_acepta_detalles(self):
+        archivar_revisiones(timezone.now() - timedelta(days=365))
+        equipo = Equipo.objects.filter(compartimento__vehiculo=self.vehiculo).first()
+        with self.assertRaises(ValidationError):
+            DetalleRevision.objects.create(revision=self.revision, equipo=equipo, estado='no')
+        self.assertFalse(DetalleRevision.objects.filter(revision=self.revision).exists())
+
+
+class MetricasTest(TestCase):
+    """Verifica Server-Timing y las métricas por ruta."""
+
+    def setUp(self):
+        crear_flota(vehiculos=2, compartimentos=1, equipos=2, revisiones=1)
+        metricas.reiniciar()
+
+    def test_server_timing_y_prometheus(self):
+        response = self.client.get('/api/vehiculos/estados/')
+        self.assertIn(f'consultas: {PRESUPUESTO["vehiculos-estados"]}"', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+        texto = self.client.get('/api/metrics/').content.decode()
+        etiquetas = 'ruta="vehiculo-estados",metodo="GET"'
+        self.assertIn('inventario_http_request_duration_seconds_count{%s} 1' % etiquetas, texto)
+        self.assertIn('inventario_http_request_duration_seconds_bucket{%s,le="+Inf"} 1' % etiquetas, texto)
+        self.assertIn('inventario_sql_queries_total{%s} %d' % (etiquetas, PRESUPUESTO['vehiculos-estados']), texto)
+
+    def test_acceso_restringido_a_las_metricas(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 200)
+        with override_settings(INVENTARIO_METRICAS_IPS=['10.0.0.0/8']):
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+            self.assertEqual(self.client.get('/api/metrics/', REMOTE_ADDR='10.1.2.3').status_code, 200)
+        with override_settings(INVENTARIO_METRICAS_SOLO_STAFF=True):
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+            self.client.force_login(User.objects.create_user('admin', is_staff=True))
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 200)
+
+    async def test_cuenta_las_consultas_de_vistas_asincronas(self):
+        response = await self.async_client.get('/api/async/vehiculos/estados/')
+        self.assertIn('consultas: 1"', response['Server-Timing'])
+
+
+class DetectorConsultasTest(TestCase):
+    """Verifica la detección de consultas N+1 y lentas."""
+
+    def setUp(self):
+        crear_flota(vehiculos=4, compartimentos=1, equipos=1, revisiones=1)
+
+    def test_detecta_n_mas_1_con_la_pila_del_proyecto(self):
+        with self.assertLogs('inventario.consultas', 'WARNING'):
+            with detectar_consultas(estricto=False, umbral=3, lenta_ms=0) as problemas:
+                codigos = [revision.vehiculo.codigo for revision in Revision.objects.all()]
+        self.assertEqual(len(codigos), 4)
+        problema, = problemas
+        self.assertEqual((problema['tipo'], problema['veces']), ('n+1', 4))
+        self.assertIn('"inventario_vehiculo"', problema['sql'])
+        self.assertTrue(any('tests.py' in frame and 'revision.vehiculo.codigo' in frame for frame in problema['pila']))
+
+    def test_sin_problemas_con_select_related(self):
+        with detectar_consultas(estricto=True, umbral=2, lenta_ms=0):
+            list(Revision.objects.select_related('vehiculo'))
+
+    @override_settings(INVENTARIO_DETECTAR_CONSULTAS='estricto', INVENTARIO_CONSULTA_LENTA_MS=1e-6)
+    def test_modo_estricto_hace_fallar_la_peticion(self):
+        with self.assertLogs('inventario.consultas', 'WARNING'), self.assertRaises(ConsultasProblematicas) as error:
+            self.client.get('/api/vehiculos/estados/')
+        self.assertEqual(error.exception.problemas[0]['tipo'], 'lenta')
+
+
+class AdminTablasGrandesTest(TestCase):
+    """Verifica que los listados del admin no crecen en consultas ni cuentan toda la tabla."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+
+    def consultas_listado(self, url):
+        with detectar_consultas(estricto=True, lenta_ms=0), CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return consultas
+
+    def test_listados_con_consultas_constantes(self):
+        crear_flota(vehiculos=1, compartimentos=1, equipos=2, revisiones=1)
+        chica = {url: len(self.consultas_listado(url)) for url in (
+            '/admin/inventario/detallerevision/', '/admin/inventario/revision/', '/admin/inventario/equipo/',
+        )}
+        crear_flota(vehiculos=5, compartimentos=2, equipos=4, revisiones=3)
+        for url, cantidad in chica.items():
+            with self.subTest(url=url):
+                self.assertEqual(len(self.consultas_listado(url)), cantidad)
+
+    @override_settings(INVENTARIO_ADMIN_CONTEO_EXACTO_HASTA=5)
+    def test_conteo_estimado_y_acotado(self):
+        crear_flota(vehiculos=2, compartimentos=1, equipos=4, revisiones=1)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        consultas = self.consultas_listado('/admin/inventario/detallerevision/')
+        self.assertFalse([c for c in consultas if 'COUNT(' in c['sql'] and 'detallerevision' in c['sql']])
+        self.assertContains(self.client.get('/admin/inventario/detallerevision/'), '8 Detalles de Revisión')
+
+        response = self.client.get('/admin/inventario/detallerevision/?estado__exact=si')
+        self.assertEqual(response.context['cl'].result_count, 5)
+
+    @override_settings(INVENTARIO_ADMIN_CONTEO_EXACTO_HASTA=5)
+    def test_conteo_acotado_no_limita_las_paginas(self):
+        crear_flota(vehiculos=2, compartimentos=1, equipos=4, revisiones=1)
+        detalles = DetalleRevision.objects.filter(estado__in=['si', 'no']).order_by('id')
+        paginador = PaginadorConteoEstimado(detalles, 2)
+        self.assertEqual((paginador.count, paginador.num_pages), (5, 3))
+
+        self.assertTrue(paginador.page(3).has_next())
+        ultima = paginador.page(4)
+        self.assertEqual((len(ultima), ultima.has_next()), (2, False))
+        with self.assertRaises(EmptyPage):
+            paginador.page(5)
+        self.assertEqual(len(PaginadorConteoEstimado(detalles, 2).page(4)), 2)
+
+
+class LoteInventarioTest(TestCase):
+    """Verifica la edición en lote de compartimentos y equipos."""
+
+    def setUp(self):
+        self.vehiculo, self.otro = crear_flota(vehiculos=2, compartimentos=2, equipos=20, revisiones=0)
+        self.primero, self.segundo = self.vehiculo.compartimentos.order_by('id')
+        self.url = f'/api/vehiculos/{self.vehiculo.id}/lote/'
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        Compartimento.objects.update(fecha_actualizacion=hace_una_hora)
+        Equipo.objects.update(fecha_actualizacion=hace_una_hora)
+
+    def enviar(self, url, datos):
+        with detectar_consultas(estricto=True, lenta_ms=0), CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(url, datos, content_type='application/json')
+        return response, len(consultas)
+
+    def reordenar(self, equipos):
+        return {'equipos': [{'id': equipo_id, 'orden': orden} for orden, equipo_id in enumerate(reversed(equipos))]}
+
+    def test_reorganiza_el_vehiculo_en_una_peticion(self):
+        etag = self.client.get(f'/api/vehiculos/{self.vehiculo.id}/')['ETag']
+        equipos = list(Equipo.objects.filter(compartimento__vehiculo=self.vehiculo).values_list('id', flat=True))
+        # Reordenar 5 o 40 equipos cuesta lo mismo
+        _, consultas_chico = self.enviar(self.url, self.reordenar(equipos[:5]))
+        _, consultas_grande = self.enviar(self.url, self.reordenar(equipos))
+        self.assertEqual(consultas_grande, consultas_chico)
+
+        datos = self.reordenar(equipos)
+        datos['equipos'][0]['compartimento'] = 'techo'
+        datos['equipos'].append({'ref': 'escalera', 'compartimento': 'techo', 'nombre': 'Escalera'})
+        datos['compartimentos'] = [
+            {'ref': 'techo', 'nombre': 'Techo', 'orden': 9},
+            {'id': self.segundo.id, 'nombre': 'Trasero'},
+        ]
+        datos['desactivar_compartimentos'] = [self.primero.id]
+        response, _ = self.enviar(self.url, datos)
+
+        self.assertEqual(response.status_code, 200, response.content)
+        creados = response.json()['creados']
+        techo = Compartimento.objects.get(pk=creados['compartimentos']['techo'])
+        self.assertEqual(list(techo.equipos.values_list('nombre', flat=True).order_by('orden')), [
+            Equipo.objects.get(pk=equipos[-1]).nombre, 'Escalera',
+        ])
+        self.assertEqual(creados['equipos']['escalera'], techo.equipos.get(nombre='Escalera').id)
+        self.assertEqual(Equipo.objects.get(pk=equipos[0]).orden, len(equipos) - 1)
+        self.assertFalse(self.primero.equipos.filter(activo=True).exists())
+        self.assertEqual(
+            {c['nombre'] for c in response.json()['vehiculo']['compartimentos']},
+            {'Techo', 'Trasero', self.primero.nombre},
+        )
+        self.assertNotEqual(self.client.get(f'/api/vehiculos/{self.vehiculo.id}/')['ETag'], etag)
+
+        # La sincronización incremental ve las filas tocadas, aunque bulk_update no aplica auto_now
+        desde = (timezone.now() - timedelta(minutes=1)).isoformat()
+        cambios = self.client.get('/api/inventario/cambios/', {'since': desde, 'vehiculo': self.vehiculo.id}).json()
+        self.assertEqual((len(cambios['compartimentos']), len(cambios['equipos'])), (3, len(equipos) + 1))
+        cambios = self.client.get('/api/inventario/cambios/', {'since': desde, 'vehiculo': self.otro.id}).json()
+        self.assertEqual((cambios['compartimentos'], cambios['equipos']), ([], []))
+
+    def test_lote_invalido_no_aplica_nada(self):
+        version = self.vehiculo.version_inventario
+        ajeno = Equipo.objects.filter(compartimento__vehiculo=self.otro).first()
+        response, _ = self.enviar(self.url, {
+            'equipos': [{'id': self.primero.equipos.first().id, 'orden': 99}, {'id': ajeno.id, 'orden': 0}],
+            'compartimentos': [{'id': self.segundo.id, 'nombre': self.primero.nombre}],
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'equipos', 'compartimentos'})
+        self.assertFalse(Equipo.objects.filter(orden=99).exists())
+        self.vehiculo.refresh_from_db()
+        self.assertEqual(self.vehiculo.version_inventario, version)
+
+    def test_lote_de_un_compartimento(self):
+        url = f'/api/compartimentos/{self.primero.id}/lote/'
+        response, _ = self.enviar(url, {'equipos': [{'id': self.segundo.equipos.first().id, 'orden': 0}]})
+        self.assertEqual(response.status_code, 400)
+
+        response, _ = self.enviar(url, {
+            'equipos': [{'ref': 'hacha', 'nombre': 'Hacha', 'orden': 0}],
+            'desactivar_equipos': [self.primero.equipos.first().id],
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        datos = response.json()
+        self.assertEqual(datos['compartimento']['equipos_count'], 21)
+        hacha = Equipo.objects.get(pk=datos['creados']['equipos']['hacha'])
+        self.assertEqual(hacha.compartimento_id, self.primero.id)
+        self.assertEqual(self.primero.equipos.filter(activo=False).count(), 1)
+
+
+    def test_ids_de_refs_sin_ids_en_bulk_create(self):
+        # Como MySQL: bulk_create no asigna los ids y las filas nuevas se insertan una por una
+        with mock.patch.object(
+            type(connection.features), 'can_return_rows_from_bulk_insert', new_callable=mock.PropertyMock,
+            return_value=False,
+        ):
+            response, _ = self.enviar(self.url, {
+                'compartimentos': [{'ref': 'techo', 'nombre': 'Techo'}],
+                'equipos': [{'ref': 'escalera', 'compartimento': 'techo', 'nombre': 'Escalera'}],
+            })
+        self.assertEqual(response.status_code, 200, response.content)
+        creados = response.json()['creados']
+        escalera = Equipo.objects.get(pk=creados['equipos']['escalera'])
+        self.assertEqual(escalera.compartimento_id, creados['compartimentos']['techo'])
+
+    def test_conflicto_al_escribir_es_error_de_validacion(self):
+        with mock.patch('inventario.lotes.incrementar_version', side_effect=IntegrityError):
+            response, _ = self.enviar(self.url, self.reordenar([self.primero.equipos.first().id]))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.json())
+
+
+class ClonarInventarioTest(TestCase):
+    """Verifica la copia del inventario de un vehículo plantilla a otros."""
+
+    def setUp(self):
+        self.plantilla, self.parcial, self.vacio = crear_flota(
+            vehiculos=3, compartimentos=3, equipos=10, revisiones=0
+        )
+        # El destino parcial ya tiene uno de los compartimentos, con otro orden y un equipo de más
+        Compartimento.objects.filter(vehiculo=self.parcial).exclude(nombre='Compartimento 0').delete()
+        Equipo.objects.filter(compartimento__vehiculo=self.parcial).update(orden=50)
+        self.extra = Equipo.objects.create(compartimento=self.parcial.compartimentos.get(), nombre='Extra')
+        Compartimento.objects.filter(vehiculo=self.vacio).delete()
+        self.url = f'/api/vehiculos/{self.plantilla.id}/clonar/'
+
+    def arbol(self, vehiculo, solo_activos=True):
+        equipos = Equipo.objects.filter(compartimento__vehiculo=vehiculo)
+        if solo_activos:
+            equipos = equipos.filter(activo=True, compartimento__activo=True)
+        return sorted(equipos.values_list('compartimento__nombre', 'nombre', 'orden', 'cantidad_esperada'))
+
+    def clonar(self, **datos):
+        with detectar_consultas(estricto=True, lenta_ms=0), CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(self.url, datos, content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['resultados'], len(consultas)
+
+    def test_clonar_agrega_lo_que_falta(self):
+        self.vacio.refresh_from_db()
+        version = self.vacio.version_inventario
+        resultados, consultas = self.clonar(destinos=[self.vacio.id, self.parcial.id])
+
+        self.assertEqual(self.arbol(self.vacio), self.arbol(self.plantilla))
+        self.assertEqual(resultados[0], {
+            'vehiculo': self.vacio.id, 'compartimentos_creados': 3, 'equipos_creados': 30,
+            'actualizados': 0, 'desactivados': 0,
+        })
+        self.assertEqual((resultados[1]['compartimentos_creados'], resultados[1]['equipos_creados']), (2, 20))
+        # Sin sincronizar, lo existente en el destino no se toca
+        self.assertEqual(Equipo.objects.filter(compartimento__vehiculo=self.parcial, orden=50).count(), 10)
+        self.vacio.refresh_from_db()
+        self.assertEqual(self.vacio.version_inventario, version + 1)
+
+        # Repetir no crea nada ni versiona; más destinos no agregan consultas
+        otros = Vehiculo.objects.bulk_create([Vehiculo(codigo=f'NUEVO-{n}') for n in range(3)])
+        resultados, consultas_repetido = self.clonar(destinos=[self.vacio.id, *[v.id for v in otros]])
+        self.assertEqual(resultados[0]['equipos_creados'], 0)
+        self.assertEqual(consultas_repetido, consultas)
+        self.vacio.refresh_from_db()
+        self.assertEqual(self.vacio.version_inventario, version + 1)
+
+    def test_sincronizar_iguala_y_desactiva_sin_borrar(self):
+        resultados, _ = self.clonar(destinos=[self.parcial.id], sincronizar=True)
+
+        self.assertEqual(self.arbol(self.parcial), self.arbol(self.plantilla))
+        self.assertEqual((resultados[0]['actualizados'], resultados[0]['desactivados']), (10, 1))
+        self.extra.refresh_from_db()
+        self.assertFalse(self.extra.activo)
+
+    def test_clonar_respeta_compartimentos_inactivos(self):
+        inactivo = self.parcial.compartimentos.get()
+        inactivo.equipos.filter(nombre='Equipo 0').delete()
+        Compartimento.objects.filter(pk=inactivo.pk).update(activo=False)
+
+        resultados, _ = self.clonar(destinos=[self.parcial.id])
+        self.assertEqual((resultados[0]['compartimentos_creados'], resultados[0]['equipos_creados']), (2, 20))
+        self.assertEqual(inactivo.equipos.count(), 10)
+
+        resultados, _ = self.clonar(destinos=[self.parcial.id], sincronizar=True)
+        self.assertEqual(self.arbol(self.parcial), self.arbol(self.plantilla))
+
+    def test_base_sin_ids_en_bulk_create(self):
+        # Como MySQL: los compartimentos nuevos se insertan uno por uno para que sus equipos tengan id
+        with mock.patch.object(
+            type(connection.features), 'can_return_rows_from_bulk_insert', new_callable=mock.PropertyMock,
+            return_value=False,
+        ):
+            self.clonar(destinos=[self.vacio.id])
+        self.assertEqual(self.arbol(self.vacio), self.arbol(self.plantilla))
+
+    def test_comando_y_validacion(self):
+        salida = io.StringIO()
+        call_command('clonar_inventario', self.plantilla.codigo, self.vacio.codigo, stdout=salida)
+        self.assertIn('3 compartimentos y 30 equipos creados', salida.getvalue())
+
+        response = self.client.post(
+            self.url, {'destinos': [self.plantilla.id, 9999]}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
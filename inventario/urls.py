@@ -3,11 +3,16 @@ URLs para la API REST del sistema de inventario.
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import views_async
 from .views import (
     VehiculoViewSet,
     CompartimentoViewSet,
     EquipoViewSet,
     RevisionViewSet,
+    CambiosInventarioView,
+    ExportarRevisionesView,
+    AnaliticaFallasView,
+    MetricasView,
 )
 
 # Crear router para ViewSets
@@ -20,5 +25,14 @@ router.register(r'revisiones', RevisionViewSet, basename='revision')
 app_name = 'inventario'
 
 urlpatterns = [
+    # Endpoints asíncronos de lectura (servir con ASGI)
+    path('api/async/vehiculos/estados/', views_async.estados_vehiculos, name='async-vehiculos-estados'),
+    path('api/async/vehiculos/<int:pk>/estado/', views_async.estado_vehiculo, name='async-vehiculo-estado'),
+    path('api/async/revisiones/', views_async.historial_revisiones, name='async-revisiones'),
+    path('api/inventario/cambios/', CambiosInventarioView.as_view(), name='inventario-cambios'),
+    path('api/analitica/fallas/', AnaliticaFallasView.as_view(), name='analitica-fallas'),
+    path('api/metrics/', MetricasView.as_view(), name='metricas'),
+    # Antes del router: si no, 'exportar' se toma como id de revisión
+    path('api/revisiones/exportar/', ExportarRevisionesView.as_view(), name='revisiones-exportar'),
     path('api/', include(router.urls)),
 ]
@@ -0,0 +1,56 @@
+"""
+Sellos de versión del inventario (vehículos, compartimentos y equipos).
+
+Cada vehículo guarda un contador `version_inventario` que se incrementa, junto
+con `fecha_actualizacion`, cuando cambia alguno de sus compartimentos o equipos.
+El sello de un conjunto de vehículos se obtiene con un único aggregate y sirve
+para ETag/Last-Modified y como clave de caché.
+"""
+import hashlib
+
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+
+from .models import Vehiculo
+
+
+def incrementar_version(vehiculos):
+    """Marca como modificado el inventario de los vehículos del queryset dado."""
+    return vehiculos.update(
+        version_inventario=F('version_inventario') + 1,
+        fecha_actualizacion=timezone.now(),
+    )
+
+
+def sello_inventario(vehiculos=None):
+    """
+    Calcula el sello de versión de un queryset de vehículos (por defecto, todos).
+    Retorna un dict con 'clave' (str) y 'modificado' (datetime o None).
+    """
+    if vehiculos is None:
+        vehiculos = Vehiculo.objects.all()
+    datos = vehiculos.order_by().aggregate(
+        total=Count('id'),
+        ultimo_id=Max('id'),
+        version=Sum('version_inventario'),
+        modificado=Max('fecha_actualizacion'),
+    )
+    modificado = datos['modificado']
+    clave = '{total}-{ultimo_id}-{version}-{marca}'.format(
+        marca=modificado.timestamp() if modificado else 0, **datos
+    )
+    return {'clave': clave, 'modificado': modificado}
+
+
+def etag_para(request, sello):
+    """
+    ETag débil para la representación de `request` con el sello dado. Es débil
+    porque la compresión de la API (CompresionAPIMiddleware) cambia los bytes:
+    el mismo ETag vale para la respuesta comprimida y la sin comprimir.
+    """
+    contenido = '|'.join([
+        sello['clave'],
+        request.build_absolute_uri(),
+        request.META.get('HTTP_ACCEPT', ''),
+    ])
+    return 'W/"%s"' % hashlib.md5(contenido.encode()).hexdigest()
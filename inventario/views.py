@@ -1,35 +1,206 @@
 """
 ViewSets para la API REST del sistema de inventario.
 """
+import ipaddress
+from collections import Counter
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, BasePermission
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.views import APIView
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Count, Q
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from django.db import IntegrityError
+from django.db.models import Count, Prefetch, Q, prefetch_related_objects
 
 from .models import Vehiculo, Compartimento, Equipo, Revision, DetalleRevision
 from .serializers import (
+    CamposDinamicosMixin,
     VehiculoSerializer,
+    VehiculoListSerializer,
     VehiculoEstadoSerializer,
     CompartimentoSerializer,
     EquipoSerializer,
     RevisionSerializer,
     RevisionCreateSerializer,
+    SincronizarRevisionesSerializer,
+    ClonarInventarioSerializer,
+    EquiposLoteSerializer,
+    InventarioLoteSerializer,
 )
+from .estados import calcular_estados, calcular_estado_vehiculo
+from .versiones import sello_inventario, etag_para
+from .paginacion import RevisionCursorPagination
+from .replicas import LecturaReplicaMixin
+from .sincronizacion import CONFLICTO_CLAVE, sincronizar_revisiones
+from .cambios import cambios_desde
+from . import analitica, archivo, cache_inventario, diferencias, exportacion, lotes, metricas, plantillas
+
+
+class InventarioCondicionalMixin:
+    """
+    Agrega ETag y Last-Modified a list/retrieve a partir del sello de versión
+    del inventario. Si el cliente ya tiene la versión actual, responde 304
+    sin consultar ni serializar los datos.
+    """
+
+    def get_vehiculos_versionados(self):
+        """Vehículos cuyo inventario determina la respuesta (por defecto, todos)."""
+        return Vehiculo.objects.all()
+
+    def respuesta_condicional(self, vista, request, *args, **kwargs):
+        try:
+            sello = sello_inventario(self.get_vehiculos_versionados())
+        except (TypeError, ValueError):
+            # Identificadores inválidos: la vista responde el error correspondiente
+            return vista(request, *args, **kwargs)
+        self.sello = sello
+        etag = etag_para(request, sello)
+        modificado = sello['modificado']
+        ultima_modificacion = int(modificado.timestamp()) if modificado else None
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=ultima_modificacion
+        )
+        if response is None:
+            response = vista(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response.headers['ETag'] = etag
+                if ultima_modificacion:
+                    response.headers['Last-Modified'] = http_date(ultima_modificacion)
+        return response
 
+    def list(self, request, *args, **kwargs):
+        return self.respuesta_condicional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.respuesta_condicional(super().retrieve, request, *args, **kwargs)
+
+
+class CamposDinamicosViewMixin:
+    """
+    Lee ?fields=a,b y ?expand=x en peticiones GET y los pasa a los serializers
+    que usan CamposDinamicosMixin.
+    """
 
-class VehiculoViewSet(viewsets.ReadOnlyModelViewSet):
+    def _parametro_lista(self, nombre):
+        valor = self.request.query_params.get(nombre, '')
+        return [parte.strip() for parte in valor.split(',') if parte.strip()]
+
+    def get_campos(self):
+        """Campos pedidos con ?fields=, o None si se piden todos."""
+        return self._parametro_lista('fields') or None
+
+    def get_expandir(self):
+        """Relaciones pedidas con ?expand=."""
+        return set(self._parametro_lista('expand'))
+
+    def incluye_campo(self, nombre):
+        campos = self.get_campos()
+        return campos is None or nombre in campos
+
+    def filtrar_campos(self, data):
+        """Aplica ?fields= a datos ya serializados (por ejemplo, leídos de la caché)."""
+        campos = self.get_campos()
+        if campos is None:
+            return data
+        if isinstance(data, dict):
+            return {campo: valor for campo, valor in data.items() if campo in campos}
+        return [self.filtrar_campos(item) for item in data]
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request.method == 'GET' and issubclass(self.get_serializer_class(), CamposDinamicosMixin):
+            kwargs.setdefault('campos', self.get_campos())
+            kwargs.setdefault('expandir', self.get_expandir())
+        return super().get_serializer(*args, **kwargs)
+
+
+class VehiculoViewSet(
+    LecturaReplicaMixin, CamposDinamicosViewMixin, InventarioCondicionalMixin, viewsets.ReadOnlyModelViewSet
+):
     """
     ViewSet para gestionar vehículos.
     Solo lectura (GET) para mantener integridad de los datos.
+
+    El listado usa una representación compacta con conteos; el árbol completo
+    de compartimentos y equipos se entrega en el detalle o con ?expand=compartimentos.
     """
-    queryset = Vehiculo.objects.filter(activo=True).prefetch_related(
-        'compartimentos__equipos'
-    )
+    queryset = Vehiculo.objects.filter(activo=True)
     serializer_class = VehiculoSerializer
     permission_classes = [AllowAny]
 
+    def usa_listado_compacto(self):
+        return self.action == 'list' and 'compartimentos' not in self.get_expandir()
+
+    def get_serializer_class(self):
+        if self.usa_listado_compacto():
+            return VehiculoListSerializer
+        return VehiculoSerializer
+
+    def get_queryset(self):
+        queryset = Vehiculo.objects.filter(activo=True)
+        if self.usa_listado_compacto():
+            queryset = queryset.annotate(
+                _compartimentos_count=Count('compartimentos', distinct=True),
+                _equipos_count=Count('compartimentos__equipos'),
+            ).order_by('codigo')
+        return queryset
+
+    def get_vehiculos_versionados(self):
+        if self.action == 'retrieve':
+            return Vehiculo.objects.filter(pk=self.kwargs['pk'])
+        return Vehiculo.objects.all()
+
+    def serializar_vehiculos(self, vehiculos):
+        """Serializa el árbol completo de una lista de vehículos."""
+        prefetch_related_objects(vehiculos, 'compartimentos__equipos')
+        return VehiculoSerializer(vehiculos, many=True, context=self.get_serializer_context()).data
+
+    def list(self, request, *args, **kwargs):
+        return self.respuesta_condicional(self.listar_con_cache, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.respuesta_condicional(self.obtener_con_cache, request, *args, **kwargs)
+
+    def listar_con_cache(self, request, *args, **kwargs):
+        """Listado servido desde la caché versionada, serializando solo los vehículos que cambiaron."""
+        data = cache_inventario.obtener_listado(self.sello, request)
+        if data is not None:
+            return Response(data)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        vehiculos = list(page if page is not None else queryset)
+        if self.usa_listado_compacto():
+            data = self.get_serializer(vehiculos, many=True).data
+        else:
+            data = self.filtrar_campos(cache_inventario.vehiculos_serializados(
+                vehiculos, self.serializar_vehiculos, request
+            ))
+
+        response = self.get_paginated_response(data) if page is not None else Response(data)
+        cache_inventario.guardar_listado(self.sello, request, response.data)
+        return response
+
+    def obtener_con_cache(self, request, *args, **kwargs):
+        vehiculo = self.get_object()
+        data = cache_inventario.vehiculos_serializados([vehiculo], self.serializar_vehiculos, request)
+        return Response(self.filtrar_campos(data[0]))
+
+    @action(detail=False, methods=['get'])
+    def cache(self, request):
+        """
+        Retorna los aciertos y fallos de la caché de inventario de este proceso.
+        Endpoint: GET /api/vehiculos/cache/
+        """
+        return Response(cache_inventario.estadisticas())
+
     @action(detail=True, methods=['get'])
     def estado(self, request, pk=None):
         """
@@ -38,54 +209,101 @@ class VehiculoViewSet(viewsets.ReadOnlyModelViewSet):
         """
         vehiculo = self.get_object()
         responsable = request.query_params.get('responsable', None)
-
-        # Obtener última revisión
-        if responsable:
-            ultima_revision = Revision.objects.filter(
-                vehiculo=vehiculo,
-                responsable=responsable
-            ).order_by('-fecha').first()
-        else:
-            ultima_revision = Revision.objects.filter(
-                vehiculo=vehiculo
-            ).order_by('-fecha').first()
-
-        # Calcular estado
-        estado = vehiculo.calcular_estado(responsable)
-
-        # Contar equipos
-        total_equipos = Equipo.objects.filter(
-            compartimento__vehiculo=vehiculo,
-            activo=True
-        ).count()
-
-        # Si hay revisión, contar detalles
-        equipos_revisados = 0
-        equipos_si = 0
-        equipos_no = 0
-
-        if ultima_revision:
-            detalles = ultima_revision.detalles_revision.all()
-            equipos_revisados = detalles.count()
-            equipos_si = detalles.filter(estado='si').count()
-            equipos_no = detalles.filter(estado='no').count()
-
-        data = {
-            'vehiculo_id': vehiculo.id,
-            'codigo': vehiculo.codigo,
-            'nombre': vehiculo.nombre or '',
-            'estado': estado,
-            'ultima_revision_fecha': ultima_revision.fecha if ultima_revision else None,
-            'ultima_revision_responsable': ultima_revision.responsable if ultima_revision else None,
-            'total_equipos': total_equipos,
-            'equipos_revisados': equipos_revisados,
-            'equipos_si': equipos_si,
-            'equipos_no': equipos_no,
-        }
+        data = calcular_estado_vehiculo(vehiculo, responsable)
 
         serializer = VehiculoEstadoSerializer(data)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['post'])
+    def lote(self, request, pk=None):
+        """
+        Aplica en una transacción un lote de cambios al inventario del vehículo.
+        Endpoint: POST /api/vehiculos/{id}/lote/
+        Body: {"compartimentos": [...], "equipos": [...],
+               "desactivar_compartimentos": [ids], "desactivar_equipos": [ids]}
+
+        Los elementos con `id` se modifican (solo los campos enviados, p. ej.
+        `orden` para reordenar) y los demás se crean; un equipo nuevo puede ir
+        a un compartimento nuevo del mismo lote usando su `ref`. Retorna los ids
+        creados por `ref` y el árbol resultante del vehículo.
+        """
+        vehiculo = self.get_object()
+        serializer = InventarioLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        creados = lotes.aplicar_lote(vehiculo.id, serializer.validated_data)
+
+        vehiculo.refresh_from_db(fields=['version_inventario', 'fecha_actualizacion'])
+        data = cache_inventario.vehiculos_serializados([vehiculo], self.serializar_vehiculos, request)[0]
+        return Response({'creados': creados, 'vehiculo': data})
+
+    @action(detail=True, methods=['post'])
+    def clonar(self, request, pk=None):
+        """
+        Copia el inventario de este vehículo (plantilla) a otros vehículos en una transacción.
+        Endpoint: POST /api/vehiculos/{id}/clonar/
+        Body: {"destinos": [ids], "sincronizar": false}
+
+        Sin `sincronizar` solo agrega los compartimentos y equipos que faltan en
+        cada destino; con `sincronizar` además iguala orden y cantidades y
+        desactiva lo que la plantilla no tiene. Retorna un resumen por destino.
+        """
+        plantilla = self.get_object()
+        serializer = ClonarInventarioSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        destinos = serializer.validated_data['destinos']
+        existentes = set(Vehiculo.objects.filter(id__in=destinos).values_list('id', flat=True))
+        invalidos = [destino for destino in destinos if destino not in existentes or destino == plantilla.id]
+        if invalidos:
+            raise ValidationError({
+                'destinos': f'Vehículos inexistentes o iguales a la plantilla: {invalidos}',
+            })
+
+        sincronizar = serializer.validated_data['sincronizar']
+        return Response({
+            'plantilla': plantilla.id,
+            'sincronizar': sincronizar,
+            'resultados': plantillas.clonar_inventario(plantilla.id, destinos, sincronizar=sincronizar),
+        })
+
+    @action(detail=True, methods=['get'], url_path='diferencias')
+    def diferencias(self, request, pk=None):
+        """
+        Equipos que difieren entre dos revisiones del vehículo.
+        Endpoint: GET /api/vehiculos/{id}/diferencias/?revision=<id>&anterior=<id>&responsable=<nombre>
+
+        Sin `anterior` compara `revision` (por defecto, la última) con la
+        revisión previa del vehículo, o del responsable si se indica.
+        """
+        ids = {}
+        for nombre in ('revision', 'anterior'):
+            valor = request.query_params.get(nombre)
+            if valor is not None:
+                try:
+                    ids[nombre] = int(valor)
+                except ValueError:
+                    raise ValidationError({nombre: 'Debe ser un número entero.'})
+        if 'anterior' in ids and 'revision' not in ids:
+            raise ValidationError({'revision': 'Indicar la revisión a comparar con `anterior`.'})
+        try:
+            vehiculo_id = int(pk)
+        except ValueError:
+            raise NotFound()
+
+        revisiones = diferencias.revisiones_a_comparar(
+            vehiculo_id, ids.get('revision'), ids.get('anterior'), request.query_params.get('responsable'),
+        )
+        if revisiones is None:
+            raise NotFound('No hay dos revisiones de este vehículo para comparar.')
+        actual, anterior, archivos = revisiones
+        filas = diferencias.diferencias(actual['id'], anterior['id'], archivos)
+        return Response({
+            'vehiculo': vehiculo_id,
+            'revision': actual,
+            'anterior': anterior,
+            'totales': dict(Counter(fila['tipo'] for fila in filas)),
+            'diferencias': filas,
+        })
+
     @action(detail=False, methods=['get'])
     def estados(self, request):
         """
@@ -93,70 +311,56 @@ class VehiculoViewSet(viewsets.ReadOnlyModelViewSet):
         Endpoint: GET /api/vehiculos/estados/
         """
         responsable = request.query_params.get('responsable', None)
-        vehiculos = Vehiculo.objects.filter(activo=True)
-
-        estados = []
-        for vehiculo in vehiculos:
-            estado = vehiculo.calcular_estado(responsable)
-
-            ultima_revision = None
-            if responsable:
-                ultima_revision = Revision.objects.filter(
-                    vehiculo=vehiculo,
-                    responsable=responsable
-                ).order_by('-fecha').first()
-            else:
-                ultima_revision = Revision.objects.filter(
-                    vehiculo=vehiculo
-                ).order_by('-fecha').first()
-
-            total_equipos = Equipo.objects.filter(
-                compartimento__vehiculo=vehiculo,
-                activo=True
-            ).count()
-
-            equipos_revisados = 0
-            equipos_si = 0
-            equipos_no = 0
-
-            if ultima_revision:
-                detalles = ultima_revision.detalles_revision.all()
-                equipos_revisados = detalles.count()
-                equipos_si = detalles.filter(estado='si').count()
-                equipos_no = detalles.filter(estado='no').count()
-
-            estados.append({
-                'vehiculo_id': vehiculo.id,
-                'codigo': vehiculo.codigo,
-                'nombre': vehiculo.nombre or '',
-                'estado': estado,
-                'ultima_revision_fecha': ultima_revision.fecha if ultima_revision else None,
-                'ultima_revision_responsable': ultima_revision.responsable if ultima_revision else None,
-                'total_equipos': total_equipos,
-                'equipos_revisados': equipos_revisados,
-                'equipos_si': equipos_si,
-                'equipos_no': equipos_no,
-            })
+        estados = calcular_estados(Vehiculo.objects.filter(activo=True), responsable)
 
         serializer = VehiculoEstadoSerializer(estados, many=True)
         return Response(serializer.data)
 
 
-class CompartimentoViewSet(viewsets.ModelViewSet):
+class CompartimentoViewSet(CamposDinamicosViewMixin, InventarioCondicionalMixin, viewsets.ModelViewSet):
     """ViewSet para compartimentos (crear, listar, editar, eliminar)."""
     queryset = Compartimento.objects.filter(activo=True).prefetch_related('equipos')
     serializer_class = CompartimentoSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        queryset = Compartimento.objects.filter(activo=True).prefetch_related('equipos')
+        queryset = Compartimento.objects.filter(activo=True).annotate(
+            _equipos_count=Count('equipos')
+        ).order_by('vehiculo', 'orden', 'nombre')
+        if self.incluye_campo('equipos'):
+            queryset = queryset.prefetch_related('equipos')
+        if 'vehiculo' in self.get_expandir():
+            queryset = queryset.select_related('vehiculo')
         vehiculo_id = self.request.query_params.get('vehiculo', None)
         if vehiculo_id:
             queryset = queryset.filter(vehiculo_id=vehiculo_id)
         return queryset
 
+    def get_vehiculos_versionados(self):
+        vehiculo_id = self.request.query_params.get('vehiculo', None)
+        if vehiculo_id:
+            return Vehiculo.objects.filter(pk=vehiculo_id)
+        return Vehiculo.objects.all()
+
+    @action(detail=True, methods=['post'])
+    def lote(self, request, pk=None):
+        """
+        Aplica en una transacción un lote de cambios a los equipos del compartimento.
+        Endpoint: POST /api/compartimentos/{id}/lote/
+        Body: {"equipos": [...], "desactivar_equipos": [ids]}
+        Como POST /api/vehiculos/{id}/lote/; los equipos nuevos van a este compartimento.
+        """
+        compartimento = self.get_object()
+        serializer = EquiposLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        creados = lotes.aplicar_lote(
+            compartimento.vehiculo_id, serializer.validated_data, compartimento_id=compartimento.id
+        )
+        compartimento = self.get_queryset().get(pk=compartimento.pk)
+        return Response({'creados': creados, 'compartimento': self.get_serializer(compartimento).data})
 
-class EquipoViewSet(viewsets.ModelViewSet):
+
+class EquipoViewSet(InventarioCondicionalMixin, viewsets.ModelViewSet):
     """ViewSet para equipos (crear, listar, editar, eliminar)."""
     queryset = Equipo.objects.filter(activo=True)
     serializer_class = EquipoSerializer
@@ -172,12 +376,24 @@ class EquipoViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(compartimento__vehiculo_id=vehiculo_id)
         return queryset
 
+    def get_vehiculos_versionados(self):
+        compartimento_id = self.request.query_params.get('compartimento', None)
+        vehiculo_id = self.request.query_params.get('vehiculo', None)
+        vehiculos = Vehiculo.objects.all()
+        if compartimento_id:
+            vehiculos = vehiculos.filter(compartimentos=compartimento_id)
+        if vehiculo_id:
+            vehiculos = vehiculos.filter(pk=vehiculo_id)
+        return vehiculos
+
 
-class RevisionViewSet(viewsets.ModelViewSet):
+class RevisionViewSet(LecturaReplicaMixin, CamposDinamicosViewMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar revisiones.
     Permite crear y listar revisiones.
+    Con `?paginacion=cursor` el listado se pagina por (fecha, id) en lugar de por número de página.
     """
+    acciones_replica = {'list', 'retrieve'}
     queryset = Revision.objects.select_related('vehiculo', 'usuario').prefetch_related(
         'detalles_revision__equipo__compartimento'
     ).all()
@@ -188,43 +404,279 @@ class RevisionViewSet(viewsets.ModelViewSet):
             return RevisionCreateSerializer
         return RevisionSerializer
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and RevisionCursorPagination.solicitada(self.request):
+            self._paginator = RevisionCursorPagination()
+        return super().paginator
+
     def get_queryset(self):
-        queryset = Revision.objects.select_related('vehiculo', 'usuario').prefetch_related(
-            'detalles_revision__equipo__compartimento'
-        ).all()
+        queryset = Revision.objects.select_related('vehiculo', 'usuario')
+        if self.incluye_campo('detalles_revision'):
+            # Equipo y compartimento se traen con JOIN: un prefetch aparte arma un
+            # IN con miles de ids que SQLite no admite en flotas grandes
+            queryset = queryset.prefetch_related(Prefetch(
+                'detalles_revision',
+                queryset=DetalleRevision.objects.select_related('equipo__compartimento'),
+            ))
 
         # Filtros opcionales
         vehiculo_id = self.request.query_params.get('vehiculo', None)
         responsable = self.request.query_params.get('responsable', None)
+        estado = self.request.query_params.get('estado', None)
 
         if vehiculo_id:
             queryset = queryset.filter(vehiculo_id=vehiculo_id)
         if responsable:
             queryset = queryset.filter(responsable=responsable)
+        if estado:
+            queryset = queryset.filter(estado=estado)
+
+        return queryset.order_by('-fecha', '-id')
+
+    def get_object(self):
+        revision = super().get_object()
+        if self.action == 'retrieve' and self.incluye_campo('detalles_revision'):
+            archivo.cargar_archivados([revision])
+        return revision
 
-        return queryset.order_by('-fecha')
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and self.incluye_campo('detalles_revision'):
+            archivo.cargar_archivados(page)
+        return page
+
+    def get_usuario(self):
+        return self.request.user if self.request.user.is_authenticated else None
+
+    def create(self, request, *args, **kwargs):
+        """
+        Con `clave_idempotencia`, reenviar una revisión ya guardada la devuelve sin
+        duplicarla; si la clave llega con otro vehículo o responsable, responde 409.
+        """
+        clave = request.data.get('clave_idempotencia') if isinstance(request.data, dict) else None
+        if clave:
+            existente = Revision.objects.filter(clave_idempotencia=clave).first()
+            if existente:
+                return self.respuesta_existente(existente, request.data)
+        try:
+            return super().create(request, *args, **kwargs)
+        except IntegrityError:
+            # Dos envíos simultáneos con la misma clave: el segundo devuelve la del primero
+            existente = Revision.objects.filter(clave_idempotencia=clave).first() if clave else None
+            if existente is None:
+                raise
+            return self.respuesta_existente(existente, request.data)
+
+    def respuesta_existente(self, existente, datos):
+        """La revisión ya guardada con la clave, o 409 si los datos recibidos son de otra revisión."""
+        if (str(existente.vehiculo_id), existente.responsable) != (
+            str(datos.get('vehiculo')), datos.get('responsable')
+        ):
+            return Response(
+                {'clave_idempotencia': [CONFLICTO_CLAVE], 'id': existente.id}, status=status.HTTP_409_CONFLICT
+            )
+        return Response(RevisionCreateSerializer(existente).data, status=status.HTTP_200_OK)
 
     def perform_create(self, serializer):
         """Asigna el usuario actual al crear una revisión."""
-        revision = serializer.save()
-        if self.request.user.is_authenticated:
-            revision.usuario = self.request.user
-            revision.save()
+        serializer.save(usuario=self.get_usuario())
 
-    def list(self, request, *args, **kwargs):
-        """Sobrescribe list para agregar estadísticas calculadas."""
-        response = super().list(request, *args, **kwargs)
-        # Agregar cálculos a cada revisión en la respuesta
-        for revision_data in response.data['results'] if 'results' in response.data else response.data:
-            revision_id = revision_data.get('id')
-            if revision_id:
+    @action(detail=False, methods=['post'])
+    def sincronizar(self, request):
+        """
+        Guarda en una sola transacción un lote de revisiones hechas sin conexión.
+        Endpoint: POST /api/revisiones/sincronizar/
+        Body: {"revisiones": [{"clave_idempotencia", "vehiculo", "responsable", "detalles", ...}]}
+        Reintentar el mismo lote es seguro: las revisiones ya guardadas se informan como existentes.
+        Una clave ya usada con otro vehículo o responsable se informa como
+        `conflicto` en su resultado; la respuesta es 200 porque las demás
+        revisiones del lote se guardan igual.
+        """
+        serializer = SincronizarRevisionesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        resultados = sincronizar_revisiones(serializer.validated_data['revisiones'], self.get_usuario())
+        totales = Counter(resultado['resultado'] for resultado in resultados)
+        return Response({
+            'creadas': totales['creada'],
+            'existentes': totales['existente'],
+            'conflictos': totales['conflicto'],
+            'errores': totales['error'],
+            'resultados': resultados,
+        })
+
+
+class CambiosInventarioView(APIView):
+    """
+    Sincronización incremental de compartimentos y equipos.
+    Endpoint: GET /api/inventario/cambios/?since=<hasta anterior>&vehiculo=<id>
+
+    Retorna las filas creadas o modificadas (incluidas las desactivadas) y los
+    ids eliminados desde `since`. El cliente aplica primero `eliminados`, luego
+    las filas, y guarda `hasta` para la próxima llamada. Con `completo: true`
+    la respuesta trae todo el inventario y reemplaza la copia local.
+    """
+    permission_classes = [AllowAny]
+    campos_compartimento = ['id', 'vehiculo', 'nombre', 'orden', 'activo', 'fecha_actualizacion']
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        desde = None
+        if since:
+            # Un '+' del offset sin codificar llega como espacio
+            desde = parse_datetime(since.replace(' ', '+'))
+            if desde is None:
+                raise ValidationError({'since': 'Fecha inválida; usar el valor `hasta` de la respuesta anterior.'})
+            if timezone.is_naive(desde):
+                desde = timezone.make_aware(desde)
+
+        vehiculo_id = request.query_params.get('vehiculo')
+        if vehiculo_id is not None:
+            try:
+                vehiculo_id = int(vehiculo_id)
+            except ValueError:
+                raise ValidationError({'vehiculo': 'Debe ser un número entero.'})
+
+        cambios = cambios_desde(desde, vehiculo_id)
+        return Response({
+            'desde': desde.isoformat() if desde else None,
+            'hasta': cambios['hasta'].isoformat(),
+            'completo': cambios['completo'],
+            'compartimentos': CompartimentoSerializer(
+                cambios['compartimentos'], many=True, campos=self.campos_compartimento
+            ).data,
+            'equipos': EquipoSerializer(cambios['equipos'], many=True).data,
+            'eliminados': cambios['eliminados'],
+        })
+
+
+class ExportarRevisionesView(APIView):
+    """
+    Exporta el historial de revisiones con una fila por equipo revisado.
+    Endpoint: GET /api/revisiones/exportar/?desde=AAAA-MM-DD&hasta=AAAA-MM-DD&vehiculo=<id>&formato=csv|xlsx
+
+    `hasta` incluye el día indicado. El CSV se envía a medida que se lee de la
+    base, así que la memoria usada no depende del tamaño del rango.
+    """
+    permission_classes = [AllowAny]
+
+    def perform_content_negotiation(self, request, force=False):
+        # La respuesta es un archivo: un Accept como text/csv no debe dar 406
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        errores = {}
+        limites = {}
+        for nombre in ('desde', 'hasta'):
+            valor = request.query_params.get(nombre)
+            if valor:
                 try:
-                    revision = Revision.objects.get(id=revision_id)
-                    detalles = revision.detalles_revision.all()
-                    revision_data['estado_calculado'] = revision.calcular_estado()
-                    revision_data['total_equipos'] = detalles.count()
-                    revision_data['equipos_si'] = detalles.filter(estado='si').count()
-                    revision_data['equipos_no'] = detalles.filter(estado='no').count()
-                except Revision.DoesNotExist:
-                    pass
+                    limites[nombre] = exportacion.parsear_limite(valor.replace(' ', '+'), fin=nombre == 'hasta')
+                except ValueError:
+                    errores[nombre] = 'Fecha inválida; usar AAAA-MM-DD o una fecha ISO con hora.'
+        vehiculo_id = request.query_params.get('vehiculo')
+        if vehiculo_id is not None:
+            try:
+                vehiculo_id = int(vehiculo_id)
+            except ValueError:
+                errores['vehiculo'] = 'Debe ser un número entero.'
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in exportacion.formatos_disponibles():
+            errores['formato'] = f"Formatos disponibles: {', '.join(exportacion.formatos_disponibles())}."
+        if errores:
+            raise ValidationError(errores)
+
+        filas = exportacion.filas(vehiculo_id=vehiculo_id, **limites)
+        nombre_archivo = f"revisiones-{timezone.localdate():%Y%m%d}.{formato}"
+        if formato == 'xlsx':
+            return FileResponse(
+                exportacion.archivo_xlsx(filas), as_attachment=True, filename=nombre_archivo,
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            )
+        response = StreamingHttpResponse(
+            exportacion.lineas_csv(filas), content_type='text/csv; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
         return response
+
+
+class AnaliticaFallasView(LecturaReplicaMixin, APIView):
+    """
+    Tasas de fallas (equipos marcados NO sobre equipos revisados) por período.
+    Endpoint: GET /api/analitica/fallas/?agrupar=equipo|compartimento|vehiculo&periodo=semana|mes
+              &desde=AAAA-MM-DD&hasta=AAAA-MM-DD&vehiculo=<id>&responsable=<nombre>&todos=1
+
+    Sin `desde` cubre los últimos 12 períodos. Con `todos=1` incluye también las
+    filas sin fallas. Los períodos terminados se sirven desde la caché.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        params = request.query_params
+        errores = {}
+        agrupar = params.get('agrupar', 'equipo')
+        if agrupar not in analitica.AGRUPACIONES:
+            errores['agrupar'] = f"Opciones: {', '.join(analitica.AGRUPACIONES)}."
+        periodo = params.get('periodo', 'semana')
+        if periodo not in analitica.PERIODOS:
+            errores['periodo'] = f"Opciones: {', '.join(analitica.PERIODOS)}."
+        limites = {}
+        for nombre in ('desde', 'hasta'):
+            if params.get(nombre):
+                try:
+                    limites[nombre] = exportacion.parsear_limite(
+                        params[nombre].replace(' ', '+'), fin=nombre == 'hasta'
+                    )
+                except ValueError:
+                    errores[nombre] = 'Fecha inválida; usar AAAA-MM-DD o una fecha ISO con hora.'
+        vehiculo_id = params.get('vehiculo')
+        if vehiculo_id is not None:
+            try:
+                vehiculo_id = int(vehiculo_id)
+            except ValueError:
+                errores['vehiculo'] = 'Debe ser un número entero.'
+        if errores:
+            raise ValidationError(errores)
+
+        return Response(analitica.tasas_fallas(
+            agrupar, periodo,
+            vehiculo_id=vehiculo_id,
+            responsable=params.get('responsable'),
+            incluir_sin_fallas=params.get('todos') in ('1', 'true'),
+            **limites
+        ))
+
+
+class PermisoMetricas(BasePermission):
+    """
+    Acceso opcional restringido a las métricas: con INVENTARIO_METRICAS_SOLO_STAFF
+    solo usuarios staff y con INVENTARIO_METRICAS_IPS solo esas IPs o redes
+    (REMOTE_ADDR). Sin ninguno de los dos, el acceso es libre.
+    """
+
+    def has_permission(self, request, view):
+        if getattr(settings, 'INVENTARIO_METRICAS_SOLO_STAFF', False) and not request.user.is_staff:
+            return False
+        redes = getattr(settings, 'INVENTARIO_METRICAS_IPS', [])
+        if not redes:
+            return True
+        try:
+            ip = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+        except ValueError:
+            return False
+        return any(ip in ipaddress.ip_network(red, strict=False) for red in redes)
+
+
+class MetricasView(APIView):
+    """
+    Métricas de rendimiento por ruta de este proceso, en formato Prometheus.
+    Endpoint: GET /api/metrics/
+    """
+    permission_classes = [PermisoMetricas]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Prometheus pide text/plain o su propio formato
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        return HttpResponse(metricas.exportar_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
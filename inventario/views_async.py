@@ -0,0 +1,91 @@
+"""
+Versiones asíncronas de los endpoints de lectura más consultados.
+
+Pensadas para servirse bajo ASGI (inventario_bomberos/asgi.py): mientras una
+consulta espera a la base, el mismo proceso atiende otras peticiones, así
+muchas tablets pueden consultar el estado de la flota a la vez. Usan el ORM
+asíncrono de Django y responden lo mismo que sus equivalentes síncronos.
+"""
+from django.views.decorators.http import require_safe
+from django.db.models import Prefetch
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from .models import Vehiculo, Revision, DetalleRevision
+from .serializers import VehiculoEstadoSerializer, RevisionSerializer
+from .estados import acalcular_estados
+from .paginacion import RevisionCursorPagination
+from .replicas import lecturas_en_replica
+from .renderers import respuesta_json
+from .archivo import acargar_archivados
+
+
+def _parametro_lista(request, nombre):
+    valor = request.GET.get(nombre, '')
+    return [parte.strip() for parte in valor.split(',') if parte.strip()]
+
+
+@require_safe
+async def estados_vehiculos(request):
+    """
+    Estado de todos los vehículos activos.
+    Endpoint: GET /api/async/vehiculos/estados/
+    """
+    with lecturas_en_replica():
+        estados = await acalcular_estados(
+            Vehiculo.objects.filter(activo=True), request.GET.get('responsable')
+        )
+    return respuesta_json(VehiculoEstadoSerializer(estados, many=True).data)
+
+
+@require_safe
+async def estado_vehiculo(request, pk):
+    """
+    Estado actual de un vehículo.
+    Endpoint: GET /api/async/vehiculos/{id}/estado/
+    """
+    with lecturas_en_replica():
+        estados = await acalcular_estados(
+            Vehiculo.objects.filter(pk=pk, activo=True), request.GET.get('responsable')
+        )
+    if not estados:
+        return respuesta_json({'detail': 'No encontrado.'}, status=404)
+    return respuesta_json(VehiculoEstadoSerializer(estados[0]).data)
+
+
+@require_safe
+async def historial_revisiones(request):
+    """
+    Historial de revisiones paginado por cursor (mismos filtros y `fields` que /api/revisiones/).
+    Endpoint: GET /api/async/revisiones/
+    """
+    campos = _parametro_lista(request, 'fields') or None
+    expandir = set(_parametro_lista(request, 'expand'))
+
+    queryset = Revision.objects.select_related('vehiculo', 'usuario')
+    if campos is None or 'detalles_revision' in campos:
+        queryset = queryset.prefetch_related(Prefetch(
+            'detalles_revision',
+            queryset=DetalleRevision.objects.select_related('equipo__compartimento'),
+        ))
+
+    paginador = RevisionCursorPagination()
+    try:
+        # Filtros opcionales
+        for filtro, campo in (('vehiculo', 'vehiculo_id'), ('responsable', 'responsable'), ('estado', 'estado')):
+            valor = request.GET.get(filtro)
+            if valor:
+                queryset = queryset.filter(**{campo: valor})
+        consulta = paginador.preparar_consulta(queryset, Request(request))
+        with lecturas_en_replica():
+            revisiones = [revision async for revision in consulta]
+            if campos is None or 'detalles_revision' in campos:
+                await acargar_archivados(revisiones)
+    except NotFound as error:
+        return respuesta_json({'detail': str(error.detail)}, status=404)
+    except (TypeError, ValueError):
+        return respuesta_json({'detail': 'Parámetros inválidos.'}, status=400)
+
+    revisiones = paginador.asignar_resultados(revisiones)
+    data = RevisionSerializer(revisiones, many=True, campos=campos, expandir=expandir).data
+    return respuesta_json(paginador.datos_paginados(data))
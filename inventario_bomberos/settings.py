@@ -2,6 +2,7 @@
 Django settings for inventario_bomberos project.
 Configurado para API REST con Django REST Framework.
 """
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -35,7 +36,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'inventario.middleware.MetricasMiddleware',  # Primero: el tiempo total incluye al resto
+    'inventario.middleware.DetectorConsultasMiddleware',  # Solo con INVENTARIO_DETECTAR_CONSULTAS
     'django.middleware.security.SecurityMiddleware',
+    'inventario.middleware.CompresionAPIMiddleware',  # Antes de los que leen o modifican el contenido
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS debe estar antes de CommonMiddleware
     'django.middleware.common.CommonMiddleware',
@@ -73,6 +77,55 @@ DATABASES = {
     }
 }
 
+# Réplicas de lectura opcionales, p. ej. INVENTARIO_DB_REPLICAS=/datos/replica1.sqlite3,/datos/replica2.sqlite3
+# Las lecturas seguras de la API se reparten entre ellas; las escrituras van a 'default'.
+INVENTARIO_DB_REPLICAS = []
+for numero, nombre in enumerate(filter(None, os.environ.get('INVENTARIO_DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica{numero}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': nombre.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    INVENTARIO_DB_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['inventario.replicas.ReplicaRouter'] if INVENTARIO_DB_REPLICAS else []
+
+# Cache
+# Por defecto en memoria del proceso; definir INVENTARIO_CACHE_DIR para usar
+# una caché en disco compartida entre procesos.
+if os.environ.get('INVENTARIO_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['INVENTARIO_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'inventario',
+        }
+    }
+
+# Caché del inventario serializado (ver inventario/cache_inventario.py)
+INVENTARIO_CACHE_ALIAS = 'default'
+INVENTARIO_CACHE_TIMEOUT = 60 * 60 * 24
+# Resultados de analítica de períodos ya terminados (no cambian)
+INVENTARIO_ANALITICA_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+# Días que se guardan los registros de compartimentos y equipos eliminados para la
+# sincronización incremental; un cliente más desactualizado recibe el inventario completo.
+INVENTARIO_RETENCION_ELIMINADOS_DIAS = 90
+
+# Antigüedad a partir de la cual `archivar_revisiones` compacta los detalles de una revisión
+INVENTARIO_ARCHIVO_DIAS = 365
+
+# Listados del admin de revisiones y detalles: hasta este total se cuenta exacto
+# (con filtros, el conteo se corta aquí); sin filtros y más filas, se usa la estimación de la base
+INVENTARIO_ADMIN_CONTEO_EXACTO_HASTA = 10000
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -114,11 +167,27 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'inventario.renderers.JSONRapidoRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
 
+# Respuestas de la API menores a este tamaño se envían sin comprimir
+INVENTARIO_COMPRESION_MIN_BYTES = 1024
+
+# Métricas por ruta de la API (Server-Timing y /api/metrics/)
+INVENTARIO_METRICAS = True
+# Acceso a /api/metrics/: solo staff y/o solo estas IPs o redes, p. ej. ['10.0.0.0/8'] (vacío: libre)
+INVENTARIO_METRICAS_SOLO_STAFF = False
+INVENTARIO_METRICAS_IPS = []
+
+# Detector de consultas N+1 y lentas: '' (apagado), 'log' o 'estricto' (lanza una excepción)
+# Ejemplo: INVENTARIO_DETECTAR_CONSULTAS=estricto python manage.py test inventario
+INVENTARIO_DETECTAR_CONSULTAS = os.environ.get('INVENTARIO_DETECTAR_CONSULTAS', '')
+INVENTARIO_N1_UMBRAL = 5  # Repeticiones de una misma consulta en una petición
+INVENTARIO_CONSULTA_LENTA_MS = 100
+INVENTARIO_CONSULTAS_IGNORADAS = []  # Expresiones regulares de consultas aceptadas
+
 # CORS configuration - Permitir acceso desde el frontend React
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Vite default port
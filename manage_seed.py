@@ -10,6 +10,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inventario_bomberos.settings')
 django.setup()
 
 from inventario.models import Vehiculo, Compartimento, Equipo
+from inventario.plantillas import clonar_inventario
 
 def crear_datos_iniciales():
     """Crea los vehículos, compartimentos y equipos iniciales."""
@@ -26,7 +27,7 @@ def crear_datos_iniciales():
         {'codigo': 'UFI-01', 'nombre': 'Unidad de Fumigación UFI-01'},
     ]
     
-    # Compartimentos por vehículo (ejemplo para PMH-01)
+    # Compartimentos por vehículo. PMH-02 y PMH-03 son iguales a PMH-01: se copian al final
     compartimentos_data = {
         'PMH-01': [
             {'nombre': 'Compartimento Izquierdo', 'orden': 1},
@@ -34,18 +35,6 @@ def crear_datos_iniciales():
             {'nombre': 'Compartimento Derecho Trasero', 'orden': 3},
             {'nombre': 'Compartimento Interior', 'orden': 4},
         ],
-        'PMH-02': [
-            {'nombre': 'Compartimento Izquierdo', 'orden': 1},
-            {'nombre': 'Compartimento Derecho Delantero', 'orden': 2},
-            {'nombre': 'Compartimento Derecho Trasero', 'orden': 3},
-            {'nombre': 'Compartimento Interior', 'orden': 4},
-        ],
-        'PMH-03': [
-            {'nombre': 'Compartimento Izquierdo', 'orden': 1},
-            {'nombre': 'Compartimento Derecho Delantero', 'orden': 2},
-            {'nombre': 'Compartimento Derecho Trasero', 'orden': 3},
-            {'nombre': 'Compartimento Interior', 'orden': 4},
-        ],
         'ABI-02': [
             {'nombre': 'Compartimento Lateral Izquierdo', 'orden': 1},
             {'nombre': 'Compartimento Lateral Derecho', 'orden': 2},
@@ -120,6 +109,15 @@ def crear_datos_iniciales():
                     total_equipos += 1
     
     print(f"\n✓ Total equipos creados: {total_equipos}")
+
+    # Mismo modelo de unidad: una copia en bloque del inventario de PMH-01
+    print("\nCopiando inventario de PMH-01...")
+    for resultado in clonar_inventario(
+        vehiculos_creados['PMH-01'].id,
+        [vehiculos_creados['PMH-02'].id, vehiculos_creados['PMH-03'].id],
+    ):
+        print(f"  ✓ {resultado['compartimentos_creados']} compartimentos y "
+              f"{resultado['equipos_creados']} equipos en el vehículo {resultado['vehiculo']}")
     print("\n✓ Datos iniciales creados exitosamente!")
 
 